@@ -0,0 +1,66 @@
+"""Per-call latency of count_tokens with and without the encoder cache.
+
+"uncached" reproduces the previous behaviour of resolving the tiktoken encoding
+on every call; "cached" is the current count_tokens. Without network access
+tiktoken cannot download its encoding files, in which case the uncached column
+shows the cost of retrying that download on every call.
+
+Usage:
+    python -m benchmarks.bench_count_tokens [--repeat N] [--model MODEL]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable
+
+from src.mcp_output_utils import TIKTOKEN_AVAILABLE, count_tokens, get_encoding
+
+PROMPT_SIZES = [10 * 1024, 100 * 1024, 1024 * 1024]
+
+
+def _uncached_count_tokens(text: str, model: str) -> int:
+    if not TIKTOKEN_AVAILABLE:
+        return len(text) // 4
+    import tiktoken  # pylint: disable=import-outside-toplevel
+
+    try:
+        if model.startswith(("gpt-", "text-")):
+            encoding = tiktoken.encoding_for_model(model)
+        else:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return len(encoding.encode(text))
+    except Exception:  # pylint: disable=broad-exception-caught
+        return len(text) // 4
+
+
+def _median_ms(
+    func: Callable[[str, str], int], text: str, model: str, repeat: int
+) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text, model)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--model", default="gpt-4")
+    args = ap.parse_args()
+
+    line = "def handler(event): return {'status': 200, 'body': event['id']}\n"
+    print(f"tiktoken encoding available: {get_encoding(args.model) is not None}")
+    print(f"{'prompt size':>12} | {'uncached':>12} | {'cached':>12}")
+    for size in [64] + PROMPT_SIZES:
+        text = (line * (size // len(line) + 1))[:size]
+        before = _median_ms(_uncached_count_tokens, text, args.model, args.repeat)
+        after = _median_ms(count_tokens, text, args.model, args.repeat)
+        label = f"{size} B" if size < 1024 else f"{size // 1024} KB"
+        print(f"{label:>12} | {before:>9.3f} ms | {after:>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Time of SafeMCPWrapper.execute_safely on multi-MB search results.
+
+"legacy" reproduces the previous flow: size warnings for top-level strings
+(split into lines to count them), a walk over all leaves to check the
+aggregate budget (strings and scalars only), then a second walk to truncate.
+"single pass" is the current execute_safely, which truncates, accounts sizes
+(dict keys and containers included) and reports in one walk when the output
+fits the budget.
+
+Usage:
+    python -m benchmarks.bench_execute_safely [--repeat N]
+"""
+
+import argparse
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from src.mcp_output_utils import (
+    MAX_MCP_STRING_LENGTH,
+    MAX_MCP_TOTAL_LENGTH,
+    MIN_STRING_SHARE,
+    _apply_budget,
+    _fair_share,
+    truncate_large_strings,
+)
+from src.safe_mcp_tools import SafeMCPWrapper
+
+
+def _iter_leaves(data: Any) -> Iterator[Any]:
+    if not isinstance(data, (dict, list, tuple)):
+        yield data
+        return
+    in_progress = {id(data)}
+    stack = [(data, iter(data.values() if isinstance(data, dict) else data))]
+    while stack:
+        container, children = stack[-1]
+        for child in children:
+            if not isinstance(child, (dict, list, tuple)):
+                yield child
+            elif id(child) in in_progress:
+                yield "[CIRCULAR REFERENCE]"
+            else:
+                in_progress.add(id(child))
+                stack.append(
+                    (
+                        child,
+                        iter(child.values() if isinstance(child, dict) else child),
+                    )
+                )
+                break
+        else:
+            stack.pop()
+            in_progress.discard(id(container))
+
+
+def _legacy_budget(data: Any) -> Any:
+    budget = MAX_MCP_TOTAL_LENGTH
+    total = kept = fixed = 0
+    long_lengths = array("q")
+    limit: Optional[int] = None
+    for leaf in _iter_leaves(data):
+        cost = len(leaf) if isinstance(leaf, str) else 8
+        minimum = min(cost, MIN_STRING_SHARE) if isinstance(leaf, str) else cost
+        if total + minimum > budget:
+            limit = kept
+            break
+        total += minimum
+        kept += 1
+        if isinstance(leaf, str) and cost > MIN_STRING_SHARE:
+            long_lengths.append(cost)
+        else:
+            fixed += cost
+    if limit is None and fixed + sum(long_lengths) <= budget:
+        return truncate_large_strings(data, MAX_MCP_STRING_LENGTH)
+    cap = min(_fair_share(long_lengths, budget - fixed), MAX_MCP_STRING_LENGTH)
+    return _apply_budget(data, cap, limit, MAX_MCP_STRING_LENGTH)[0]
+
+
+def _legacy_execute(result: Any) -> Any:
+    if isinstance(result, dict):
+        for value in result.values():
+            if isinstance(value, str):
+                len(value.split("\n"))  # get_content_size_info
+    return _legacy_budget(result)
+
+
+def _search_results(size_mb: float, preview_mb: float = 0) -> Dict[str, Any]:
+    """Search hits of ~2 KB each, optionally with a large top-level preview."""
+    snippet = "    if user.is_authenticated():\n        return render(request)\n" * 30
+    hits = [
+        {
+            "fileName": f"view_{i}.py",
+            "path": f"/src/app_{i % 50}/views/view_{i}.py",
+            "repository": {"name": f"repo-{i % 7}", "id": f"{i:08x}"},
+            "matches": {"content": [{"charOffset": i % 400, "length": 17}]},
+            "contentPreview": snippet[: 1800 + i % 50],
+        }
+        for i in range(int(size_mb * 1024 * 1024 / 2000))
+    ]
+    preview = "log line\n" * int(preview_mb * 1024 * 1024 / 9)
+    return {"count": len(hits), "results": hits, "preview": preview}
+
+
+def _best_of(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    payloads = {
+        "2 MB of hits": _search_results(2),
+        "8 MB of hits": _search_results(8),
+        "4 MB of hits + 5 MB preview": _search_results(4, 5),
+        "20 MB of hits (over budget)": _search_results(20),
+    }
+    wrapper = SafeMCPWrapper("search_code")
+    print(f"{'payload':>30} | {'legacy':>10} | {'single pass':>11} | speedup")
+    for name, data in payloads.items():
+        legacy = _best_of(lambda: _legacy_execute(data), args.repeat)
+        fused = _best_of(lambda: wrapper.execute_safely(lambda: data), args.repeat)
+        print(
+            f"{name:>30} | {legacy:7.1f} ms | {fused:8.1f} ms | {legacy / fused:6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
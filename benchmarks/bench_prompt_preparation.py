@@ -0,0 +1,98 @@
+"""End-to-end prompt preparation time for large Jira issues.
+
+"legacy" reproduces the previous preparation in main(): three str.replace
+passes, serializing the issue twice, estimate_prompt_tokens on the parts and
+two full-prompt token counts in _manage_prompt_size. "pipeline" is the current
+_prepare_prompt, which serializes and tokenizes every part once.
+
+Usage:
+    python -m benchmarks.bench_prompt_preparation [--repeat N] [--model MODEL]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Callable
+from unittest.mock import patch
+
+from src.config import Settings
+from src.main import _manage_prompt_size, _prepare_prompt
+from src.mcp_output_utils import count_tokens, estimate_prompt_tokens
+
+TEMPLATE = Path("prompts/codegen.md")
+
+
+def _large_issue(description_bytes: int, comments: int) -> dict:
+    line = "As a user I want the export to include every column of the report.\n"
+    description = (line * (description_bytes // len(line) + 1))[:description_bytes]
+    return {
+        "key": "EP-1234",
+        "summary": "Export misses columns",
+        "description": description,
+        "labels": ["export"],
+        "issuetype": "Story",
+        "project": "EP",
+        "raw": {
+            "fields": {
+                "summary": "Export misses columns",
+                "description": description,
+                "comment": {
+                    "comments": [
+                        {"id": str(i), "body": f"Comment {i}: " + line * 20}
+                        for i in range(comments)
+                    ]
+                },
+            }
+        },
+    }
+
+
+def _legacy_prepare(issue: dict, ctx: str, additional: str) -> str:
+    prompt = TEMPLATE.read_text(encoding="utf-8")
+    prompt = prompt.replace("{{JIRA_JSON}}", json.dumps(issue, indent=2))
+    prompt = prompt.replace("{{CONTEXT_INSTRUCTIONS}}", ctx)
+    prompt = prompt.replace("{{ADDITIONAL_INSTRUCTIONS}}", additional)
+    jira_json = json.dumps(issue, indent=2)
+    estimate_prompt_tokens(jira_json, ctx + additional, prompt)
+    managed = _manage_prompt_size(prompt, Settings.MODEL_NAME)
+    count_tokens(managed, Settings.MODEL_NAME)
+    return managed
+
+
+def _median_ms(func: Callable[[], str], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--model", default="gpt-4o")
+    args = ap.parse_args()
+
+    ctx = "Use mcp_ado_search_code with specific terms.\n" * 20
+    additional = "Keep the public API unchanged."
+    with patch.object(Settings, "MODEL_NAME", args.model), patch.object(
+        Settings, "MAX_CONTEXT_TOKENS", 0
+    ):
+        print(f"{'issue':>24} | {'legacy':>11} | {'pipeline':>11}")
+        for description_kb, comments in [(10, 10), (100, 100), (1024, 500)]:
+            issue = _large_issue(description_kb * 1024, comments)
+            legacy = _median_ms(
+                lambda: _legacy_prepare(issue, ctx, additional), args.repeat
+            )
+            pipeline = _median_ms(
+                lambda: _prepare_prompt(issue, ctx, False, additional), args.repeat
+            )
+            label = f"{description_kb} KB + {comments} comments"
+            print(f"{label:>24} | {legacy:>8.1f} ms | {pipeline:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare Codex launch latency across prompt transports.
+
+A stub executable stands in for `codex`: it reads the prompt the same way
+`codex exec` does and exits, so the numbers measure process launch plus prompt
+delivery only.
+
+Usage:
+    python -m benchmarks.bench_prompt_transport [--repeat N]
+"""
+
+import argparse
+import errno
+import stat
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from src.codex_codegen import PROMPT_TRANSPORTS, run_codex
+from src.config import Settings
+
+STUB_CODEX = """#!{python}
+import sys
+if sys.argv[-1] == "-":
+    sys.stdin.buffer.read()
+"""
+
+PROMPT_SIZES = [10 * 1024, 100 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+
+
+def _measure(prompt: str, workspace: Path, transport: str, repeat: int) -> str:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            run_codex(prompt, workspace, transport=transport)
+        except OSError as e:  # E2BIG for argv beyond ARG_MAX / MAX_ARG_STRLEN
+            return f"failed: {errno.errorcode.get(e.errno or 0, e)}"
+        timings.append((time.perf_counter() - started) * 1000)
+    return f"{statistics.median(timings):8.1f} ms"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = Path(tmp)
+        stub = workspace / "codex"
+        stub.write_text(STUB_CODEX.format(python=sys.executable), encoding="utf-8")
+        stub.chmod(stub.stat().st_mode | stat.S_IEXEC)
+
+        with patch.object(Settings, "CODEX_BIN", str(stub)):
+            print(
+                f"{'prompt size':>12} | "
+                + " | ".join(f"{t:>14}" for t in PROMPT_TRANSPORTS)
+            )
+            for size in PROMPT_SIZES:
+                prompt = "x" * size
+                row = [
+                    f"{_measure(prompt, workspace, t, args.repeat):>14}"
+                    for t in PROMPT_TRANSPORTS
+                ]
+                print(f"{size // 1024:>9} KB | " + " | ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Time and peak memory of head/tail summaries of multi-GB build logs.
+
+"legacy" reads the whole log and summarizes it with the previous
+split("\\n")-based summarize_large_content; "string" is the current
+summarize_large_content on the same in-memory text (count/find/rfind scans);
+"stream" is summarize_file, which reads the file in chunks. Peak memory is the
+tracemalloc peak of the call; time is measured in a separate, untraced run.
+The in-memory variants are skipped for logs larger than --in-memory-max-gb.
+
+Usage:
+    python -m benchmarks.bench_summarize_logs [--size-gb N] [--in-memory-max-gb N]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from src.mcp_output_utils import (
+    MAX_MCP_STRING_LENGTH,
+    summarize_file,
+    summarize_large_content,
+)
+
+
+def _legacy_summarize(content: str, max_length: int) -> str:
+    if len(content) <= max_length:
+        return content
+    lines = content.split("\n")
+    if len(lines) > 100:
+        available_content = max_length - 200
+        avg_line_length = len(content) / len(lines)
+        max_lines = max(10, int(available_content / (2 * avg_line_length)))
+        max_lines = min(max_lines, len(lines) // 2)
+        summary = (
+            "\n".join(lines[:max_lines])
+            + f"\n\n[CONTENT SUMMARIZED: {len(lines)} total lines, "
+            f"{len(content)} characters]\n"
+            f"[Showing first {max_lines} and last {max_lines} lines]\n\n"
+            + "\n".join(lines[-max_lines:])
+        )
+        if len(summary) <= max_length:
+            return summary
+    return content[: max_length - 200]
+
+
+def _write_log(path: str, size_bytes: int) -> None:
+    block = "".join(
+        f"2024-05-01T12:00:{i % 60:02d}Z [INFO] compiling module_{i}.c "
+        f"-O2 -Wall -Iinclude ({i * 37 % 1000} ms)\n"
+        for i in range(10_000)
+    ).encode("utf-8")
+    with open(path, "wb") as f:
+        written = 0
+        while written < size_bytes:
+            f.write(block)
+            written += len(block)
+
+
+def _read_and(func: Callable[[str, int], str]) -> Callable[[str], str]:
+    def run(path: str) -> str:
+        with open(path, encoding="utf-8") as f:
+            return func(f.read(), MAX_MCP_STRING_LENGTH)
+
+    return run
+
+
+def _measure(func: Callable[[str], str], path: str) -> Tuple[float, float]:
+    gc.collect()
+    started = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-gb", type=float, default=2.0)
+    ap.add_argument("--in-memory-max-gb", type=float, default=0.5)
+    args = ap.parse_args()
+
+    variants = {
+        "legacy": _read_and(_legacy_summarize),
+        "string": _read_and(summarize_large_content),
+        "stream": lambda path: summarize_file(path, MAX_MCP_STRING_LENGTH),
+    }
+    sizes = sorted({min(0.5, args.size_gb), args.size_gb})
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "build.log")
+        print(f"{'log size':>10} | " + " | ".join(f"{n:>20}" for n in variants))
+        for size_gb in sizes:
+            _write_log(path, int(size_gb * 1024**3))
+            cells = []
+            for name, func in variants.items():
+                if name != "stream" and size_gb > args.in_memory_max_gb:
+                    cells.append(f"{'skipped':>20}")
+                    continue
+                elapsed, peak = _measure(func, path)
+                cells.append(f"{elapsed:7.1f} s {peak:8.0f} MB")
+            print(f"{size_gb:>7.1f} GB | " + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Time and peak memory of truncate_large_strings on ~100 MB payloads.
+
+"legacy" reproduces the previous recursive implementation, which rebuilt every
+dict/list/tuple; "iterative" is the current truncate_large_strings, which only
+copies the paths to oversized strings. Peak memory is the tracemalloc peak of
+the call itself (the payload is built before tracing starts); time is measured
+in a separate, untraced run.
+
+Usage:
+    python -m benchmarks.bench_truncate_large_strings [--size-mb N]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+from src.mcp_output_utils import truncate_large_strings
+
+MAX_LENGTH = 1_000_000
+
+
+def _legacy_truncate(data: Any, max_length: int) -> Any:
+    if isinstance(data, str):
+        if len(data) > max_length:
+            truncated_length = max_length - 100
+            return data[:truncated_length] + (
+                f"\n\n[TRUNCATED: Original length was {len(data)} characters, "
+                f"showing first {truncated_length} characters]"
+            )
+        return data
+    if isinstance(data, dict):
+        return {k: _legacy_truncate(v, max_length) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_legacy_truncate(item, max_length) for item in data]
+    if isinstance(data, tuple):
+        return tuple(_legacy_truncate(item, max_length) for item in data)
+    return data
+
+
+def _search_results(size_mb: int, oversized: int) -> Dict[str, Any]:
+    """Many small search hits (~2 KB each) plus a few oversized strings."""
+    hits = []
+    snippet = "def handler(event):\n    return process(event)\n" * 40
+    for i in range(size_mb * 1024 // 2):
+        hits.append(
+            {
+                "path": f"/src/module_{i % 97}/file_{i}.py",
+                "matches": [{"line": i % 500, "text": snippet[: 1900 + i % 7]}],
+                "score": i / 3,
+            }
+        )
+    for i in range(oversized):
+        hits[i * 101]["matches"][0]["text"] = "x" * (MAX_LENGTH * 3)
+    return {"count": len(hits), "results": hits}
+
+
+def _deep(depth: int) -> Any:
+    data: Any = "x" * (MAX_LENGTH * 2)
+    for _ in range(depth):
+        data = {"child": [data]}
+    return data
+
+
+def _measure(func: Callable[[Any, int], Any], data: Any) -> Tuple[float, float]:
+    # Time and memory are measured in separate runs: tracing slows every
+    # allocation down
+    gc.collect()
+    started = time.perf_counter()
+    result = func(data, MAX_LENGTH)
+    elapsed = time.perf_counter() - started
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(data, MAX_LENGTH)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return elapsed * 1000, peak / (1024 * 1024)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=100)
+    args = ap.parse_args()
+
+    payloads = {
+        f"{args.size_mb} MB, nothing oversized": _search_results(args.size_mb, 0),
+        f"{args.size_mb} MB, 5 oversized strings": _search_results(args.size_mb, 5),
+        "nesting depth 50,000": _deep(50_000),
+    }
+    print(f"{'payload':>30} | {'legacy':>22} | {'iterative':>22}")
+    for name, data in payloads.items():
+        cells = []
+        for func in (_legacy_truncate, truncate_large_strings):
+            try:
+                elapsed, peak = _measure(func, data)
+                cells.append(f"{elapsed:8.0f} ms {peak:8.1f} MB")
+            except RecursionError:
+                cells.append(f"{'RecursionError':>22}")
+        print(f"{name:>30} | {cells[0]} | {cells[1]}")
+
+
+if __name__ == "__main__":
+    main()
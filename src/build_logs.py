@@ -0,0 +1,309 @@
+"""Memory-mapped access to large build logs: line ranges, grep and error windows."""
+
+import logging
+import mmap
+import re
+import tempfile
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import IO, Any, Iterable, List, Optional, Pattern, Tuple, Union
+
+from .mcp_output_utils import MAX_MCP_STRING_LENGTH, summarize_stream
+
+logger = logging.getLogger(__name__)
+
+# Logs larger than this are spooled to a temporary file and memory-mapped
+SPOOL_THRESHOLD = 1 << 20
+
+# Granularity of the line index: newline counts are kept per block
+INDEX_BLOCK_SIZE = 1 << 16
+
+# Azure Pipelines marks failures with logging commands such as "##[error]"
+PIPELINE_ERROR_PATTERN = re.compile(rb"##\[error\]")
+
+# Fallback for logs without pipeline markers (compiler, test runner output)
+GENERIC_ERROR_PATTERN = re.compile(
+    rb"\b(?:error|failed|failure|fatal|exception|traceback)\b", re.IGNORECASE
+)
+
+ERROR_CONTEXT_LINES = 20
+MAX_ERROR_WINDOWS = 5
+
+
+class BuildLog:
+    """
+    A read-only build log with a sparse line index.
+
+    The log is kept as UTF-8 bytes: in memory when small, otherwise in a
+    temporary file (or the original file) that is memory-mapped, so only the
+    pages that are actually read are loaded. The index stores the number of
+    newlines before every INDEX_BLOCK_SIZE block; it is built with C-speed
+    byte counting and locates any line after scanning at most one block.
+    Line numbers are 1-based and ranges are inclusive, like the line ranges of
+    ``build_get_log_by_id``.
+    """
+
+    def __init__(self, data: Union[bytes, mmap.mmap], file: Optional[IO[Any]] = None):
+        self._data = data
+        self._file = file
+        self._newlines_before = array("q")
+        newlines = 0
+        for start in range(0, len(data), INDEX_BLOCK_SIZE):
+            self._newlines_before.append(newlines)
+            newlines += data[start : start + INDEX_BLOCK_SIZE].count(b"\n")
+        self._newlines = newlines
+
+    @classmethod
+    def from_content(cls, content: Union[str, bytes, Iterable[str]]) -> "BuildLog":
+        """
+        Create a log from a tool result, spooling large logs to disk.
+
+        Args:
+            content: The log text, UTF-8 bytes, or an iterable of lines (with
+                or without line endings)
+
+        Returns:
+            The BuildLog; close it (or use it as a context manager) when done
+        """
+        if isinstance(content, (str, bytes)):
+            chunks: Iterable[Any] = [content]
+        else:
+            chunks = (line if line.endswith("\n") else line + "\n" for line in content)
+
+        buffer = bytearray()
+        spool: Optional[IO[bytes]] = None
+        for chunk in chunks:
+            buffer += chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            if len(buffer) > SPOOL_THRESHOLD:
+                if spool is None:
+                    spool = tempfile.TemporaryFile()
+                spool.write(buffer)
+                buffer.clear()
+        if spool is None:
+            return cls(bytes(buffer))
+        spool.write(buffer)
+        spool.flush()
+        logger.debug("Spooled build log of %d bytes to disk", spool.tell())
+        return cls(mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ), spool)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "BuildLog":
+        """
+        Memory-map a log file.
+
+        Args:
+            path: Path of the UTF-8 log file
+
+        Returns:
+            The BuildLog; close it (or use it as a context manager) when done
+        """
+        f = open(path, "rb")
+        try:
+            if Path(path).stat().st_size == 0:
+                return cls(b"", f)
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), f)
+        except BaseException:
+            f.close()
+            raise
+
+    def close(self) -> None:
+        """Unmap the log and remove its spool file."""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "BuildLog":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def size(self) -> int:
+        """Size of the log in bytes."""
+        return len(self._data)
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines; a trailing newline does not start another line."""
+        if not self._data:
+            return 0
+        return self._newlines + (0 if self._data[-1:] == b"\n" else 1)
+
+    def _line_start(self, line: int) -> int:
+        # Byte offset of a 1-based line, i.e. just after the (line - 1)-th newline
+        skip = line - 1
+        if skip <= 0:
+            return 0
+        if skip > self._newlines:
+            return len(self._data)
+        block = bisect_left(self._newlines_before, skip) - 1
+        pos = block * INDEX_BLOCK_SIZE - 1
+        for _ in range(skip - self._newlines_before[block]):
+            pos = self._data.find(b"\n", pos + 1)
+        return pos + 1
+
+    def line_number(self, offset: int) -> int:
+        """Return the 1-based number of the line containing a byte offset."""
+        block = offset // INDEX_BLOCK_SIZE
+        if block >= len(self._newlines_before):
+            return self.line_count
+        block_start = block * INDEX_BLOCK_SIZE
+        before = self._data[block_start:offset].count(b"\n")
+        return self._newlines_before[block] + before + 1
+
+    def get_lines(self, start: int, end: int) -> str:
+        """
+        Return an inclusive range of lines.
+
+        Args:
+            start: First line (1-based)
+            end: Last line; clamped to the end of the log
+
+        Returns:
+            The lines joined by newlines, without a trailing newline
+        """
+        start = max(1, start)
+        if end < start:
+            return ""
+        begin = self._line_start(start)
+        stop = self._line_start(end + 1)
+        text = self._data[begin:stop].decode("utf-8", errors="replace")
+        return text[:-1] if text.endswith("\n") else text
+
+    def grep(
+        self,
+        pattern: Union[str, Pattern[bytes]],
+        max_matches: int = 100,
+        ignore_case: bool = False,
+    ) -> List[Tuple[int, str]]:
+        """
+        Find the lines matching a regular expression.
+
+        Args:
+            pattern: A regular expression (str) or a compiled bytes pattern
+            max_matches: Maximum number of lines to return
+            ignore_case: Whether a str pattern is matched case-insensitively
+
+        Returns:
+            (line number, line) pairs in log order, one per matching line
+        """
+        return [
+            (self.line_number(begin), self._decode(begin, end))
+            for begin, end in self._matching_lines(pattern, max_matches, ignore_case)
+        ]
+
+    def _decode(self, begin: int, end: int) -> str:
+        return self._data[begin:end].decode("utf-8", errors="replace").rstrip("\r")
+
+    def _matching_lines(
+        self,
+        pattern: Union[str, Pattern[bytes]],
+        max_matches: int,
+        ignore_case: bool = False,
+    ) -> List[Tuple[int, int]]:
+        if isinstance(pattern, str):
+            flags = re.IGNORECASE if ignore_case else 0
+            pattern = re.compile(pattern.encode("utf-8"), flags | re.MULTILINE)
+        data = self._data
+        spans: List[Tuple[int, int]] = []
+        pos = 0
+        while len(spans) < max_matches:
+            match = pattern.search(data, pos)
+            if match is None:
+                break
+            begin = data.rfind(b"\n", 0, match.start()) + 1
+            end = data.find(b"\n", match.start())
+            if end < 0:
+                end = len(data)
+            spans.append((begin, end))
+            # One hit per line: continue on the next line
+            pos = end + 1
+            if pos > len(data):
+                break
+        return spans
+
+    def error_windows(
+        self,
+        context_lines: int = ERROR_CONTEXT_LINES,
+        max_windows: int = MAX_ERROR_WINDOWS,
+    ) -> List[Tuple[int, int]]:
+        """
+        Locate the failure regions of the log.
+
+        Pipeline "##[error]" lines are used when present, otherwise lines
+        mentioning errors, failures, exceptions or tracebacks. Each hit is
+        widened by ``context_lines`` on both sides and overlapping windows
+        are merged; the earliest windows are kept since the first error is
+        usually the cause of the later ones.
+
+        Args:
+            context_lines: Lines of context before and after each hit
+            max_windows: Maximum number of windows
+
+        Returns:
+            Inclusive (first line, last line) ranges in log order
+        """
+        limit = max_windows * (2 * context_lines + 1)
+        hits = self._matching_lines(PIPELINE_ERROR_PATTERN, limit)
+        if not hits:
+            hits = self._matching_lines(GENERIC_ERROR_PATTERN, limit)
+
+        last_line = self.line_count
+        windows: List[Tuple[int, int]] = []
+        for begin, _ in hits:
+            line = self.line_number(begin)
+            first = max(1, line - context_lines)
+            last = min(last_line, line + context_lines)
+            if windows and first <= windows[-1][1] + 1:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], last))
+            elif len(windows) < max_windows:
+                windows.append((first, last))
+            else:
+                break
+        return windows
+
+    def failure_excerpt(
+        self,
+        max_length: int = MAX_MCP_STRING_LENGTH,
+        context_lines: int = ERROR_CONTEXT_LINES,
+        max_windows: int = MAX_ERROR_WINDOWS,
+    ) -> str:
+        """
+        Render the failure regions of the log within a length budget.
+
+        Logs without recognizable errors are summarized as their first and
+        last lines instead.
+
+        Args:
+            max_length: Maximum length of the excerpt
+            context_lines: Lines of context around each error line
+            max_windows: Maximum number of failure regions
+
+        Returns:
+            The excerpt, with a header and the line range of every region
+        """
+        if len(self._data) <= max_length:
+            return self._data[:].decode("utf-8", errors="replace")
+        windows = self.error_windows(context_lines, max_windows)
+        if not windows:
+            return summarize_stream(self._data, max_length)
+
+        parts = [
+            f"[BUILD LOG EXCERPT: {self.line_count} lines, {self.size} bytes; "
+            f"showing {len(windows)} failure regions]"
+        ]
+        remaining = max_length - len(parts[0])
+        for first, last in windows:
+            header = f"\n\n--- lines {first}-{last} ---\n"
+            available = remaining - len(header)
+            if available <= 0:
+                break
+            text = self.get_lines(first, last)[:available]
+            parts.append(header + text)
+            remaining -= len(header) + len(text)
+        return "".join(parts)
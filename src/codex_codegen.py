@@ -1,33 +1,398 @@
+import gzip
 import logging
 import os
+import signal
 import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack
 from pathlib import Path
-from typing import Union
+from typing import IO, Deque, Optional, Set, Tuple, Union
 
 from .config import Settings
 
 logger = logging.getLogger(__name__)
+# Captured Codex output is logged separately so it can be filtered or routed
+output_logger = logging.getLogger(f"{__name__}.output")
 
+# How the prompt reaches Codex:
+#   argv  - as the last command line argument (limited by ARG_MAX/E2BIG and
+#           visible in /proc/<pid>/cmdline)
+#   stdin - written to the child's stdin through a pipe
+#   file  - spooled to a memory-backed temp file that becomes the child's stdin
+PROMPT_TRANSPORTS = ("argv", "stdin", "file")
+
+# Tells `codex exec` to read the prompt from stdin
+_STDIN_PROMPT_ARG = "-"
+
+# Longer output lines are split into several log records
+_MAX_LINE_BYTES = 64 * 1024
+
+# Exit codes reported when SweCli stops Codex itself (as coreutils timeout/SIGINT)
+CODEX_TIMEOUT_EXIT_CODE = 124
+CODEX_CANCELLED_EXIT_CODE = 130
+
+_POSIX = os.name == "posix"
+_POLL_SECONDS = 0.5
+# One cancellation token per running `run_codex` call; cancelling sets the
+# tokens of the runs active at that moment, so later runs are unaffected
+_cancel_tokens: Set[threading.Event] = set()
+_cancel_lock = threading.Lock()
 
-def run_codex(prompt_text: str, workspace: Union[str, Path]) -> int:
-    env = os.environ.copy()
-    if Settings.OPENAI_API_KEY:
-        env["OPENAI_API_KEY"] = Settings.OPENAI_API_KEY
 
-    # with tempfile.NamedTemporaryFile("w", delete=False, suffix=".txt") as f:
-    #     f.write(prompt_text)
-    #     path = f.name
+def _spool_dir() -> Optional[str]:
+    """Prefer a memory-backed directory for prompt files when one is available."""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return None
 
-    cmd = [
-        "codex",
+
+def build_codex_command(prompt_arg: str) -> list[str]:
+    return [
+        Settings.CODEX_BIN,
         "exec",
         "--full-auto",
         "--sandbox",
         "danger-full-access",
-        f"{prompt_text}",
+        prompt_arg,
     ]
-    logger.info("Launching Codex CLI (non-interactive)")
-    logger.debug("Codex command: %s", " ".join(cmd))
-    rc = subprocess.call(cmd, env=env, cwd=workspace)
-    logger.info("Codex finished with exit code=%s", rc)
+
+
+class _OutputMonitor:
+    """
+    Collects the child's output line by line without keeping all of it.
+
+    Every line is forwarded to the logging pipeline, the most recent lines are
+    kept in a bounded ring buffer for error reports, and the whole output is
+    optionally appended to a gzip-compressed transcript.
+    """
+
+    def __init__(self, tail_lines: int, transcript: Optional[IO[str]] = None):
+        self.tail: Deque[str] = deque(maxlen=max(1, tail_lines))
+        self.transcript = transcript
+        self.lines = 0
+        self.bytes = 0
+        self.last_output = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, stream: IO[bytes], name: str) -> None:
+        # readline() with a cap keeps a single huge line from being buffered whole
+        for raw in iter(lambda: stream.readline(_MAX_LINE_BYTES), b""):
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            with self._lock:
+                self.lines += 1
+                self.bytes += len(raw)
+                self.last_output = time.monotonic()
+                self.tail.append(f"[{name}] {line}")
+                if self.transcript is not None:
+                    self.transcript.write(f"[{name}] {line}\n")
+            output_logger.info("[%s] %s", name, line)
+        stream.close()
+
+
+def _open_transcript(transcript_dir: Optional[str]) -> Optional[IO[str]]:
+    if not transcript_dir:
+        return None
+    directory = Path(transcript_dir).expanduser()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"codex-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.log.gz"
+    path = directory / name
+    logger.info("Writing Codex transcript to %s", path)
+    return gzip.open(path, "wt", encoding="utf-8")
+
+
+def _write_stdin(stream: IO[bytes], data: bytes) -> None:
+    try:
+        stream.write(data)
+    except BrokenPipeError:
+        logger.warning("Codex closed stdin before reading the whole prompt")
+    finally:
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+
+def cancel_codex_runs() -> None:
+    """Ask every running `run_codex` call of this process to stop Codex."""
+    with _cancel_lock:
+        for token in _cancel_tokens:
+            token.set()
+
+
+def _cancel_token(stack: ExitStack) -> threading.Event:
+    """Register a cancellation token for one run, removed when ``stack`` exits."""
+    token = threading.Event()
+    with _cancel_lock:
+        _cancel_tokens.add(token)
+
+    def discard() -> None:
+        with _cancel_lock:
+            _cancel_tokens.discard(token)
+
+    stack.callback(discard)
+    return token
+
+
+def _signal_name(signum: int) -> str:
+    try:
+        return signal.Signals(signum).name
+    except ValueError:
+        return str(signum)
+
+
+def _apply_resource_limits(pid: int) -> None:
+    """
+    Apply CODEX_CPU_LIMIT_SECONDS/CODEX_MEMORY_LIMIT_MB to a started child.
+
+    The limits are set from the parent with prlimit(2) rather than in a
+    preexec_fn, which is unsafe while other threads run (batch mode starts
+    Codex from worker threads). Processes Codex spawns inherit them.
+    """
+    cpu_seconds = Settings.CODEX_CPU_LIMIT_SECONDS
+    memory_mb = Settings.CODEX_MEMORY_LIMIT_MB
+    if not _POSIX or (cpu_seconds <= 0 and memory_mb <= 0):
+        return
+
+    import resource  # pylint: disable=import-outside-toplevel
+
+    if not hasattr(resource, "prlimit"):
+        logger.warning("Codex resource limits need prlimit (Linux); not applied")
+        return
+    try:
+        if cpu_seconds > 0:
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+        if memory_mb > 0:
+            limit = memory_mb * 1024 * 1024
+            resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except ProcessLookupError:
+        # Codex already exited; its exit code is reported as usual
+        pass
+
+
+def _terminate(proc: "subprocess.Popen[bytes]") -> int:
+    """Stop Codex and its process group: SIGTERM first, SIGKILL after a grace period."""
+    grace = max(0.0, Settings.CODEX_KILL_GRACE_SECONDS)
+    for sig_name in ("SIGTERM", "SIGKILL"):
+        try:
+            if _POSIX:
+                os.killpg(proc.pid, getattr(signal, sig_name))
+            elif sig_name == "SIGTERM":
+                proc.terminate()
+            else:
+                proc.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        try:
+            return proc.wait(timeout=grace if sig_name == "SIGTERM" else None)
+        except subprocess.TimeoutExpired:
+            logger.warning("Codex ignored SIGTERM for %.0fs, sending SIGKILL", grace)
+    return proc.wait()
+
+
+def _supervise(
+    proc: "subprocess.Popen[bytes]",
+    monitor: Optional["_OutputMonitor"],
+    cancelled: threading.Event,
+) -> Tuple[int, Optional[str]]:
+    """
+    Wait for Codex while emitting heartbeats and enforcing timeouts.
+
+    Returns:
+        The exit code and, if the run was killed, the reason
+    """
+    timeout = Settings.CODEX_TIMEOUT_SECONDS
+    idle_timeout = Settings.CODEX_IDLE_TIMEOUT_SECONDS
+    if idle_timeout > 0 and monitor is None:
+        logger.warning(
+            "CODEX_IDLE_TIMEOUT_SECONDS needs streamed output; idle timeout disabled"
+        )
+        idle_timeout = 0
+    heartbeat = max(0.1, Settings.CODEX_HEARTBEAT_SECONDS)
+    started = next_heartbeat = time.monotonic()
+    next_heartbeat += heartbeat
+
+    while True:
+        try:
+            return proc.wait(timeout=min(heartbeat, _POLL_SECONDS)), None
+        except subprocess.TimeoutExpired:
+            pass
+
+        now = time.monotonic()
+        reason = None
+        if cancelled.is_set():
+            reason, rc = "cancelled", CODEX_CANCELLED_EXIT_CODE
+        elif timeout > 0 and now - started > timeout:
+            reason = f"wall-clock timeout of {timeout:.0f}s exceeded"
+            rc = CODEX_TIMEOUT_EXIT_CODE
+        elif idle_timeout > 0 and monitor is not None:
+            idle = now - monitor.last_output
+            if idle > idle_timeout:
+                reason = f"no output for {idle:.0f}s (idle timeout {idle_timeout:.0f}s)"
+                rc = CODEX_TIMEOUT_EXIT_CODE
+        if reason is not None:
+            logger.warning("Stopping Codex: %s", reason)
+            _terminate(proc)
+            return rc, reason
+
+        if now >= next_heartbeat:
+            next_heartbeat = now + heartbeat
+            if monitor is None:
+                logger.info("Codex still running: elapsed=%.0fs", now - started)
+            else:
+                logger.info(
+                    "Codex still running: elapsed=%.0fs lines=%d bytes=%d idle=%.0fs",
+                    now - started,
+                    monitor.lines,
+                    monitor.bytes,
+                    now - monitor.last_output,
+                )
+
+
+def run_codex(
+    prompt_text: str,
+    workspace: Union[str, Path],
+    transport: Optional[str] = None,
+    stream_output: Optional[bool] = None,
+    transcript_dir: Optional[str] = None,
+) -> int:
+    """
+    Run `codex exec` non-interactively on a prompt.
+
+    While Codex runs a heartbeat is logged every CODEX_HEARTBEAT_SECONDS. With
+    ``stream_output`` the child's stdout/stderr are captured line by line into
+    the logging pipeline instead of being inherited from this process.
+
+    Codex runs in its own process group, which is stopped (SIGTERM, then
+    SIGKILL after CODEX_KILL_GRACE_SECONDS) when CODEX_TIMEOUT_SECONDS or, in
+    streaming mode, CODEX_IDLE_TIMEOUT_SECONDS is exceeded, or when
+    ``cancel_codex_runs`` is called or this call is interrupted (e.g. by
+    KeyboardInterrupt). CODEX_CPU_LIMIT_SECONDS and CODEX_MEMORY_LIMIT_MB
+    apply rlimits to the child on Linux.
+
+    Args:
+        prompt_text: The full prompt
+        workspace: Directory Codex runs in
+        transport: One of PROMPT_TRANSPORTS; defaults to CODEX_PROMPT_TRANSPORT
+        stream_output: Capture and log output; defaults to CODEX_STREAM_OUTPUT
+        transcript_dir: Directory for a gzip transcript of the captured output;
+            defaults to CODEX_TRANSCRIPT_DIR (streaming mode only)
+
+    Returns:
+        The Codex exit code; CODEX_TIMEOUT_EXIT_CODE after a timeout and
+        CODEX_CANCELLED_EXIT_CODE after cancellation
+    """
+    transport = (transport or Settings.CODEX_PROMPT_TRANSPORT).lower()
+    if transport not in PROMPT_TRANSPORTS:
+        raise ValueError(
+            f"Unknown prompt transport {transport!r}; "
+            f"expected one of {', '.join(PROMPT_TRANSPORTS)}"
+        )
+    if stream_output is None:
+        stream_output = Settings.CODEX_STREAM_OUTPUT
+    if transcript_dir is None:
+        transcript_dir = Settings.CODEX_TRANSCRIPT_DIR
+
+    env = os.environ.copy()
+    if Settings.OPENAI_API_KEY:
+        env["OPENAI_API_KEY"] = Settings.OPENAI_API_KEY
+
+    prompt_arg = prompt_text if transport == "argv" else _STDIN_PROMPT_ARG
+    cmd = build_codex_command(prompt_arg)
+    logger.info(
+        "Launching Codex CLI (non-interactive, prompt via %s, %d characters)",
+        transport,
+        len(prompt_text),
+    )
+    logger.debug("Codex command: %s", " ".join(cmd[:-1] + ["<prompt>"]))
+
+    with ExitStack() as stack:
+        cancelled = _cancel_token(stack)
+        stdin: Union[int, IO[bytes], None] = None
+        if transport == "stdin":
+            stdin = subprocess.PIPE
+        elif transport == "file":
+            spool = stack.enter_context(
+                tempfile.TemporaryFile(dir=_spool_dir(), suffix=".prompt")
+            )
+            spool.write(prompt_text.encode("utf-8"))
+            spool.seek(0)
+            stdin = spool
+        output = subprocess.PIPE if stream_output else None
+
+        started = time.monotonic()
+        proc = subprocess.Popen(  # pylint: disable=consider-using-with
+            cmd,
+            stdin=stdin,
+            stdout=output,
+            stderr=output,
+            env=env,
+            cwd=workspace,
+            # Own process group, so timeouts stop Codex and everything it spawned
+            start_new_session=_POSIX,
+        )
+        _apply_resource_limits(proc.pid)
+        threads = []
+        if transport == "stdin" and proc.stdin is not None:
+            threads.append(
+                threading.Thread(
+                    target=_write_stdin,
+                    args=(proc.stdin, prompt_text.encode("utf-8")),
+                    daemon=True,
+                )
+            )
+
+        monitor: Optional[_OutputMonitor] = None
+        if stream_output:
+            transcript = _open_transcript(transcript_dir)
+            if transcript is not None:
+                stack.enter_context(transcript)
+            monitor = _OutputMonitor(Settings.CODEX_TAIL_LINES, transcript)
+            for name, pipe in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+                if pipe is not None:
+                    threads.append(
+                        threading.Thread(
+                            target=monitor.consume, args=(pipe, name), daemon=True
+                        )
+                    )
+        try:
+            for thread in threads:
+                thread.start()
+
+            rc, kill_reason = _supervise(proc, monitor, cancelled)
+
+            for thread in threads:
+                # Pipes close once the process group is gone; don't hang on strays
+                thread.join(timeout=Settings.CODEX_KILL_GRACE_SECONDS)
+        except BaseException:
+            # Codex has its own session, so the terminal's SIGINT does not
+            # reach it: stop it before KeyboardInterrupt leaves this process
+            logger.warning("Interrupted, stopping Codex")
+            _terminate(proc)
+            raise
+
+    elapsed = time.monotonic() - started
+    if kill_reason is not None:
+        logger.warning(
+            "Codex killed after %.1fs: %s (exit code=%s)", elapsed, kill_reason, rc
+        )
+    elif rc < 0:
+        logger.warning(
+            "Codex terminated by signal %s after %.1fs "
+            "(resource limit or external kill)",
+            _signal_name(-rc),
+            elapsed,
+        )
+    else:
+        logger.info("Codex finished with exit code=%s after %.1fs", rc, elapsed)
+    if rc != 0 and monitor is not None and monitor.tail:
+        logger.warning(
+            "Last %d lines of Codex output:\n%s",
+            len(monitor.tail),
+            "\n".join(monitor.tail),
+        )
     return rc
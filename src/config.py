@@ -9,6 +9,40 @@ class Settings:
     JIRA_SERVER = os.getenv("JIRA_SERVER")
     JIRA_USER = os.getenv("JIRA_USER")
     JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
+    JIRA_POOL_SIZE = int(
+        os.getenv("JIRA_POOL_SIZE", "10")
+    )  # Keep-alive connections shared by all workers
+    JIRA_CACHE_DIR = os.getenv(
+        "JIRA_CACHE_DIR", os.path.join("~", ".cache", "swecli", "jira")
+    )
+    JIRA_CACHE_TTL_SECONDS = float(
+        os.getenv("JIRA_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
+    )  # Cached issues older than this are re-downloaded
+    JIRA_CACHE_MAX_ENTRIES = int(os.getenv("JIRA_CACHE_MAX_ENTRIES", "500"))
+    JIRA_COMMENT_TOKENS = int(
+        os.getenv("JIRA_COMMENT_TOKENS", "0")
+    )  # Token budget for the newest comments; 0 = comments are not fetched
+    JIRA_RELATED_DEPTH = int(
+        os.getenv("JIRA_RELATED_DEPTH", "0")
+    )  # Hops of links/subtasks/parent added to the prompt
+    JIRA_RELATED_TOKENS = int(
+        os.getenv("JIRA_RELATED_TOKENS", "300")
+    )  # Token budget per related issue
+    JIRA_RELATED_MAX_ISSUES = int(os.getenv("JIRA_RELATED_MAX_ISSUES", "25"))
+    JIRA_EPIC_LINK_FIELD = os.getenv(
+        "JIRA_EPIC_LINK_FIELD"
+    )  # e.g. customfield_10014 on company-managed projects
+    JIRA_ASYNC_CONCURRENCY = int(
+        os.getenv("JIRA_ASYNC_CONCURRENCY", "8")
+    )  # Requests in flight for the async fetcher
+    JIRA_TIMEOUT_SECONDS = float(os.getenv("JIRA_TIMEOUT_SECONDS", "30"))
+    JIRA_MAX_RETRIES = int(
+        os.getenv("JIRA_MAX_RETRIES", "4")
+    )  # Retries on 429/5xx and connection errors
+    JIRA_RETRY_BACKOFF_SECONDS = float(os.getenv("JIRA_RETRY_BACKOFF_SECONDS", "1"))
+    JIRA_RETRY_MAX_DELAY_SECONDS = float(
+        os.getenv("JIRA_RETRY_MAX_DELAY_SECONDS", "60")
+    )
 
     ADO_ORG = os.getenv("ADO_ORG")
     ADO_PROJECT = os.getenv("ADO_PROJECT")
@@ -17,6 +51,33 @@ class Settings:
 
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+    # Codex execution
+    CODEX_BIN = os.getenv("CODEX_BIN", "codex")
+    CODEX_PROMPT_TRANSPORT = os.getenv(
+        "CODEX_PROMPT_TRANSPORT", "stdin"
+    )  # argv | stdin | file
+    CODEX_STREAM_OUTPUT = os.getenv("CODEX_STREAM_OUTPUT", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )  # Capture Codex output line by line into the logs
+    CODEX_HEARTBEAT_SECONDS = float(os.getenv("CODEX_HEARTBEAT_SECONDS", "30"))
+    CODEX_TAIL_LINES = int(
+        os.getenv("CODEX_TAIL_LINES", "200")
+    )  # Output lines kept for error reports
+    CODEX_TRANSCRIPT_DIR = os.getenv("CODEX_TRANSCRIPT_DIR")  # gzip transcripts
+    CODEX_TIMEOUT_SECONDS = float(
+        os.getenv("CODEX_TIMEOUT_SECONDS", "0")
+    )  # 0 = no wall-clock limit
+    CODEX_IDLE_TIMEOUT_SECONDS = float(
+        os.getenv("CODEX_IDLE_TIMEOUT_SECONDS", "0")
+    )  # 0 = no limit; needs CODEX_STREAM_OUTPUT
+    CODEX_KILL_GRACE_SECONDS = float(
+        os.getenv("CODEX_KILL_GRACE_SECONDS", "10")
+    )  # Time between SIGTERM and SIGKILL
+    CODEX_CPU_LIMIT_SECONDS = int(os.getenv("CODEX_CPU_LIMIT_SECONDS", "0"))
+    CODEX_MEMORY_LIMIT_MB = int(os.getenv("CODEX_MEMORY_LIMIT_MB", "0"))
+
     # Context window management
     MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4")
     MAX_CONTEXT_TOKENS = int(
@@ -25,3 +86,22 @@ class Settings:
     CONTEXT_SAFETY_MARGIN = float(
         os.getenv("CONTEXT_SAFETY_MARGIN", "0.8")
     )  # Use 80% of context window
+    JIRA_JSON_MODE = os.getenv(
+        "JIRA_JSON_MODE", "pretty"
+    )  # pretty | compact (deduplicated, pruned, no indentation)
+    PROMPT_TEMPLATE_DIR = os.getenv(
+        "PROMPT_TEMPLATE_DIR"
+    )  # Custom templates, searched before prompts/
+
+    # MCP tool results
+    MCP_CACHE_MAX_BYTES = int(
+        os.getenv("MCP_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )  # Size of the in-memory result cache of read-only tools; 0 = disabled
+    MCP_TOOL_CONCURRENCY = int(
+        os.getenv("MCP_TOOL_CONCURRENCY", "4")
+    )  # Concurrent async calls per tool
+
+    # Batch mode
+    BATCH_CONCURRENCY = int(
+        os.getenv("BATCH_CONCURRENCY", "4")
+    )  # Issues processed in parallel
@@ -0,0 +1,262 @@
+"""Asyncio-native Jira fetching over httpx."""
+
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import httpx
+
+    HTTPX_AVAILABLE = True
+except ImportError:
+    httpx = None  # type: ignore[assignment]
+    HTTPX_AVAILABLE = False
+
+from .config import Settings
+from .jira_fetch import issue_dict_from_raw
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/rest/api/2"
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+COMMENT_PAGE_SIZE = 100
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class AsyncJiraFetcher:
+    """
+    Fetch Jira issues concurrently with a bounded number of requests in flight.
+
+    Use as an async context manager; all requests share one connection pool.
+    Issues come back in the same shape as ``jira_fetch.fetch_issue``: the
+    complete comment list, issue links and attachment metadata stay inside
+    ``raw["fields"]``.
+    """
+
+    def __init__(
+        self,
+        server: Optional[str] = None,
+        user: Optional[str] = None,
+        api_token: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff_seconds: Optional[float] = None,
+        max_delay_seconds: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ):
+        if not HTTPX_AVAILABLE:
+            raise ImportError(
+                "httpx is required for async Jira fetching; "
+                "install it with `pip install swecli[async]`"
+            )
+        server = server or Settings.JIRA_SERVER
+        user = user or Settings.JIRA_USER
+        api_token = api_token or Settings.JIRA_API_TOKEN
+        if not server:
+            raise ValueError("JIRA_SERVER environment variable is required")
+        if not user:
+            raise ValueError("JIRA_USER environment variable is required")
+        if not api_token:
+            raise ValueError("JIRA_API_TOKEN environment variable is required")
+        self.server = server
+        self.user = user
+        self.api_token = api_token
+
+        self.concurrency = max(1, concurrency or Settings.JIRA_ASYNC_CONCURRENCY)
+        self.max_retries = (
+            Settings.JIRA_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.backoff_seconds = (
+            Settings.JIRA_RETRY_BACKOFF_SECONDS
+            if backoff_seconds is None
+            else backoff_seconds
+        )
+        self.max_delay_seconds = (
+            Settings.JIRA_RETRY_MAX_DELAY_SECONDS
+            if max_delay_seconds is None
+            else max_delay_seconds
+        )
+        self.timeout = Settings.JIRA_TIMEOUT_SECONDS if timeout is None else timeout
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncJiraFetcher":
+        self._client = httpx.AsyncClient(
+            base_url=self.server.rstrip("/") + API_PREFIX,
+            auth=(self.user, self.api_token),
+            headers={"Accept": "application/json"},
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            timeout=self.timeout,
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        delay = _retry_after_seconds(retry_after)
+        if delay is None:
+            # Full jitter keeps concurrent workers from retrying in lockstep
+            delay = random.uniform(0, self.backoff_seconds * 2**attempt)
+        return min(delay, self.max_delay_seconds)
+
+    async def _get_json(
+        self, path: str, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        GET a Jira REST resource, retrying rate-limited and transient failures.
+
+        Args:
+            path: Resource path below /rest/api/2
+            params: Query parameters
+
+        Returns:
+            The decoded JSON body
+
+        Raises:
+            httpx.HTTPStatusError: For error responses that are not retried, or
+                when the retries are exhausted
+            httpx.TransportError: When the connection keeps failing
+        """
+        if self._client is None or self._semaphore is None:
+            raise RuntimeError("AsyncJiraFetcher must be used as 'async with'")
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                try:
+                    response = await self._client.get(path, params=params)
+                except httpx.TransportError as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = self._retry_delay(attempt, None)
+                    logger.warning(
+                        "GET %s failed (%s), retrying in %.1fs", path, e, delay
+                    )
+                else:
+                    if (
+                        response.status_code not in RETRY_STATUS_CODES
+                        or attempt >= self.max_retries
+                    ):
+                        response.raise_for_status()
+                        data: Dict[str, Any] = response.json()
+                        return data
+                    delay = self._retry_delay(
+                        attempt, response.headers.get("Retry-After")
+                    )
+                    logger.warning(
+                        "GET %s returned %d, retrying in %.1fs",
+                        path,
+                        response.status_code,
+                        delay,
+                    )
+            # Sleep outside of the semaphore so other requests can proceed
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _complete_comments(self, key: str, raw: Dict[str, Any]) -> None:
+        """Page in the comments the issue response did not include."""
+        comment = (raw.get("fields") or {}).get("comment")
+        if not isinstance(comment, dict):
+            return
+        comments = list(comment.get("comments") or [])
+        total = comment.get("total", len(comments))
+        while len(comments) < total:
+            page = await self._get_json(
+                f"issue/{key}/comment",
+                {"startAt": len(comments), "maxResults": COMMENT_PAGE_SIZE},
+            )
+            batch = page.get("comments") or []
+            if not batch:
+                break
+            comments.extend(batch)
+            total = page.get("total", total)
+        comment.update(
+            {"comments": comments, "startAt": 0, "maxResults": len(comments)}
+        )
+
+    async def fetch_issue(self, issue_key: str) -> dict:
+        """
+        Fetch one issue with its comments, links and attachment metadata.
+
+        Args:
+            issue_key: The Jira issue key, e.g. EP-1234
+
+        Returns:
+            The issue dict (same shape as ``jira_fetch.fetch_issue``)
+        """
+        logger.info("Fetching Jira issue %s (async)", issue_key)
+        raw = await self._get_json(f"issue/{issue_key}")
+        await self._complete_comments(raw.get("key", issue_key), raw)
+        return issue_dict_from_raw(raw)
+
+    async def fetch_issues(self, issue_keys: Iterable[str]) -> List[dict]:
+        """
+        Fetch several issues concurrently.
+
+        Keys are deduplicated; issues that cannot be fetched are logged and
+        left out.
+
+        Args:
+            issue_keys: Jira issue keys
+
+        Returns:
+            The fetched issues in the order of their keys
+        """
+        keys = list(dict.fromkeys(issue_keys))
+        results = await asyncio.gather(
+            *(self.fetch_issue(key) for key in keys), return_exceptions=True
+        )
+        issues = []
+        for key, result in zip(keys, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logger.warning("Could not fetch Jira issue %s: %s", key, result)
+            else:
+                issues.append(result)
+        return issues
+
+
+def fetch_issues_async(issue_keys: Iterable[str], **kwargs: Any) -> List[dict]:
+    """
+    Fetch several issues concurrently from synchronous code.
+
+    Args:
+        issue_keys: Jira issue keys
+        **kwargs: Options for AsyncJiraFetcher
+
+    Returns:
+        The fetched issues in the order of their keys
+    """
+
+    async def _run() -> List[dict]:
+        async with AsyncJiraFetcher(**kwargs) as fetcher:
+            return await fetcher.fetch_issues(issue_keys)
+
+    return asyncio.run(_run())
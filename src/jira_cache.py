@@ -0,0 +1,122 @@
+"""Persistent on-disk cache for fetched Jira issues."""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def issue_updated(issue: dict) -> Optional[str]:
+    """Return the Jira ``updated`` timestamp of an issue dict, if present."""
+    raw = issue.get("raw") or {}
+    fields = raw.get("fields") or {}
+    updated = fields.get("updated")
+    return str(updated) if updated is not None else None
+
+
+class IssueCache:
+    """
+    Directory of JSON files, one per issue key.
+
+    Entries older than ``ttl_seconds`` are treated as missing and removed, and
+    the least recently used entries are evicted once more than ``max_entries``
+    are stored. Callers are expected to revalidate hits against Jira's
+    ``updated`` timestamp before using them.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 500,
+    ):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+    def _path(self, issue_key: str) -> Path:
+        return self.cache_dir / f"{_UNSAFE_CHARS.sub('_', issue_key)}.json"
+
+    def get(self, issue_key: str) -> Optional[dict]:
+        """
+        Load a cached issue.
+
+        Args:
+            issue_key: The Jira issue key
+
+        Returns:
+            The cached issue dict, or None if missing, expired or unreadable
+        """
+        path = self._path(issue_key)
+        try:
+            age = time.time() - path.stat().st_mtime
+            if self.ttl_seconds > 0 and age > self.ttl_seconds:
+                logger.debug("Cached issue %s expired (%.0fs old)", issue_key, age)
+                path.unlink(missing_ok=True)
+                return None
+            issue = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable cache entry %s: %s", path, e)
+            return None
+        return issue if isinstance(issue, dict) else None
+
+    def touch(self, issue_key: str) -> None:
+        """Mark a cached issue as recently used."""
+        try:
+            os.utime(self._path(issue_key))
+        except OSError:
+            pass
+
+    def put(self, issue_key: str, issue: dict) -> None:
+        """
+        Store an issue, replacing any previous entry atomically.
+
+        Args:
+            issue_key: The Jira issue key
+            issue: The issue dict to cache
+        """
+        tmp_name = None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(issue, f)
+            os.replace(tmp_name, self._path(issue_key))
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("Failed to cache Jira issue %s: %s", issue_key, e)
+            if tmp_name is not None:
+                Path(tmp_name).unlink(missing_ok=True)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.max_entries <= 0:
+            return
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        entries.sort()
+        for _, path in entries[:excess]:
+            path.unlink(missing_ok=True)
+        logger.debug("Evicted %d cached Jira issues", excess)
+
+    def clear(self) -> None:
+        """Remove all cached issues."""
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
@@ -1,14 +1,49 @@
+import json
 import logging
-from typing import Any, Dict, Union
+import re
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
 
 from jira import JIRA
+from requests.adapters import HTTPAdapter
 
 from .config import Settings
+from .jira_cache import IssueCache, issue_updated
+from .mcp_output_utils import count_tokens, fit_to_token_limit
 
 logger = logging.getLogger(__name__)
 
+# Fields the prompt templates consume; bulk fetches request only these
+PROMPT_FIELDS = (
+    "summary",
+    "description",
+    "labels",
+    "issuetype",
+    "project",
+    "components",
+    "priority",
+    "status",
+    "updated",
+)
 
-def get_jira_client() -> JIRA:
+# Jira issue keys: project key, a dash and the issue number (matched
+# case-insensitively, like Jira does)
+ISSUE_KEY_PATTERN = re.compile(r"[A-Z][A-Z0-9_]*-[1-9][0-9]*", re.IGNORECASE)
+
+# Comments requested per page when paging backwards through an issue's comments
+COMMENT_PAGE_SIZE = 50
+
+
+class _ClientState:
+    client: Optional[JIRA] = None
+    cache: Optional[IssueCache] = None
+    lock = threading.Lock()
+
+
+_state = _ClientState()
+
+
+def _create_jira_client() -> JIRA:
     logger.debug(
         "Initializing Jira client for server=%s user=%s",
         Settings.JIRA_SERVER,
@@ -23,15 +58,48 @@ def get_jira_client() -> JIRA:
         raise ValueError("JIRA_API_TOKEN environment variable is required")
 
     options: Dict[str, Union[str, bool, Any]] = {"server": Settings.JIRA_SERVER}
-    return JIRA(
+    client = JIRA(
         options=options, basic_auth=(Settings.JIRA_USER, Settings.JIRA_API_TOKEN)
     )
 
+    # Size the keep-alive pool so concurrent workers reuse connections instead
+    # of opening (and TLS-handshaking) a new one per request.
+    pool_size = max(1, Settings.JIRA_POOL_SIZE)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    client._session.mount("https://", adapter)  # pylint: disable=protected-access
+    client._session.mount("http://", adapter)  # pylint: disable=protected-access
+    return client
 
-def fetch_issue(issue_key: str) -> dict:
-    logger.info("Fetching Jira issue: %s", issue_key)
-    jira = get_jira_client()
-    issue = jira.issue(issue_key)
+
+def get_jira_client() -> JIRA:
+    """
+    Return the process-wide Jira client, creating it on first use.
+
+    The client (and its HTTP session) is shared by all threads, so the
+    authentication and server-info round trips are paid once per process.
+
+    Returns:
+        The shared JIRA client
+    """
+    if _state.client is None:
+        with _state.lock:
+            if _state.client is None:
+                _state.client = _create_jira_client()
+    return _state.client
+
+
+def reset_jira_client() -> None:
+    """Drop the shared Jira client and close its pooled connections."""
+    with _state.lock:
+        client, _state.client = _state.client, None
+    if client is not None:
+        try:
+            client.close()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.debug("Failed to close Jira client: %s", e)
+
+
+def _issue_to_dict(issue: Any) -> dict:
     fields = issue.fields
     logger.debug(
         "Fetched issue fields for %s; issuetype=%s project=%s labels=%s",
@@ -42,7 +110,7 @@ def fetch_issue(issue_key: str) -> dict:
     )
     return {
         "key": issue.key,
-        "summary": fields.summary,
+        "summary": getattr(fields, "summary", None),
         "description": getattr(fields, "description", None),
         "labels": list(getattr(fields, "labels", []) or []),
         "issuetype": (
@@ -51,3 +119,271 @@ def fetch_issue(issue_key: str) -> dict:
         "project": fields.project.key if getattr(fields, "project", None) else None,
         "raw": issue.raw,
     }
+
+
+def issue_dict_from_raw(raw: Dict[str, Any]) -> dict:
+    """
+    Build the issue dict returned by ``fetch_issue`` from Jira REST JSON.
+
+    Args:
+        raw: The JSON of ``GET /rest/api/2/issue/{key}``
+
+    Returns:
+        The issue dict with the commonly used fields lifted out of ``raw``
+    """
+    fields = raw.get("fields") or {}
+    return {
+        "key": raw.get("key"),
+        "summary": fields.get("summary"),
+        "description": fields.get("description"),
+        "labels": list(fields.get("labels") or []),
+        "issuetype": (fields.get("issuetype") or {}).get("name"),
+        "project": (fields.get("project") or {}).get("key"),
+        "raw": raw,
+    }
+
+
+def get_issue_cache() -> IssueCache:
+    """Return the process-wide on-disk issue cache configured from Settings."""
+    if _state.cache is None:
+        with _state.lock:
+            if _state.cache is None:
+                _state.cache = IssueCache(
+                    Settings.JIRA_CACHE_DIR,
+                    ttl_seconds=Settings.JIRA_CACHE_TTL_SECONDS,
+                    max_entries=Settings.JIRA_CACHE_MAX_ENTRIES,
+                )
+    return _state.cache
+
+
+def fetch_issue(issue_key: str, use_cache: bool = False) -> dict:
+    """
+    Fetch a single issue with all of its fields.
+
+    With ``use_cache`` a previously fetched copy is reused as long as the
+    issue's ``updated`` timestamp is unchanged, which costs one request for
+    that single field instead of the whole issue.
+
+    Args:
+        issue_key: The Jira issue key
+        use_cache: Whether to consult and fill the on-disk issue cache
+
+    Returns:
+        The issue dict
+    """
+    jira = get_jira_client()
+
+    if use_cache:
+        cache = get_issue_cache()
+        cached = cache.get(issue_key)
+        cached_updated = issue_updated(cached) if cached else None
+        if cached is not None and cached_updated is not None:
+            current = jira.issue(issue_key, fields="updated")
+            if issue_updated({"raw": current.raw}) == cached_updated:
+                logger.info("Using cached Jira issue: %s", issue_key)
+                cache.touch(issue_key)
+                return cached
+            logger.debug("Cached Jira issue %s is stale", issue_key)
+
+    logger.info("Fetching Jira issue: %s", issue_key)
+    result = _issue_to_dict(jira.issue(issue_key))
+    if use_cache:
+        get_issue_cache().put(issue_key, result)
+    return result
+
+
+def _comment_to_dict(comment: Dict[str, Any]) -> dict:
+    return {
+        "author": (comment.get("author") or {}).get("displayName"),
+        "created": comment.get("created"),
+        "body": comment.get("body"),
+    }
+
+
+def _comments_newest_first(
+    jira: JIRA, issue_key: str, page_size: int
+) -> Iterator[Dict[str, Any]]:
+    # Comments are only listed oldest first on every Jira version, so probe the
+    # total and page backwards from the end
+    path = f"issue/{issue_key}/comment"
+    get_json = jira._get_json  # pylint: disable=protected-access
+    end = get_json(path, params={"startAt": 0, "maxResults": 0}).get("total", 0)
+    while end > 0:
+        start = max(0, end - page_size)
+        page = get_json(path, params={"startAt": start, "maxResults": end - start})
+        comments = page.get("comments") or []
+        if not comments:
+            return
+        if len(comments) < end - start:
+            # The server caps maxResults; retry the page at its size
+            page_size = len(comments)
+            continue
+        yield from reversed(comments)
+        end = start
+
+
+def fetch_comments(
+    issue_key: str,
+    max_tokens: int,
+    model: Optional[str] = None,
+    page_size: int = COMMENT_PAGE_SIZE,
+) -> List[dict]:
+    """
+    Fetch an issue's comments newest first until a token budget is used up.
+
+    Pages are only requested while the budget lasts, so long-running tickets
+    do not download hundreds of old comments. If even the newest comment does
+    not fit, its body is truncated.
+
+    Args:
+        issue_key: The Jira issue key
+        max_tokens: Token budget for all comments together
+        model: The model name to use for token counting
+        page_size: Number of comments requested per page
+
+    Returns:
+        Comment dicts (author, created, body), newest first
+    """
+    model = model or Settings.MODEL_NAME
+    jira = get_jira_client()
+    comments: List[dict] = []
+    used = 0
+    for raw_comment in _comments_newest_first(jira, issue_key, page_size):
+        comment = _comment_to_dict(raw_comment)
+        tokens = count_tokens(json.dumps(comment), model)
+        if used + tokens > max_tokens:
+            if not comments and isinstance(comment["body"], str):
+                overhead = count_tokens(json.dumps({**comment, "body": ""}), model)
+                comment["body"] = fit_to_token_limit(
+                    comment["body"], max(0, max_tokens - overhead), model
+                )
+                comments.append(comment)
+            break
+        comments.append(comment)
+        used += tokens
+    logger.info(
+        "Fetched %d comments of %s within %d tokens",
+        len(comments),
+        issue_key,
+        max_tokens,
+    )
+    return comments
+
+
+def attach_comments(issue: dict, max_tokens: int) -> dict:
+    """
+    Return a copy of the issue with its newest comments under "comments".
+
+    The unbounded comment field of the raw payload is removed so that
+    comments are not included twice.
+
+    Args:
+        issue: The issue dict
+        max_tokens: Token budget for all comments together
+
+    Returns:
+        The issue dict with a "comments" list
+    """
+    result = {**issue, "comments": fetch_comments(issue["key"], max_tokens)}
+    raw = issue.get("raw")
+    if isinstance(raw, dict) and isinstance(raw.get("fields"), dict):
+        fields = {k: v for k, v in raw["fields"].items() if k != "comment"}
+        result["raw"] = {**raw, "fields": fields}
+    return result
+
+
+def _search_pages(
+    jira: JIRA,
+    jql: str,
+    fields: str,
+    page_size: int,
+    validate_query: bool = True,
+    limit: Optional[int] = None,
+) -> Iterator[Any]:
+    start = 0
+    while limit is None or start < limit:
+        page = jira.search_issues(
+            jql,
+            startAt=start,
+            maxResults=page_size,
+            fields=fields,
+            validate_query=validate_query,
+        )
+        yield from page
+        start += len(page)
+        if len(page) < page_size:
+            return
+
+
+def is_issue_key(key: str) -> bool:
+    """Return whether a string is a well-formed Jira issue key."""
+    return ISSUE_KEY_PATTERN.fullmatch(key) is not None
+
+
+def fetch_issues(
+    keys: Optional[Iterable[str]] = None,
+    jql: Optional[str] = None,
+    fields: Optional[Sequence[str]] = PROMPT_FIELDS,
+    page_size: int = 100,
+    missing: Optional[List[str]] = None,
+) -> Iterator[dict]:
+    """
+    Fetch many issues through paged JQL searches.
+
+    Exactly one of ``keys`` and ``jql`` must be given. Issues are yielded page
+    by page as they arrive, so memory use does not grow with the result size.
+
+    Args:
+        keys: Issue keys to fetch (searched ``page_size`` keys at a time)
+        jql: JQL query selecting the issues to fetch
+        fields: Jira fields to request; None requests all fields
+        page_size: Number of issues requested per search page
+        missing: If given, the requested keys that do not exist are appended
+            to it as their chunks are searched; malformed keys are appended
+            (and never searched) as well
+
+    Returns:
+        Iterator of issue dicts shaped like the result of ``fetch_issue``
+    """
+    if (keys is None) == (jql is None):
+        raise ValueError("Provide exactly one of keys or jql")
+
+    field_list = ",".join(fields) if fields else "*all"
+    jira = get_jira_client()
+
+    if jql is not None:
+        logger.info("Searching Jira issues: %s", jql)
+        for issue in _search_pages(jira, jql, field_list, page_size):
+            yield _issue_to_dict(issue)
+        return
+
+    key_list = []
+    for key in dict.fromkeys(keys or []):
+        if is_issue_key(key):
+            key_list.append(key)
+            continue
+        logger.warning("Skipping malformed Jira issue key %r", key)
+        if missing is not None:
+            missing.append(key)
+    for offset in range(0, len(key_list), page_size):
+        chunk = key_list[offset : offset + page_size]
+        logger.info("Fetching %d Jira issues by key", len(chunk))
+        found = set()
+        # Unknown keys must not fail the whole chunk, so skip strict validation
+        chunk_jql = "key in ({})".format(", ".join(f'"{key}"' for key in chunk))
+        for issue in _search_pages(
+            jira,
+            chunk_jql,
+            field_list,
+            page_size,
+            validate_query=False,
+            limit=len(chunk),
+        ):
+            # Jira matches keys case-insensitively
+            found.add(issue.key.upper())
+            yield _issue_to_dict(issue)
+        not_found = [key for key in chunk if key.upper() not in found]
+        if not_found:
+            logger.warning("Jira issues not found: %s", ", ".join(not_found))
+            if missing is not None:
+                missing.extend(not_found)
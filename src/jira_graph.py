@@ -0,0 +1,215 @@
+"""Depth-limited expansion of an issue's links, subtasks and parent/epic."""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import Settings
+from .jira_fetch import fetch_issues
+from .mcp_output_utils import count_tokens, fit_to_token_limit
+
+logger = logging.getLogger(__name__)
+
+# Fields linked_issue_keys reads, besides the configured epic link field
+LINK_FIELDS = ("issuelinks", "subtasks", "parent")
+
+# Fields needed to summarize a neighbor and to find its own neighbors
+RELATED_FIELDS = ("summary", "description", "status", "issuetype") + LINK_FIELDS
+
+# Keys per search request; levels with more keys are searched concurrently
+GRAPH_CHUNK_SIZE = 10
+
+
+def _epic_fields() -> Tuple[str, ...]:
+    epic_field = Settings.JIRA_EPIC_LINK_FIELD
+    return (epic_field,) if epic_field else ()
+
+
+def link_fields() -> Tuple[str, ...]:
+    """
+    Return the Jira fields an issue needs for ``linked_issue_keys``.
+
+    Bulk fetches that project fields must request these for the issues
+    whose neighbors are walked.
+
+    Returns:
+        LINK_FIELDS plus JIRA_EPIC_LINK_FIELD when it is configured
+    """
+    return LINK_FIELDS + _epic_fields()
+
+
+def linked_issue_keys(issue: dict) -> List[Tuple[str, str]]:
+    """
+    List the issues an issue points to, with the kind of relation.
+
+    Args:
+        issue: An issue dict shaped like the result of ``fetch_issue``
+
+    Returns:
+        (key, relation) pairs for issue links (e.g. "blocks", "is blocked
+        by"), subtasks, the parent issue and the epic
+    """
+    fields = (issue.get("raw") or {}).get("fields") or {}
+    neighbors = []
+    for link in fields.get("issuelinks") or []:
+        link_type = link.get("type") or {}
+        if "outwardIssue" in link:
+            target = link["outwardIssue"]
+            relation = link_type.get("outward") or link_type.get("name")
+        elif "inwardIssue" in link:
+            target = link["inwardIssue"]
+            relation = link_type.get("inward") or link_type.get("name")
+        else:
+            continue
+        if target.get("key"):
+            neighbors.append((target["key"], relation or "relates to"))
+    for subtask in fields.get("subtasks") or []:
+        if subtask.get("key"):
+            neighbors.append((subtask["key"], "subtask"))
+    parent = fields.get("parent")
+    if isinstance(parent, dict) and parent.get("key"):
+        parent_type = ((parent.get("fields") or {}).get("issuetype") or {}).get("name")
+        neighbors.append((parent["key"], "epic" if parent_type == "Epic" else "parent"))
+    epic_field = Settings.JIRA_EPIC_LINK_FIELD
+    if epic_field and isinstance(fields.get(epic_field), str):
+        neighbors.append((fields[epic_field], "epic"))
+    return neighbors
+
+
+def summarize_related_issue(
+    issue: dict,
+    relation: str,
+    depth: int,
+    via: str,
+    max_tokens: int,
+    model: str = "gpt-4",
+) -> dict:
+    """
+    Reduce a neighboring issue to the essentials, within a token budget.
+
+    Args:
+        issue: The neighbor's issue dict
+        relation: How the neighbor relates to ``via``
+        depth: Number of hops from the root issue
+        via: Key of the issue the neighbor was reached from
+        max_tokens: Token budget for the summary
+        model: The model name to use for token counting
+
+    Returns:
+        A dict with key, relation, type, status, summary and (as far as the
+        budget allows) the description
+    """
+    fields = (issue.get("raw") or {}).get("fields") or {}
+    summary = {
+        "key": issue.get("key"),
+        "relation": relation,
+        "issuetype": issue.get("issuetype"),
+        "status": (fields.get("status") or {}).get("name"),
+        "summary": issue.get("summary"),
+    }
+    if depth > 1:
+        summary["via"] = via
+    description = issue.get("description")
+    if isinstance(description, str) and description:
+        overhead = count_tokens(json.dumps(summary), model)
+        budget = max_tokens - overhead
+        if budget > 0:
+            summary["description"] = fit_to_token_limit(description, budget, model)
+    return summary
+
+
+def _fetch_level(keys: Sequence[str]) -> Dict[str, dict]:
+    chunks = [
+        list(keys[i : i + GRAPH_CHUNK_SIZE])
+        for i in range(0, len(keys), GRAPH_CHUNK_SIZE)
+    ]
+    fields = RELATED_FIELDS + _epic_fields()
+    workers = max(1, min(len(chunks), Settings.JIRA_POOL_SIZE))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            lambda chunk: list(fetch_issues(keys=chunk, fields=fields)),
+            chunks,
+        )
+        return {issue["key"]: issue for batch in results for issue in batch}
+
+
+def fetch_related_issues(
+    issue: dict,
+    depth: int,
+    max_tokens: Optional[int] = None,
+    max_issues: Optional[int] = None,
+    model: Optional[str] = None,
+) -> List[dict]:
+    """
+    Walk the issue graph breadth first and summarize every neighbor.
+
+    Each level is fetched with concurrent bulk searches; every issue is
+    fetched and listed at most once, at its shortest distance from the root.
+
+    Args:
+        issue: The root issue dict (with its raw fields)
+        depth: Maximum number of hops from the root issue
+        max_tokens: Token budget per neighbor summary; defaults to
+            JIRA_RELATED_TOKENS
+        max_issues: Maximum number of neighbors; defaults to
+            JIRA_RELATED_MAX_ISSUES
+        model: The model name to use for token counting
+
+    Returns:
+        Neighbor summaries ordered by distance from the root
+    """
+    max_tokens = Settings.JIRA_RELATED_TOKENS if max_tokens is None else max_tokens
+    max_issues = Settings.JIRA_RELATED_MAX_ISSUES if max_issues is None else max_issues
+    model = model or Settings.MODEL_NAME
+
+    root: str = issue["key"]
+    seen = {root}
+    related: List[dict] = []
+    frontier = [(key, relation, root) for key, relation in linked_issue_keys(issue)]
+    for level in range(1, depth + 1):
+        edges: Dict[str, Tuple[str, str]] = {}
+        for key, relation, via in frontier:
+            if key not in seen and key not in edges:
+                edges[key] = (relation, via)
+        keys = list(edges)[: max(0, max_issues - len(related))]
+        if not keys:
+            break
+        seen.update(keys)
+        logger.info("Fetching %d related Jira issues at depth %d", len(keys), level)
+        fetched = _fetch_level(keys)
+
+        frontier = []
+        for key in keys:
+            neighbor = fetched.get(key)
+            if neighbor is None:
+                continue
+            relation, via = edges[key]
+            related.append(
+                summarize_related_issue(
+                    neighbor, relation, level, via, max_tokens, model
+                )
+            )
+            frontier.extend((k, r, key) for k, r in linked_issue_keys(neighbor))
+    return related
+
+
+def attach_related_issues(
+    issue: dict, depth: int, max_tokens: Optional[int] = None
+) -> dict:
+    """
+    Return a copy of the issue with its neighbors under "related_issues".
+
+    Args:
+        issue: The root issue dict
+        depth: Maximum number of hops from the root issue
+        max_tokens: Token budget per neighbor summary
+
+    Returns:
+        The issue dict, extended if any related issues were found
+    """
+    related = fetch_related_issues(issue, depth, max_tokens)
+    if not related:
+        return issue
+    logger.info("Attached %d related issues to %s", len(related), issue.get("key"))
+    return {**issue, "related_issues": related}
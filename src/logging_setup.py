@@ -2,6 +2,7 @@ import json
 import logging
 import os
 import sys
+from typing import Optional, TextIO
 
 
 class _ConfigurationState:
@@ -31,9 +32,12 @@ class JsonFormatter(logging.Formatter):
         return _json_formatter(record)
 
 
-def configure_logging() -> None:
+def configure_logging(stream: Optional[TextIO] = None) -> None:
     """
     Configure root logger exactly once.
+    Console logs go to ``stream`` (default: sys.stdout at call time);
+    processes that speak a protocol on stdout (like the MCP proxy) pass
+    sys.stderr.
     ENV:
       LOG_LEVEL=DEBUG|INFO|WARNING|ERROR|CRITICAL (default INFO)
       LOG_FORMAT=json|plain (default plain)
@@ -54,7 +58,7 @@ def configure_logging() -> None:
         root.removeHandler(h)
 
     # Console handler
-    ch = logging.StreamHandler(stream=sys.stdout)
+    ch = logging.StreamHandler(stream=sys.stdout if stream is None else stream)
     if fmt == "json":
         ch.setFormatter(JsonFormatter())
     else:
@@ -1,22 +1,48 @@
 import argparse
-import json
 import logging
 import os
 import sys
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from pathlib import Path
+from typing import Iterable, Optional, Sequence
 
-from .codex_codegen import run_codex
+from .codex_codegen import cancel_codex_runs, run_codex
 from .config import Settings
-from .jira_fetch import fetch_issue
+from .jira_fetch import (
+    PROMPT_FIELDS,
+    attach_comments,
+    fetch_issue,
+    fetch_issues,
+    is_issue_key,
+)
+from .jira_graph import attach_related_issues, link_fields
 from .logging_setup import configure_logging
 from .mcp_context import build_context_instructions
 from .mcp_output_utils import (
     RESPONSE_TOKEN_RESERVE,
     count_tokens,
-    estimate_prompt_tokens,
+    fit_to_token_limit,
     get_context_window_limit,
-    summarize_large_content,
 )
+from .prompt_budget import (
+    ADDITIONAL_INSTRUCTIONS,
+    CONTEXT_INSTRUCTIONS,
+    ISSUE_RENDERERS,
+    JOIN_SLACK_TOKENS,
+    TokenCounter,
+    assemble_prompt,
+    get_issue_renderer,
+    render_issue_pretty,
+    report_rendering_savings,
+)
+from .prompt_templates import load_template
 
 
 def _parse_repos(val: str) -> list[str]:
@@ -25,16 +51,15 @@ def _parse_repos(val: str) -> list[str]:
     return [p for p in parts if p]
 
 
-def _manage_prompt_size(prompt: str, model: str) -> str:
+def _prompt_token_limits(model: str) -> tuple[int, int, int]:
     """
-    Ensure prompt fits within context window limits.
+    Work out the token limits for a prompt.
 
     Args:
-        prompt: The full prompt text
         model: The model name to check limits for
 
     Returns:
-        Potentially truncated prompt that fits within context limits
+        The context window, the usable part of it and the prompt budget
     """
     logger = logging.getLogger(__name__)
 
@@ -57,6 +82,30 @@ def _manage_prompt_size(prompt: str, model: str) -> str:
 
     usable_tokens = int(context_limit * safety_margin)
     max_prompt_tokens = usable_tokens - RESPONSE_TOKEN_RESERVE
+    if max_prompt_tokens < usable_tokens // 2:
+        # Small context windows cannot afford the full response reserve
+        logger.warning(
+            "Context window too small for the %d token response reserve, "
+            "keeping half of it for the prompt",
+            RESPONSE_TOKEN_RESERVE,
+        )
+        max_prompt_tokens = usable_tokens // 2
+    return context_limit, usable_tokens, max_prompt_tokens
+
+
+def _manage_prompt_size(prompt: str, model: str) -> str:
+    """
+    Ensure prompt fits within context window limits.
+
+    Args:
+        prompt: The full prompt text
+        model: The model name to check limits for
+
+    Returns:
+        Potentially truncated prompt that fits within context limits
+    """
+    logger = logging.getLogger(__name__)
+    context_limit, usable_tokens, max_prompt_tokens = _prompt_token_limits(model)
 
     # Count current tokens
     current_tokens = count_tokens(prompt, model)
@@ -79,15 +128,9 @@ def _manage_prompt_size(prompt: str, model: str) -> str:
         max_prompt_tokens,
     )
 
-    # Calculate target length to achieve token limit
-    # Use a ratio based approach since token counting might not be exact
-    ratio = max_prompt_tokens / current_tokens
-    target_char_length = int(len(prompt) * ratio * 0.9)  # Extra safety margin
+    # Cut on token boundaries; the result is guaranteed to fit
+    truncated_prompt = fit_to_token_limit(prompt, max_prompt_tokens, model)
 
-    # Use smart summarization
-    truncated_prompt = summarize_large_content(prompt, target_char_length)
-
-    # Verify the result
     final_tokens = count_tokens(truncated_prompt, model)
     logger.info(
         "Prompt after truncation: %d tokens (%d characters)",
@@ -98,12 +141,213 @@ def _manage_prompt_size(prompt: str, model: str) -> str:
     return truncated_prompt
 
 
+def _parse_issue_keys(text: str) -> list[str]:
+    # one or more keys per line (comma or space separated); '#' starts a comment
+    keys: list[str] = []
+    for line in text.splitlines():
+        for key in _parse_repos(line.split("#", 1)[0]):
+            if key not in keys:
+                keys.append(key)
+    return keys
+
+
+def _prepare_prompt(
+    issue: dict,
+    ctx: str,
+    generate_tests: bool,
+    additional_instructions: str,
+    json_mode: Optional[str] = None,
+    template_dir: Optional[str] = None,
+) -> str:
+    logger = logging.getLogger(__name__)
+
+    # Select prompt based on whether test generation is requested
+    prompt_file = "codegen_with_tests.md" if generate_tests else "codegen.md"
+    template = load_template(prompt_file, template_dir or Settings.PROMPT_TEMPLATE_DIR)
+
+    # Shrink the Jira JSON (then the instructions) rather than the template
+    model = Settings.MODEL_NAME
+    logger.info("Managing prompt size for model: %s", model)
+    _, _, max_prompt_tokens = _prompt_token_limits(model)
+    sections = {
+        CONTEXT_INSTRUCTIONS: ctx,
+        ADDITIONAL_INSTRUCTIONS: additional_instructions,
+    }
+    render = get_issue_renderer(json_mode or Settings.JIRA_JSON_MODE)
+    counter = TokenCounter(model)
+    if render is not render_issue_pretty:
+        report_rendering_savings(issue, render, counter)
+    prompt, prompt_tokens = assemble_prompt(
+        template, issue, sections, max_prompt_tokens, counter, render
+    )
+    logger.info("Prompt assembled: %d tokens", prompt_tokens)
+
+    # The total is derived from the parts; only when it is close to the limit
+    # is the whole prompt counted (and, if needed, truncated) once more
+    joins = len(template.placeholders)
+    if prompt_tokens + JOIN_SLACK_TOKENS * joins > max_prompt_tokens:
+        prompt = _manage_prompt_size(prompt, model)
+    return prompt
+
+
+def _process_issue(issue: dict, args: argparse.Namespace, ctx: str) -> int:
+    """
+    Run the comments/related issues -> prompt -> Codex pipeline for one issue.
+
+    Args:
+        issue: The Jira issue dict to process
+        args: Parsed command line arguments
+        ctx: Pre-built MCP context instructions (shared by all issues of a run)
+
+    Returns:
+        The Codex exit code, or 1 if the issue's own workspace does not exist
+    """
+    logger = logging.getLogger(__name__)
+    # "{issue}" in --workspace gives every issue of a batch its own checkout
+    ws = Path(args.workspace.replace("{issue}", issue["key"])).expanduser().resolve()
+    if "{issue}" in args.workspace and not ws.is_dir():
+        logger.error("Workspace %s for issue %s does not exist", ws, issue["key"])
+        return 1
+
+    if args.comment_tokens > 0:
+        issue = attach_comments(issue, args.comment_tokens)
+    if args.related_depth > 0:
+        issue = attach_related_issues(issue, args.related_depth, args.related_tokens)
+    prompt = _prepare_prompt(
+        issue,
+        ctx,
+        args.generate_tests,
+        args.additional_instructions or "",
+        args.json_mode,
+        args.template_dir,
+    )
+    return run_codex(prompt, ws)
+
+
+def _run_batch(
+    issues: Iterable[dict],
+    args: argparse.Namespace,
+    ctx: str,
+    missing: Sequence[str] = (),
+) -> int:
+    """
+    Process many issues on a bounded worker pool.
+
+    Issues are consumed from ``issues`` while earlier ones are still running, so
+    paged Jira fetches, prompt preparation and Codex executions overlap. At most
+    twice the pool size of fetched issues are held in memory at any time.
+
+    Args:
+        issues: Iterator of fetched Jira issue dicts
+        args: Parsed command line arguments
+        ctx: Pre-built MCP context instructions
+        missing: Requested issue keys that do not exist or are malformed; read
+            once ``issues`` is exhausted and reported as failed
+
+    Returns:
+        0 if every issue succeeded, 1 otherwise (also when fetching the
+        issues failed part way)
+    """
+    logger = logging.getLogger(__name__)
+    concurrency = max(1, args.concurrency)
+    if concurrency > 1 and "{issue}" not in args.workspace:
+        # Codex runs with full access to its workspace; parallel runs must not
+        # edit the same checkout
+        logger.warning(
+            "--workspace %s has no '{issue}' placeholder, so all issues share "
+            "one checkout: running the batch with concurrency=1",
+            args.workspace,
+        )
+        concurrency = 1
+    logger.info("Starting batch with concurrency=%d", concurrency)
+
+    def _timed(issue: dict) -> tuple[int, float]:
+        started = time.monotonic()
+        try:
+            rc = _process_issue(issue, args, ctx)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Processing failed for issue=%s", issue["key"])
+            rc = 1
+        return rc, time.monotonic() - started
+
+    def _record(future: "Future[tuple[int, float]]", key: str) -> None:
+        results[key] = future.result()
+        logger.info("Issue %s finished with exit code=%d (%.1fs)", key, *results[key])
+
+    batch_started = time.monotonic()
+    results: dict[str, tuple[int, float]] = {}
+    order: list[str] = []
+    in_flight: dict["Future[tuple[int, float]]", str] = {}
+    fetch_failed = False
+    with ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="swecli"
+    ) as pool:
+        try:
+            try:
+                for issue in issues:
+                    if len(in_flight) >= 2 * concurrency:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            _record(future, in_flight.pop(future))
+                    order.append(issue["key"])
+                    in_flight[pool.submit(_timed, issue)] = issue["key"]
+            except Exception:  # pylint: disable=broad-exception-caught
+                # e.g. a failing search page or invalid JQL: finish the issues
+                # already fetched and report the batch as failed
+                fetch_failed = True
+                logger.exception(
+                    "Fetching Jira issues failed after %d issues", len(order)
+                )
+            for future in as_completed(in_flight):
+                _record(future, in_flight[future])
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, stopping running Codex processes")
+            for future in in_flight:
+                future.cancel()
+            cancel_codex_runs()
+            raise
+    wall_time = time.monotonic() - batch_started
+    not_found = [key for key in missing if key not in results]
+    for key in not_found:
+        order.append(key)
+        results[key] = (1, 0.0)
+
+    if not order and not fetch_failed:
+        raise SystemExit("No Jira issues selected for the batch run")
+
+    failed = [key for key in order if results[key][0] != 0]
+    logger.info("Batch summary:")
+    for key in order:
+        if key in not_found and not is_issue_key(key):
+            logger.info("  %s: invalid issue key", key)
+        elif key in not_found:
+            logger.info("  %s: not found in Jira", key)
+        else:
+            logger.info("  %s: exit=%d duration=%.1fs", key, *results[key])
+    logger.info(
+        "Batch finished: %d issues, %d succeeded, %d failed, wall time %.1fs",
+        len(order),
+        len(order) - len(failed),
+        len(failed),
+        wall_time,
+    )
+    if fetch_failed:
+        logger.error("Batch incomplete: fetching the Jira issues failed")
+    return 1 if failed or fetch_failed else 0
+
+
 def main() -> None:
     configure_logging()
     logger = logging.getLogger(__name__)
 
     ap = argparse.ArgumentParser()
-    ap.add_argument("--jira", required=True, help="Jira issue key, e.g., EP-1234")
+    source = ap.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jira", help="Jira issue key, e.g., EP-1234")
+    source.add_argument(
+        "--jira-file",
+        help="File with Jira issue keys to process as a batch (one or more per line)",
+    )
+    source.add_argument("--jql", help="JQL query selecting the issues to process")
     ap.add_argument("--ado-org", default=Settings.ADO_ORG)
     ap.add_argument("--ado-project", default=Settings.ADO_PROJECT)
     ap.add_argument(
@@ -115,7 +359,10 @@ def main() -> None:
         "--workspace",
         required=False,
         default=os.getcwd(),
-        help="Directory where code changes should be applied",
+        help=(
+            "Directory where code changes should be applied; "
+            "'{issue}' is replaced by the issue key"
+        ),
     )
     ap.add_argument(
         "--generate-tests",
@@ -129,50 +376,86 @@ def main() -> None:
         required=False,
         help="Additional instructions to include in the prompt for Codex",
     )
+    ap.add_argument(
+        "--comment-tokens",
+        type=int,
+        default=Settings.JIRA_COMMENT_TOKENS,
+        help="Token budget for the newest Jira comments in the prompt (0 = none)",
+    )
+    ap.add_argument(
+        "--related-depth",
+        type=int,
+        default=Settings.JIRA_RELATED_DEPTH,
+        help="Add linked issues, subtasks and the parent/epic up to this many hops",
+    )
+    ap.add_argument(
+        "--related-tokens",
+        type=int,
+        default=Settings.JIRA_RELATED_TOKENS,
+        help="Token budget for the summary of each related issue",
+    )
+    ap.add_argument(
+        "--template-dir",
+        default=Settings.PROMPT_TEMPLATE_DIR,
+        help="Directory with custom prompt templates (falls back to prompts/)",
+    )
+    ap.add_argument(
+        "--json-mode",
+        choices=sorted(ISSUE_RENDERERS),
+        default=Settings.JIRA_JSON_MODE,
+        help="How the Jira issue is rendered into the prompt (compact saves tokens)",
+    )
+    ap.add_argument(
+        "--concurrency",
+        type=int,
+        default=Settings.BATCH_CONCURRENCY,
+        help="Number of issues processed in parallel in batch mode",
+    )
+    ap.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always download the Jira issue instead of using the on-disk cache",
+    )
     args = ap.parse_args()
 
     ado_repos = _parse_repos(args.ado_repo or Settings.ADO_REPO or "")
     if not ado_repos:
         raise SystemExit("Provide at least one repo via --ado-repo or ADO_REPO env var")
 
+    ctx = build_context_instructions(args.ado_org, args.ado_project, ado_repos)
+
+    if args.jira:
+        logger.info(
+            "Starting run for issue=%s org=%s project=%s repos=%s",
+            args.jira,
+            args.ado_org,
+            args.ado_project,
+            ",".join(ado_repos),
+        )
+        issue = fetch_issue(args.jira, use_cache=not args.no_cache)
+        sys.exit(_process_issue(issue, args, ctx))
+
     logger.info(
-        "Starting run for issue=%s org=%s project=%s repos=%s",
-        args.jira,
+        "Starting batch run for %s org=%s project=%s repos=%s",
+        args.jira_file or args.jql,
         args.ado_org,
         args.ado_project,
         ",".join(ado_repos),
     )
-
-    issue = fetch_issue(args.jira)
-    ctx = build_context_instructions(args.ado_org, args.ado_project, ado_repos)
-
-    # Select prompt based on whether test generation is requested
-    prompt_file = (
-        "prompts/codegen_with_tests.md" if args.generate_tests else "prompts/codegen.md"
-    )
-    prompt = Path(prompt_file).read_text(encoding="utf-8")
-    prompt = prompt.replace("{{JIRA_JSON}}", json.dumps(issue, indent=2))
-    prompt = prompt.replace("{{CONTEXT_INSTRUCTIONS}}", ctx)
-
-    # Add additional instructions if provided
-    additional_instructions = args.additional_instructions or ""
-    prompt = prompt.replace("{{ADDITIONAL_INSTRUCTIONS}}", additional_instructions)
-
-    # Estimate and manage prompt size to fit within context window
-    logger.info("Managing prompt size for model: %s", Settings.MODEL_NAME)
-    jira_json = json.dumps(issue, indent=2)
-    # Include additional instructions in token estimation
-    additional_instructions_for_estimation = args.additional_instructions or ""
-    estimated_tokens = estimate_prompt_tokens(
-        jira_json, ctx + additional_instructions_for_estimation, prompt
-    )
-    logger.info("Estimated prompt tokens before processing: %d", estimated_tokens)
-
-    # Apply context window management
-    managed_prompt = _manage_prompt_size(prompt, Settings.MODEL_NAME)
-
-    ws = Path(args.workspace).expanduser().resolve()
-    sys.exit(run_codex(managed_prompt, ws))
+    fields: Sequence[str] = PROMPT_FIELDS
+    if args.related_depth > 0:
+        # The graph walk starts from the links of each fetched issue
+        fields = PROMPT_FIELDS + link_fields()
+    missing: list[str] = []
+    if args.jira_file:
+        issues = fetch_issues(
+            keys=_parse_issue_keys(Path(args.jira_file).read_text(encoding="utf-8")),
+            fields=fields,
+            missing=missing,
+        )
+    else:
+        issues = fetch_issues(jql=args.jql, fields=fields)
+    sys.exit(_run_batch(issues, args, ctx, missing))
 
 
 if __name__ == "__main__":
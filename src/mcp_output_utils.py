@@ -1,20 +1,64 @@
 """Utilities for handling large MCP tool outputs and preventing string length errors."""
 
+import codecs
+import importlib.util
+import itertools
 import logging
-from typing import Any, Dict, Union
+import mmap
+import os
+import sys
+import threading
+from array import array
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-try:
-    import tiktoken
-
-    TIKTOKEN_AVAILABLE = True
-except ImportError:
-    TIKTOKEN_AVAILABLE = False
+# tiktoken is imported on first use so that e.g. `--help` does not pay for it
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
 
 logger = logging.getLogger(__name__)
 
 # Maximum string length allowed by MCP (slightly under 10MB to be safe)
 MAX_MCP_STRING_LENGTH = 10_000_000  # ~9.5MB
 
+# Aggregate budget for a whole MCP output (total string length)
+MAX_MCP_TOTAL_LENGTH = MAX_MCP_STRING_LENGTH
+
+# Strings are not cut below this many characters to fit the aggregate budget;
+# list and dict tails are elided instead
+MIN_STRING_SHARE = 200
+
+# Budget cost of a number, boolean or None
+_SCALAR_COST = 8
+
+# Budget costs of the JSON syntax around values: the quotes of a string, the
+# brackets of a container and the ", " separating items
+_QUOTES_COST = 2
+_CONTAINER_COST = 2
+_ITEM_COST = 2
+
+# Key of the entry that replaces the elided tail of a dict
+ELIDED_KEY = "__elided__"
+
+# Upper bound of the budget cost of one elision marker
+_ELISION_COST = len(f'"{ELIDED_KEY}": "[{sys.maxsize} more items elided]"') + _ITEM_COST
+
+# Read size for streaming summaries of files and buffers
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Rough number of characters per token for budgets given in tokens
+CHARS_PER_TOKEN = 4
+
 # Context window limits for different models (in tokens)
 CONTEXT_WINDOW_LIMITS = {
     "gpt-4": 8192,
@@ -37,6 +81,56 @@ CONTEXT_WINDOW_LIMITS = {
 RESPONSE_TOKEN_RESERVE = 2000
 
 
+class _EncodingCache:
+    # model name -> tiktoken Encoding, or None if it could not be loaded
+    encodings: Dict[str, Any] = {}
+    lock = threading.Lock()
+
+
+_encoding_cache = _EncodingCache()
+
+
+def _load_encoding(model: str) -> Any:
+    import tiktoken  # pylint: disable=import-outside-toplevel
+
+    if model.startswith(("gpt-", "text-")):
+        return tiktoken.encoding_for_model(model)
+    # Use a default encoding for non-OpenAI models
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def get_encoding(model: str = "gpt-4") -> Optional[Any]:
+    """
+    Get the tiktoken encoding for a model, loading it at most once per process.
+
+    Failures (tiktoken missing, unknown model, encoding download impossible)
+    are cached too, so callers fall back to estimation without retrying.
+
+    Args:
+        model: The model name to get the encoding for
+
+    Returns:
+        The encoding, or None if token counting has to be estimated
+    """
+    try:
+        return _encoding_cache.encodings[model]
+    except KeyError:
+        pass
+
+    with _encoding_cache.lock:
+        if model not in _encoding_cache.encodings:
+            encoding = None
+            if TIKTOKEN_AVAILABLE:
+                try:
+                    encoding = _load_encoding(model)
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logger.warning(
+                        "Failed to load tiktoken encoding for %s: %s", model, e
+                    )
+            _encoding_cache.encodings[model] = encoding
+        return _encoding_cache.encodings[model]
+
+
 def count_tokens(text: str, model: str = "gpt-4") -> int:
     """
     Count tokens in text using tiktoken for OpenAI models or estimation for others.
@@ -48,19 +142,14 @@ def count_tokens(text: str, model: str = "gpt-4") -> int:
     Returns:
         Token count (estimated)
     """
-    if not TIKTOKEN_AVAILABLE:
+    encoding = get_encoding(model)
+    if encoding is None:
         # Fallback estimation: roughly 4 characters per token
         return len(text) // 4
 
     try:
-        # Try to get encoding for the specific model
-        if model.startswith(("gpt-", "text-")):
-            encoding = tiktoken.encoding_for_model(model)
-        else:
-            # Use a default encoding for non-OpenAI models
-            encoding = tiktoken.get_encoding("cl100k_base")
-
-        return len(encoding.encode(text))
+        # Special-token markers in Jira text are counted as plain text
+        return len(encoding.encode_ordinary(text))
     except Exception as e:  # pylint: disable=broad-exception-caught
         logger.warning("Failed to count tokens with tiktoken: %s", e)
         # Fallback estimation
@@ -94,9 +183,108 @@ def estimate_prompt_tokens(
     return template_tokens + jira_tokens + context_tokens
 
 
+# Characters of a truncated string reserved for the truncation message
+_TRUNCATION_MESSAGE_ROOM = 100
+
+
+def _truncate_string(text: str, max_length: int) -> str:
+    if max_length <= _TRUNCATION_MESSAGE_ROOM:
+        # No room for the message: a plain cut still respects the limit
+        return text[: max(0, max_length)]
+    truncated_length = max_length - _TRUNCATION_MESSAGE_ROOM
+    truncation_msg = (
+        f"\n\n[TRUNCATED: Original length was {len(text)} characters, "
+        f"showing first {truncated_length} characters]"
+    )
+    return text[:truncated_length] + truncation_msg
+
+
+# Replaces a reference back to a container that is still being processed
+CIRCULAR_REFERENCE_MARKER = "[CIRCULAR REFERENCE]"
+
+_CONTAINER_TYPES = (dict, list, tuple)
+
+
+class _Frame:
+    """A container whose children are being processed."""
+
+    __slots__ = (
+        "container",
+        "children",
+        "changes",
+        "child_key",
+        "kept",
+        "elided",
+        "path",
+    )
+
+    def __init__(self, container: Any, path: Any = None):
+        self.container = container
+        self.children = (
+            iter(container.items())
+            if isinstance(container, dict)
+            else enumerate(container)
+        )
+        # Replacement values by key/index; None while nothing has changed
+        self.changes: Optional[Dict[Any, Any]] = None
+        self.child_key: Any = None
+        # Number of children kept when the tail of the container is elided
+        self.kept = 0
+        self.elided = 0
+        # (parent path, key) chain locating the container; None for the root
+        self.path = path
+
+    def replace(self, key: Any, value: Any) -> None:
+        if self.changes is None:
+            self.changes = {}
+        self.changes[key] = value
+
+    def result(self) -> Any:
+        changes = self.changes
+        if self.elided:
+            return self._elided_result(changes or {})
+        if changes is None:
+            return self.container
+        if isinstance(self.container, dict):
+            return {
+                key: changes[key] if key in changes else value
+                for key, value in self.container.items()
+            }
+        items = list(self.container)
+        for index, value in changes.items():
+            items[index] = value
+        return tuple(items) if isinstance(self.container, tuple) else items
+
+    def _elided_result(self, changes: Dict[Any, Any]) -> Any:
+        if isinstance(self.container, dict):
+            result = {}
+            for key, value in itertools.islice(self.container.items(), self.kept):
+                result[key] = changes[key] if key in changes else value
+            result[ELIDED_KEY] = f"[{self.elided} more keys elided]"
+            return result
+        items = [
+            changes[index] if index in changes else value
+            for index, value in enumerate(itertools.islice(self.container, self.kept))
+        ]
+        items.append(f"[{self.elided} more items elided]")
+        return tuple(items) if isinstance(self.container, tuple) else items
+
+
 def truncate_large_strings(data: Any, max_length: int = MAX_MCP_STRING_LENGTH) -> Any:
     """
-    Recursively truncate strings in data structures that exceed max_length.
+    Truncate strings in data structures that exceed max_length.
+
+    The structure is walked iteratively, so arbitrarily deep nesting is fine.
+    Only dicts, lists and tuples on the path to an oversized string are
+    copied; everything else is returned as is (structural sharing), so an
+    output without oversized strings is returned unchanged without any copy.
+    Objects referenced several times map to a single result, and references
+    back to an enclosing container are replaced by CIRCULAR_REFERENCE_MARKER
+    so the result can always be serialized.
+
+    SafeMCPWrapper and the MCP proxy bound outputs with ``bound_mcp_output``,
+    which truncates single strings in its own walk; this function is kept for
+    API compatibility, for callers that only need the per-string limit.
 
     Args:
         data: The data structure to process (can be dict, list, string, etc.)
@@ -106,29 +294,433 @@ def truncate_large_strings(data: Any, max_length: int = MAX_MCP_STRING_LENGTH) -
         The data structure with truncated strings
     """
     if isinstance(data, str):
-        if len(data) > max_length:
-            truncated_length = max_length - 100  # Leave room for truncation message
-            truncation_msg = (
-                f"\n\n[TRUNCATED: Original length was {len(data)} characters, "
-                f"showing first {truncated_length} characters]"
-            )
-            return data[:truncated_length] + truncation_msg
+        return _truncate_string(data, max_length) if len(data) > max_length else data
+    if not isinstance(data, _CONTAINER_TYPES):
+        # For other types (int, float, bool, None, etc.), return as-is
         return data
 
-    if isinstance(data, dict):
+    # id -> result for objects that had to be replaced; unchanged containers
+    # are not recorded so that memory stays proportional to the nesting depth
+    replaced: Dict[int, Any] = {}
+    in_progress = {id(data)}
+    stack = [_Frame(data)]
+    while True:
+        frame = stack[-1]
+        for key, child in frame.children:
+            if isinstance(child, str):
+                if len(child) > max_length:
+                    if id(child) not in replaced:
+                        replaced[id(child)] = _truncate_string(child, max_length)
+                    frame.replace(key, replaced[id(child)])
+                continue
+            if not isinstance(child, _CONTAINER_TYPES):
+                continue
+            if id(child) in replaced:
+                frame.replace(key, replaced[id(child)])
+            elif id(child) in in_progress:
+                frame.replace(key, CIRCULAR_REFERENCE_MARKER)
+            else:
+                frame.child_key = key
+                in_progress.add(id(child))
+                stack.append(_Frame(child))
+                break
+        else:
+            stack.pop()
+            in_progress.discard(id(frame.container))
+            result = frame.result()
+            if result is not frame.container:
+                replaced[id(frame.container)] = result
+            if not stack:
+                return result
+            if result is not frame.container:
+                parent = stack[-1]
+                parent.replace(parent.child_key, result)
+
+
+def _leaf_cost(leaf: Any) -> int:
+    return len(leaf) + _QUOTES_COST if isinstance(leaf, str) else _SCALAR_COST
+
+
+def _key_cost(key: Any) -> int:
+    # The key with its quotes and the ": " after it
+    return len(key if isinstance(key, str) else str(key)) + 4
+
+
+def _marker_cost(container: Any, marker: str) -> int:
+    cost = _ITEM_COST + len(marker) + _QUOTES_COST
+    return cost + _key_cost(ELIDED_KEY) if isinstance(container, dict) else cost
+
+
+def _fair_share(lengths: Sequence[int], budget: int) -> int:
+    """Largest cap c with sum(min(length, c)) <= budget (water-filling)."""
+    remaining = budget
+    ordered = sorted(lengths)
+    for i, length in enumerate(ordered):
+        share = remaining // (len(ordered) - i)
+        if length > share:
+            return share
+        remaining -= length
+    return ordered[-1] if ordered else budget
+
+
+def _budget_string(text: str, cap: int, max_string_length: int) -> Optional[str]:
+    # Only strings longer than MIN_STRING_SHARE take part in the fair share;
+    # shorter ones are kept whole (within max_string_length). Returns None
+    # for strings that are kept
+    limit = cap if len(text) > MIN_STRING_SHARE else max_string_length
+    return _truncate_string(text, limit) if len(text) > limit else None
+
+
+def _apply_budget(
+    data: Any, cap: int, limit: Optional[int], max_string_length: int
+) -> Tuple[Any, int, int, int]:
+    # Mirrors the planning in _scan: truncates long strings to `cap` and, once
+    # `limit` items (containers included) were kept, elides the remaining
+    # children of every open container. Returns the result, the numbers of
+    # truncated strings and elided items, and the size of the result
+    # (elision markers included)
+    if not isinstance(data, _CONTAINER_TYPES):
+        short = (
+            _budget_string(data, cap, max_string_length)
+            if isinstance(data, str)
+            else None
+        )
+        if short is not None:
+            return short, 1, 0, len(short) + _QUOTES_COST
+        return data, 0, 0, _leaf_cost(data)
+
+    # The root container is the first item kept
+    items = 1
+    truncated = elided = 0
+    chars_out = _CONTAINER_COST
+    in_progress = {id(data)}
+    stack = [_Frame(data)]
+    while True:
+        frame = stack[-1]
+        keyed = isinstance(frame.container, dict)
+        descended = False
+        for key, child in frame.children:
+            if limit is not None and items >= limit:
+                frame.elided = len(frame.container) - frame.kept
+                elided += frame.elided
+                break
+            frame.kept += 1
+            items += 1
+            chars_out += _ITEM_COST + _key_cost(key) if keyed else _ITEM_COST
+            if not isinstance(child, _CONTAINER_TYPES):
+                short = (
+                    _budget_string(child, cap, max_string_length)
+                    if isinstance(child, str)
+                    else None
+                )
+                if short is not None:
+                    frame.replace(key, short)
+                    truncated += 1
+                    chars_out += len(short) + _QUOTES_COST
+                else:
+                    chars_out += _leaf_cost(child)
+            elif id(child) in in_progress:
+                frame.replace(key, CIRCULAR_REFERENCE_MARKER)
+                chars_out += _leaf_cost(CIRCULAR_REFERENCE_MARKER)
+            else:
+                chars_out += _CONTAINER_COST
+                frame.child_key = key
+                in_progress.add(id(child))
+                stack.append(_Frame(child))
+                descended = True
+                break
+        if descended:
+            continue
+        stack.pop()
+        in_progress.discard(id(frame.container))
+        result = frame.result()
+        if frame.elided:
+            marker = result[ELIDED_KEY] if keyed else result[-1]
+            chars_out += _marker_cost(result, marker)
+        if not stack:
+            return result, truncated, elided, chars_out
+        if result is not frame.container:
+            stack[-1].replace(stack[-1].child_key, result)
+
+
+def format_path(path: Any) -> str:
+    """Render a (parent path, key) chain as e.g. ``$.results[3].content``."""
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(key)
+    parts = ["$"]
+    for key in reversed(keys):
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    return "".join(parts)
+
+
+class SizeReport:
+    """
+    Size accounting of one MCP output, gathered while it is bounded.
+
+    Sizes are in characters, like the MCP limits, and follow the output's JSON
+    serialization: strings and dict keys with their quotes, brackets and
+    separators, plus a fixed cost per number, boolean or None (escapes are
+    not counted).
+    """
+
+    def __init__(self) -> None:
+        self.chars_in = 0
+        self.chars_out = 0
+        self.strings = 0
+        self.strings_truncated = 0
+        self.items_elided = 0
+        self.max_depth = 0
+        self.deepest_path = "$"
+        self.largest_string = 0
+        self.largest_string_path = "$"
+
+    def as_dict(self) -> Dict[str, Union[int, str]]:
+        """Return the report as a plain dict, e.g. for logging or metrics."""
         return {
-            key: truncate_large_strings(value, max_length)
-            for key, value in data.items()
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+            "strings": self.strings,
+            "strings_truncated": self.strings_truncated,
+            "items_elided": self.items_elided,
+            "max_depth": self.max_depth,
+            "deepest_path": self.deepest_path,
+            "largest_string": self.largest_string,
+            "largest_string_path": self.largest_string_path,
         }
 
-    if isinstance(data, list):
-        return [truncate_large_strings(item, max_length) for item in data]
 
-    if isinstance(data, tuple):
-        return tuple(truncate_large_strings(item, max_length) for item in data)
+class _BudgetPlan:
+    """Item accounting for the fair-share pass, gathered by _scan."""
+
+    __slots__ = ("budget", "fixed", "long_lengths", "limit", "reserve")
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        # Cost that is never truncated, lengths of the strings that may be
+        self.fixed = 0
+        self.long_lengths = array("q")
+        # Number of leading items (containers included) that fit, once one did
+        # not
+        self.limit: Optional[int] = None
+        # Room for elision markers kept free by the last item that fit
+        self.reserve = 0
+
+    def cut(self, kept: int, frames: List[_Frame]) -> None:
+        # Open containers (but the root) without a child that fits are elided
+        # as a whole rather than kept empty
+        dropped = 0
+        while dropped < len(frames) - 1 and not frames[-1 - dropped].kept:
+            dropped += 1
+            frames[-1 - dropped].kept -= 1
+        self.limit = kept - dropped
+
+    def string_cap(self, max_string_length: int) -> int:
+        if not self.long_lengths:
+            # Only short strings: nothing to share, the output is elided instead
+            return max_string_length
+        room = self.budget - self.fixed
+        if self.limit is not None:
+            room -= self.reserve
+        return min(_fair_share(self.long_lengths, room), max_string_length)
+
+
+def _scan(
+    data: Any, max_string_length: int, budget: int
+) -> Tuple[Any, SizeReport, _BudgetPlan]:
+    # One walk that truncates oversized strings (sharing unchanged containers,
+    # like truncate_large_strings), accounts sizes and plans the fair-share
+    # pass; every occurrence of a shared object is counted, as it would be
+    # when serialized. Once the output exceeds the budget the result is
+    # discarded, so strings are only counted from then on.
+    # Items (strings, scalars and containers) are kept in depth-first order
+    # while their minimum costs, plus room for an elision marker in every
+    # open container, fit the budget
+    report = SizeReport()
+    plan = _BudgetPlan(budget)
+    if not isinstance(data, _CONTAINER_TYPES):
+        report.chars_in = _leaf_cost(data)
+        if isinstance(data, str):
+            plan.fixed = _QUOTES_COST
+            plan.long_lengths.append(len(data))
+            report.strings = 1
+            report.largest_string = len(data)
+            if len(data) > max_string_length:
+                data = _truncate_string(data, max_string_length)
+                report.strings_truncated = 1
+        else:
+            plan.fixed = _SCALAR_COST
+        report.chars_out = _leaf_cost(data)
+        return data, report, plan
+
+    chars_in = chars_out = _CONTAINER_COST
+    strings = truncated = largest = 0
+    largest_path: Any = None
+    deepest_path: Any = None
+    truncated_strings: Dict[int, str] = {}
+    # The root container is the first item kept
+    total = fixed = _CONTAINER_COST
+    kept = 1
+    reserve = _ELISION_COST
+    long_lengths = plan.long_lengths
+    in_progress = {id(data)}
+    stack = [_Frame(data)]
+    max_depth = 1
+    planning = True
+    while True:
+        frame = stack[-1]
+        keyed = isinstance(frame.container, dict)
+        depth = len(stack)
+        for key, child in frame.children:
+            cost = _ITEM_COST + _key_cost(key) if keyed else _ITEM_COST
+            length = 0
+            depth_kept = depth
+            if isinstance(child, str):
+                length = len(child)
+                strings += 1
+                cost += _QUOTES_COST
+                chars_in += cost + length
+                if length > largest:
+                    largest, largest_path = length, (frame.path, key)
+                if length > max_string_length and chars_in <= budget:
+                    short = truncated_strings.get(id(child))
+                    if short is None:
+                        short = _truncate_string(child, max_string_length)
+                        truncated_strings[id(child)] = short
+                    frame.replace(key, short)
+                    truncated += 1
+                    chars_out += cost + len(short)
+                else:
+                    chars_out += cost + length
+            else:
+                if not isinstance(child, _CONTAINER_TYPES):
+                    cost += _SCALAR_COST
+                elif id(child) in in_progress:
+                    frame.replace(key, CIRCULAR_REFERENCE_MARKER)
+                    cost += _leaf_cost(CIRCULAR_REFERENCE_MARKER)
+                else:
+                    cost += _CONTAINER_COST
+                    depth_kept += 1
+                chars_in += cost
+                chars_out += cost
+            if planning:
+                minimum = cost + (
+                    length if length < MIN_STRING_SHARE else MIN_STRING_SHARE
+                )
+                if total + minimum + depth_kept * _ELISION_COST > budget:
+                    planning = False
+                    plan.cut(kept, stack)
+                else:
+                    total += minimum
+                    kept += 1
+                    frame.kept += 1
+                    reserve = depth_kept * _ELISION_COST
+                    if length > MIN_STRING_SHARE:
+                        fixed += cost
+                        long_lengths.append(length)
+                    else:
+                        fixed += cost + length
+            if depth_kept > depth:
+                frame.child_key = key
+                in_progress.add(id(child))
+                stack.append(_Frame(child, (frame.path, key)))
+                if len(stack) > max_depth:
+                    max_depth, deepest_path = len(stack), stack[-1].path
+                break
+        else:
+            stack.pop()
+            in_progress.discard(id(frame.container))
+            result = frame.result()
+            if not stack:
+                break
+            if result is not frame.container:
+                stack[-1].replace(stack[-1].child_key, result)
+
+    plan.fixed, plan.reserve = fixed, reserve
+    report.chars_in, report.chars_out = chars_in, chars_out
+    report.strings, report.strings_truncated = strings, truncated
+    report.max_depth, report.deepest_path = max_depth, format_path(deepest_path)
+    report.largest_string = largest
+    if largest_path is not None:
+        report.largest_string_path = format_path(largest_path)
+    return result, report, plan
+
+
+def bound_mcp_output(
+    data: Any,
+    max_total_length: int = MAX_MCP_TOTAL_LENGTH,
+    max_string_length: int = MAX_MCP_STRING_LENGTH,
+) -> Tuple[Any, SizeReport]:
+    """
+    Bound an MCP output and report its size, in a single walk when it fits.
+
+    The walk truncates strings longer than ``max_string_length``, accounts
+    the size of the output and plans the fair-share allocation of
+    ``budget_mcp_output``. Only outputs above ``max_total_length`` take a
+    second walk to apply it.
 
-    # For other types (int, float, bool, None, etc.), return as-is
-    return data
+    Args:
+        data: The MCP tool output
+        max_total_length: Budget for the whole output in characters
+        max_string_length: Limit for any single string
+
+    Returns:
+        The bounded output and its SizeReport
+    """
+    # Room for at least one string of MIN_STRING_SHARE characters
+    budget = max(max_total_length, MIN_STRING_SHARE + _QUOTES_COST)
+    result, report, plan = _scan(data, max_string_length, budget)
+    if report.chars_in <= budget:
+        return result, report
+
+    cap = plan.string_cap(max_string_length)
+    result, truncated, elided, chars_out = _apply_budget(
+        data, cap, plan.limit, max_string_length
+    )
+    logger.info(
+        "MCP output exceeds %d characters: %d strings truncated to %d characters, "
+        "%d items elided",
+        budget,
+        truncated,
+        cap,
+        elided,
+    )
+    report.strings_truncated = truncated
+    report.items_elided = elided
+    report.chars_out = chars_out
+    return result, report
+
+
+def budget_mcp_output(
+    data: Any,
+    max_total_length: int = MAX_MCP_TOTAL_LENGTH,
+    max_string_length: int = MAX_MCP_STRING_LENGTH,
+) -> Any:
+    """
+    Bound the aggregate size of an MCP output, not just each string.
+
+    The size of an output is the length of its JSON serialization: strings
+    and dict keys with their quotes, brackets and separators, with every
+    number, boolean or None counted as a few characters. Within the budget
+    each string gets a fair share (water-filling): short strings are kept
+    whole and the longest ones are truncated to a common cap. When even
+    MIN_STRING_SHARE characters per string would not fit, the output is cut
+    in depth-first order instead: the remaining items of every open list,
+    tuple or dict are replaced by a "[N more items elided]" marker (for dicts
+    an ELIDED_KEY entry), for which room is kept in the budget. The JSON of
+    the result is at most ``max_total_length`` characters as long as no
+    number is longer than the fixed cost and no character needs escaping.
+
+    Args:
+        data: The MCP tool output
+        max_total_length: Budget for the whole output in characters
+        max_string_length: Limit for any single string
+
+    Returns:
+        The output within the budget; unchanged parts are shared with ``data``
+    """
+    return bound_mcp_output(data, max_total_length, max_string_length)[0]
 
 
 def summarize_large_content(
@@ -147,26 +739,29 @@ def summarize_large_content(
     if len(content) <= max_length:
         return content
 
-    # Try to find natural break points
-    lines = content.split("\n")
+    # Lines are counted and located with str.count/find/rfind; splitting a
+    # large log into a list of lines would allocate one object per line
+    line_count = content.count("\n") + 1
 
-    if len(lines) > 100:
+    if line_count > 100:
         # If there are many lines, take first and last portions
         # Adjust portion size based on max_length to ensure it fits
         overhead = 200  # Space for summary message
         available_content = max_length - overhead
 
         # Estimate how many lines we can include from start and end
-        avg_line_length = len(content) / len(lines)
+        avg_line_length = len(content) / line_count
         max_lines_per_section = max(10, int(available_content / (2 * avg_line_length)))
-        max_lines_per_section = min(max_lines_per_section, len(lines) // 2)
+        max_lines_per_section = min(max_lines_per_section, line_count // 2)
 
-        first_portion = "\n".join(lines[:max_lines_per_section])
-        last_portion = "\n".join(lines[-max_lines_per_section:])
+        first_portion = content[: _nth_newline(content, max_lines_per_section)]
+        last_portion = content[
+            _nth_newline_from_end(content, max_lines_per_section) + 1 :
+        ]
 
         summary = (
             f"{first_portion}\n\n"
-            f"[CONTENT SUMMARIZED: {len(lines)} total lines, "
+            f"[CONTENT SUMMARIZED: {line_count} total lines, "
             f"{len(content)} characters]\n"
             f"[Showing first {max_lines_per_section} and last "
             f"{max_lines_per_section} lines]\n\n"
@@ -181,7 +776,7 @@ def summarize_large_content(
     summary = (
         f"{content[:truncated_length]}\n\n"
         f"[CONTENT TRUNCATED: Original had {len(content)} characters "
-        f"({len(lines)} lines)]\n"
+        f"({line_count} lines)]\n"
         f"[Content too large for MCP transmission - showing first "
         f"{truncated_length} characters]"
     )
@@ -189,25 +784,258 @@ def summarize_large_content(
     return summary
 
 
-def safe_mcp_output(data: Any) -> Any:
+def _nth_newline(text: str, n: int) -> int:
+    # Index of the n-th newline (1-based); the text has at least n newlines
+    index = -1
+    for _ in range(n):
+        index = text.find("\n", index + 1)
+    return index
+
+
+def _nth_newline_from_end(text: str, n: int) -> int:
+    # Index of the n-th newline counted from the end (1-based)
+    index = len(text)
+    for _ in range(n):
+        index = text.rfind("\n", 0, index)
+    return index
+
+
+class _HeadTail:
+    """Keep the first and last characters of a text stream and count the rest."""
+
+    def __init__(self, head_size: int, tail_size: int):
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.head: List[str] = []
+        self.head_length = 0
+        self.tail: Deque[str] = deque()
+        self.tail_length = 0
+        self.characters = 0
+        self.newlines = 0
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self.characters += len(chunk)
+        self.newlines += chunk.count("\n")
+        if self.head_length < self.head_size:
+            piece = chunk[: self.head_size - self.head_length]
+            self.head.append(piece)
+            self.head_length += len(piece)
+        self.tail.append(chunk)
+        self.tail_length += len(chunk)
+        # Drop whole chunks that are no longer needed for the tail
+        while self.tail_length - len(self.tail[0]) >= self.tail_size:
+            self.tail_length -= len(self.tail.popleft())
+
+    def head_text(self, size: int) -> str:
+        return "".join(self.head)[:size]
+
+    def tail_text(self, size: int) -> str:
+        text = "".join(self.tail)
+        return text[len(text) - size :] if size else ""
+
+
+def _iter_text_chunks(
+    source: Any, encoding: str, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[str]:
+    """Yield text chunks from a string, buffer, file object or iterable."""
+    if isinstance(source, str):
+        yield source
+        return
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        view = memoryview(source)
+        raw: Iterator[Any] = (
+            view[i : i + chunk_size] for i in range(0, len(view), chunk_size)
+        )
+    elif hasattr(source, "read"):
+        raw = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        raw = iter(source)
+
+    decoder = None
+    for chunk in raw:
+        if isinstance(chunk, str):
+            yield chunk
+            continue
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        yield decoder.decode(chunk)
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
+def summarize_stream(
+    source: Any,
+    max_length: int = MAX_MCP_STRING_LENGTH,
+    encoding: str = "utf-8",
+) -> str:
+    """
+    Summarize large content as its beginning and end, reading it only once.
+
+    Unlike ``summarize_large_content`` the content never has to be in memory
+    as a whole: only the first and last ``max_length`` characters are kept
+    while lines and characters are counted chunk by chunk, so memory stays
+    O(max_length) however large the source is.
+
+    Args:
+        source: A string, bytes-like object or memory-mapped file, a text or
+            binary file object, or an iterable of str/bytes chunks
+            (e.g. the lines of a file)
+        max_length: Maximum allowed length of the result
+        encoding: Encoding of byte sources; undecodable bytes are replaced
+
+    Returns:
+        The content itself if it fits, otherwise its first and last lines
+        around a note with the total line and character counts
+    """
+    overhead = 200  # Space for summary message
+    section = max(0, (max_length - overhead) // 2)
+    stream = _HeadTail(max_length, section)
+    for chunk in _iter_text_chunks(source, encoding):
+        stream.feed(chunk)
+
+    if stream.characters <= max_length:
+        return stream.head_text(max_length)
+
+    first_portion = _trim_to_line_end(stream.head_text(section)).rstrip("\n")
+    last_portion = _trim_to_line_start(stream.tail_text(section))
+    return (
+        f"{first_portion}\n\n"
+        f"[CONTENT SUMMARIZED: {stream.newlines + 1} total lines, "
+        f"{stream.characters} characters]\n"
+        f"[Showing first {len(first_portion)} and last "
+        f"{len(last_portion)} characters]\n\n"
+        f"{last_portion}"
+    )
+
+
+def summarize_file(
+    path: Union[str, "os.PathLike[str]"],
+    max_length: int = MAX_MCP_STRING_LENGTH,
+    encoding: str = "utf-8",
+) -> str:
+    """
+    Summarize a (possibly multi-GB) text file without loading it.
+
+    Args:
+        path: Path of the file
+        max_length: Maximum allowed length of the result
+        encoding: Encoding of the file
+
+    Returns:
+        The summary, as returned by ``summarize_stream``
+    """
+    with open(path, "rb") as f:
+        return summarize_stream(f, max_length, encoding)
+
+
+def _trim_to_line_end(text: str) -> str:
+    # Drop a trailing partial line, unless that would lose more than half
+    cut = text.rfind("\n")
+    return text[: cut + 1] if cut >= len(text) // 2 else text
+
+
+def _trim_to_line_start(text: str) -> str:
+    # Drop a leading partial line, unless that would lose more than half
+    cut = text.find("\n")
+    return text[cut + 1 :] if 0 <= cut < len(text) // 2 else text
+
+
+def _fit_units(
+    text: str,
+    units: Sequence[Any],
+    limit: int,
+    decode: Callable[[Sequence[Any]], str],
+    measure: Callable[[str], int],
+    unit_name: str,
+) -> str:
+    total = len(units)
+    if total <= limit:
+        return text
+    if limit <= 0:
+        return ""
+
+    def _marker(removed: int) -> str:
+        return (
+            f"\n\n[CONTENT TRUNCATED: {total} {unit_name} in total, "
+            f"{removed} {unit_name} removed from the middle]\n\n"
+        )
+
+    keep = limit - measure(_marker(total))
+    while keep > 0:
+        tail_n = keep // 2
+        head = _trim_to_line_end(decode(units[: keep - tail_n]))
+        tail = _trim_to_line_start(decode(units[total - tail_n :])) if tail_n else ""
+        result = head + _marker(total - measure(head) - measure(tail)) + tail
+        # Tokens can merge across the joins, so check the assembled result
+        excess = measure(result) - limit
+        if excess <= 0:
+            return result
+        keep -= excess
+
+    # Not even the marker fits: keep as much of the beginning as possible
+    count = limit
+    while count > 0 and measure(decode(units[:count])) > limit:
+        count -= 1
+    return decode(units[:count])
+
+
+def fit_to_token_limit(text: str, max_tokens: int, model: str = "gpt-4") -> str:
+    """
+    Truncate text so that it is guaranteed to fit a token budget.
+
+    The text is encoded once and cut on token boundaries, keeping the beginning
+    and the end (snapped to whole lines where possible) around a truncation
+    marker. Without tiktoken the same is done on characters, matching the
+    estimate used by ``count_tokens``.
+
+    Args:
+        text: The text to fit
+        max_tokens: Maximum number of tokens of the result
+        model: The model name to use for encoding
+
+    Returns:
+        The original text if it fits, otherwise a truncated version for which
+        ``count_tokens(result, model) <= max_tokens``
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        # count_tokens estimates len // 4, so this many characters still fit
+        return _fit_units(
+            text, text, max_tokens * 4 + 3, "".join, len, unit_name="characters"
+        )
+
+    return _fit_units(
+        text,
+        encoding.encode_ordinary(text),
+        max_tokens,
+        encoding.decode,
+        lambda part: len(encoding.encode_ordinary(part)),
+        unit_name="tokens",
+    )
+
+
+def safe_mcp_output(data: Any, max_total_length: int = MAX_MCP_TOTAL_LENGTH) -> Any:
     """
     Ensure MCP output is safe for transmission by truncating large strings.
 
     Args:
         data: The data to make safe
+        max_total_length: Budget for the whole output in characters (see
+            ``budget_mcp_output``)
 
     Returns:
-        Safe data with truncated strings
+        Safe data with truncated strings, within the aggregate budget
     """
-    return truncate_large_strings(data)
+    return budget_mcp_output(data, max_total_length)
 
 
 def get_content_size_info(content: str) -> Dict[str, Union[int, str, float, bool]]:
     """Get information about content size for logging."""
-    lines = content.split("\n")
     return {
         "character_count": len(content),
-        "line_count": len(lines),
+        "line_count": content.count("\n") + 1,
         "size_mb": round(len(content) / (1024 * 1024), 2),
         "exceeds_limit": len(content) > MAX_MCP_STRING_LENGTH,
         "recommended_action": (
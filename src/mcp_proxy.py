@@ -0,0 +1,485 @@
+"""Stdio MCP proxy that applies the SafeMCPWrapper policy to an upstream server.
+
+Codex talks to the proxy as it would to the Azure DevOps MCP server; the proxy
+starts the real server as a subprocess and relays newline-delimited JSON-RPC
+messages in both directions. Only ``tools/call`` requests and their responses
+are touched: results are bounded to the output budget (build logs reduced to
+their failure regions), results of read-only tools are cached, identical calls
+in flight are coalesced, and per-tool metrics are collected.
+
+Usage:
+    swecli-mcp-proxy [options] -- npx -y @azure-devops/mcp <org>
+"""
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from typing import IO, Any, Dict, List, Optional, Sequence
+
+from .config import Settings
+from .logging_setup import configure_logging
+from .mcp_output_utils import CHARS_PER_TOKEN, MAX_MCP_TOTAL_LENGTH
+from .safe_mcp_tools import (
+    BUILD_LOG_TOOLS,
+    READ_ONLY_TOOLS,
+    MCPResultCache,
+    SafeMCPWrapper,
+    excerpt_build_log,
+)
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC error returned for calls the upstream server never answered
+UPSTREAM_EXITED_ERROR = {"code": -32603, "message": "Upstream MCP server exited"}
+
+# JSON-RPC error returned for malformed tools/call requests
+INVALID_PARAMS_ERROR = {
+    "code": -32602,
+    "message": "Invalid params: tools/call needs a tool name and an arguments object",
+}
+
+# Cancelled upstream calls remembered to drop their late responses
+_MAX_CANCELLED_CALLS = 1024
+
+
+def _id_key(request_id: Any) -> str:
+    # JSON-RPC ids may be numbers or strings; 1 and "1" are different requests
+    return json.dumps(request_id)
+
+
+def _encode(message: Any) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+class ProxyMetrics:
+    """Thread-safe per-tool counters of the proxy."""
+
+    COUNTERS = (
+        "calls",
+        "cache_hits",
+        "coalesced",
+        "errors",
+        "chars_in",
+        "chars_out",
+        "strings_truncated",
+        "items_elided",
+        "upstream_seconds",
+        "max_upstream_seconds",
+    )
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict[str, float]] = {}
+
+    def add(self, tool: str, **increments: float) -> None:
+        """Add to the counters of a tool."""
+        with self._lock:
+            counters = self._tools.setdefault(tool, {name: 0 for name in self.COUNTERS})
+            for name, value in increments.items():
+                counters[name] += value
+
+    def observe_latency(self, tool: str, seconds: float) -> None:
+        """Record the duration of an upstream call."""
+        with self._lock:
+            counters = self._tools.setdefault(tool, {name: 0 for name in self.COUNTERS})
+            counters["upstream_seconds"] += seconds
+            counters["max_upstream_seconds"] = max(
+                counters["max_upstream_seconds"], seconds
+            )
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Return a copy of the counters by tool name."""
+        with self._lock:
+            return {tool: dict(counters) for tool, counters in self._tools.items()}
+
+
+class _PendingCall:
+    """A tools/call forwarded upstream and the client requests waiting for it."""
+
+    __slots__ = ("tool", "key", "upstream_id", "ids", "started")
+
+    def __init__(self, tool: str, key: str, request_id: Any):
+        self.tool = tool
+        self.key = key
+        # The id of the client request that was forwarded upstream
+        self.upstream_id = request_id
+        self.ids: List[Any] = [request_id]
+        self.started = time.monotonic()
+
+
+class MCPProxy:
+    """
+    Relay an MCP stdio session between a client and an upstream server.
+
+    Each direction is pumped by its own thread, so slow tool calls do not
+    hold up other messages.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        max_total_length: int = MAX_MCP_TOTAL_LENGTH,
+        cache: Optional[MCPResultCache] = None,
+        coalesce: bool = True,
+        client_in: Optional[IO[bytes]] = None,
+        client_out: Optional[IO[bytes]] = None,
+    ):
+        """
+        Args:
+            command: Command line of the upstream MCP server
+            max_total_length: Output budget per tool result in characters
+            cache: Optional cache for results of read-only tools
+            coalesce: Whether identical concurrent calls share one request
+            client_in: Stream of client messages; defaults to stdin
+            client_out: Stream for messages to the client; defaults to stdout
+        """
+        if not command:
+            raise ValueError("The upstream MCP server command is required")
+        self.command = list(command)
+        self.max_total_length = max_total_length
+        self.cache = cache
+        self.coalesce = coalesce
+        self.client_in = client_in or sys.stdin.buffer
+        self.client_out = client_out or sys.stdout.buffer
+        self.metrics = ProxyMetrics()
+        self._wrappers: Dict[str, SafeMCPWrapper] = {}
+        self._lock = threading.Lock()
+        # Upstream request id -> call; identical calls by key while coalescing
+        self._pending: Dict[str, _PendingCall] = {}
+        self._in_flight: Dict[str, _PendingCall] = {}
+        # Upstream request ids of cancelled calls, oldest first
+        self._cancelled: Dict[str, bool] = {}
+        self._client_lock = threading.Lock()
+        self._upstream_lock = threading.Lock()
+        self._process: Optional["subprocess.Popen[bytes]"] = None
+
+    def _wrapper(self, tool: str) -> SafeMCPWrapper:
+        with self._lock:
+            wrapper = self._wrappers.get(tool)
+            if wrapper is None:
+                wrapper = SafeMCPWrapper(
+                    tool, max_total_length=self.max_total_length, cache=self.cache
+                )
+                self._wrappers[tool] = wrapper
+            return wrapper
+
+    def _send_client(self, data: bytes) -> None:
+        with self._client_lock:
+            self.client_out.write(data.rstrip(b"\r\n") + b"\n")
+            self.client_out.flush()
+
+    def _send_upstream(self, data: bytes) -> None:
+        assert self._process is not None and self._process.stdin is not None
+        with self._upstream_lock:
+            self._process.stdin.write(data.rstrip(b"\r\n") + b"\n")
+            self._process.stdin.flush()
+
+    def run(self) -> int:
+        """
+        Start the upstream server and relay messages until the client is done.
+
+        Returns:
+            The exit code of the upstream server
+        """
+        logger.info("Starting upstream MCP server: %s", " ".join(self.command))
+        self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        upstream = threading.Thread(
+            target=self._pump_upstream, name="mcp-proxy-upstream", daemon=True
+        )
+        upstream.start()
+        try:
+            for line in iter(self.client_in.readline, b""):
+                if line.strip():
+                    self.handle_client_message(line)
+        except (BrokenPipeError, OSError) as e:
+            logger.warning("Upstream MCP server is gone: %s", e)
+        finally:
+            # End of the session: let the server finish and exit
+            if self._process.stdin is not None:
+                try:
+                    self._process.stdin.close()
+                except OSError:
+                    pass
+        upstream.join()
+        returncode = self._process.wait()
+        logger.info("MCP proxy metrics: %s", json.dumps(self.summary()))
+        return returncode
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the per-tool metrics and the cache statistics."""
+        return {
+            "tools": self.metrics.as_dict(),
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    def _pump_upstream(self) -> None:
+        assert self._process is not None and self._process.stdout is not None
+        for line in iter(self._process.stdout.readline, b""):
+            if line.strip():
+                self.handle_upstream_message(line)
+        self._fail_pending()
+
+    def _fail_pending(self) -> None:
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._in_flight.clear()
+        for call in pending:
+            for request_id in call.ids:
+                self._send_client(
+                    _encode(
+                        {
+                            "jsonrpc": "2.0",
+                            "id": request_id,
+                            "error": UPSTREAM_EXITED_ERROR,
+                        }
+                    )
+                )
+
+    def handle_client_message(self, line: bytes) -> None:
+        """Relay one message from the client, answering tools/call if possible."""
+        try:
+            message = json.loads(line)
+        except ValueError:
+            self._send_upstream(line)
+            return
+        if isinstance(message, dict) and "id" in message:
+            if message.get("method") == "tools/call":
+                self._handle_tool_call(message, line)
+                return
+        if isinstance(message, dict):
+            if message.get("method") == "notifications/cancelled":
+                forward = self._handle_cancelled(message, line)
+                if forward is not None:
+                    self._send_upstream(forward)
+                return
+        self._send_upstream(line)
+
+    def _handle_tool_call(self, message: Dict[str, Any], line: bytes) -> None:
+        params = message.get("params")
+        arguments = params.get("arguments") if isinstance(params, dict) else None
+        if (
+            not isinstance(params, dict)
+            or not isinstance(params.get("name"), str)
+            or not isinstance(arguments, (dict, type(None)))
+        ):
+            self._send_client(
+                _encode(
+                    {
+                        "jsonrpc": "2.0",
+                        "id": message["id"],
+                        "error": INVALID_PARAMS_ERROR,
+                    }
+                )
+            )
+            return
+        tool = params["name"]
+        arguments = arguments or {}
+        wrapper = self._wrapper(tool)
+        key = wrapper.call_key((), arguments)
+        self.metrics.add(tool, calls=1)
+
+        if self.cache is not None and self.cache.is_cacheable(tool):
+            hit, cached = self.cache.get(key)
+            if hit:
+                self.metrics.add(tool, cache_hits=1)
+                self._send_client(
+                    _encode({"jsonrpc": "2.0", "id": message["id"], "result": cached})
+                )
+                return
+
+        with self._lock:
+            shared = self._in_flight.get(key) if tool in READ_ONLY_TOOLS else None
+            if self.coalesce and shared is not None:
+                shared.ids.append(message["id"])
+                self.metrics.add(tool, coalesced=1)
+                return
+            call = _PendingCall(tool, key, message["id"])
+            self._pending[_id_key(message["id"])] = call
+            if self.coalesce and tool in READ_ONLY_TOOLS:
+                self._in_flight[key] = call
+        self._send_upstream(line)
+
+    def _handle_cancelled(
+        self, message: Dict[str, Any], line: bytes
+    ) -> Optional[bytes]:
+        # Returns the notification to forward upstream, if any: a shared call
+        # keeps running as long as another client request waits for it
+        params = message.get("params") or {}
+        request_id = params.get("requestId")
+        with self._lock:
+            for upstream_key, call in self._pending.items():
+                if request_id not in call.ids:
+                    continue
+                call.ids.remove(request_id)
+                if call.ids:
+                    return None
+                del self._pending[upstream_key]
+                if self._in_flight.get(call.key) is call:
+                    del self._in_flight[call.key]
+                self._cancelled[upstream_key] = True
+                if len(self._cancelled) > _MAX_CANCELLED_CALLS:
+                    del self._cancelled[next(iter(self._cancelled))]
+                message = {
+                    **message,
+                    "params": {**params, "requestId": call.upstream_id},
+                }
+                return _encode(message)
+        return line
+
+    def handle_upstream_message(self, line: bytes) -> None:
+        """Relay one message from the server, bounding tools/call results."""
+        try:
+            message = json.loads(line)
+        except ValueError:
+            self._send_client(line)
+            return
+        call = None
+        if isinstance(message, dict) and "id" in message and "method" not in message:
+            upstream_key = _id_key(message["id"])
+            with self._lock:
+                call = self._pending.pop(upstream_key, None)
+                if call is not None and self._in_flight.get(call.key) is call:
+                    del self._in_flight[call.key]
+                cancelled = call is None and self._cancelled.pop(upstream_key, False)
+            if cancelled:
+                # The client gave up on this call; it must not see the response
+                logger.debug("Dropping the response to cancelled call %s", upstream_key)
+                return
+        if call is None:
+            self._send_client(line)
+            return
+
+        self.metrics.observe_latency(call.tool, time.monotonic() - call.started)
+        if isinstance(message.get("result"), dict):
+            message["result"] = self._bound_result(call, message["result"])
+        else:
+            self.metrics.add(call.tool, errors=1)
+        for request_id in call.ids:
+            self._send_client(_encode({**message, "id": request_id}))
+
+    def _bound_result(self, call: _PendingCall, result: Dict[str, Any]) -> Any:
+        # Only the text of content items and structuredContent are bounded,
+        # so the result keeps the CallToolResult shape: elision markers become
+        # text items and an elided structuredContent is dropped
+        wrapper = self._wrapper(call.tool)
+        content = result.get("content")
+        if not isinstance(content, list):
+            content = []
+        text_items = [
+            item
+            for item in content
+            if isinstance(item, dict) and isinstance(item.get("text"), str)
+        ]
+        text_ids = {id(item) for item in text_items}
+        texts = [item["text"] for item in text_items]
+        if call.tool in BUILD_LOG_TOOLS:
+            texts = [excerpt_build_log(text, self.max_total_length) for text in texts]
+        payload: Dict[str, Any] = {"content": texts}
+        if "structuredContent" in result:
+            payload["structuredContent"] = result["structuredContent"]
+
+        bounded = wrapper.bound_result(payload)
+        bounded_texts = iter(bounded.get("content") or [])
+        new_content = []
+        for item in content:
+            if id(item) not in text_ids:
+                new_content.append(item)
+                continue
+            text = next(bounded_texts, None)
+            if text is not None:
+                new_content.append({**item, "text": text})
+        result = {**result, "content": new_content}
+        if "structuredContent" in bounded:
+            result["structuredContent"] = bounded["structuredContent"]
+        else:
+            result.pop("structuredContent", None)
+
+        report = wrapper.last_report
+        if report is not None:
+            self.metrics.add(
+                call.tool,
+                chars_in=report.chars_in,
+                chars_out=report.chars_out,
+                strings_truncated=report.strings_truncated,
+                items_elided=report.items_elided,
+            )
+        if result.get("isError"):
+            self.metrics.add(call.tool, errors=1)
+        elif self.cache is not None:
+            # Errors are bounded like any result but never cached
+            self.cache.put(call.tool, call.key, result)
+        return result
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    configure_logging(stream=sys.stderr)
+
+    ap = argparse.ArgumentParser(
+        prog="swecli-mcp-proxy",
+        description=(
+            "Run an MCP server behind a proxy that bounds, caches and coalesces "
+            "tool results"
+        ),
+    )
+    ap.add_argument(
+        "--max-total-length",
+        type=int,
+        default=MAX_MCP_TOTAL_LENGTH,
+        help="Output budget per tool result in characters",
+    )
+    ap.add_argument(
+        "--max-total-tokens",
+        type=int,
+        default=None,
+        help="Output budget per tool result in tokens (the smaller budget wins)",
+    )
+    ap.add_argument(
+        "--cache-bytes",
+        type=int,
+        default=Settings.MCP_CACHE_MAX_BYTES,
+        help="Size of the result cache of read-only tools (0 disables it)",
+    )
+    ap.add_argument(
+        "--no-coalesce",
+        action="store_true",
+        help="Send identical concurrent calls to the server separately",
+    )
+    ap.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Write the metrics of the session to this JSON file at exit",
+    )
+    ap.add_argument(
+        "command",
+        nargs=argparse.REMAINDER,
+        help="Upstream MCP server command, after --",
+    )
+    args = ap.parse_args(argv)
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        ap.error("the upstream MCP server command is required (after --)")
+    budget = args.max_total_length
+    if args.max_total_tokens is not None:
+        budget = min(budget, args.max_total_tokens * CHARS_PER_TOKEN)
+    cache = MCPResultCache(max_bytes=args.cache_bytes) if args.cache_bytes > 0 else None
+
+    proxy = MCPProxy(command, budget, cache=cache, coalesce=not args.no_coalesce)
+    returncode = proxy.run()
+    if args.metrics_file:
+        with open(args.metrics_file, "w", encoding="utf-8") as f:
+            json.dump(proxy.summary(), f, indent=2)
+    sys.exit(returncode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""Section-aware token budgeting for rendered prompts."""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .mcp_output_utils import count_tokens, fit_to_token_limit
+from .prompt_templates import PromptTemplate
+
+logger = logging.getLogger(__name__)
+
+JIRA_JSON = "JIRA_JSON"
+CONTEXT_INSTRUCTIONS = "CONTEXT_INSTRUCTIONS"
+ADDITIONAL_INSTRUCTIONS = "ADDITIONAL_INSTRUCTIONS"
+
+# Sections are shrunk in this order (lowest priority first); template text
+# outside of the placeholders is never truncated here
+SHRINK_ORDER = (JIRA_JSON, CONTEXT_INSTRUCTIONS, ADDITIONAL_INSTRUCTIONS)
+
+# Raw Jira fields that are large and rarely needed to implement a ticket
+BULKY_RAW_FIELDS = (
+    "comment",
+    "worklog",
+    "attachment",
+    "issuelinks",
+    "subtasks",
+    "watches",
+    "votes",
+    "timetracking",
+)
+
+# Fields lifted out of raw["fields"] into the top level of the issue dict
+LIFTED_RAW_FIELDS = ("summary", "description", "labels", "issuetype", "project")
+
+# Keys that only carry REST links or avatars and never help implement a ticket
+NOISE_KEYS = frozenset({"self", "avatarUrls", "iconUrl", "expand"})
+
+IssueRenderer = Callable[[dict], str]
+
+# Tokens can merge across the boundary of two joined fragments; a total derived
+# from the parts is only trusted when it stays this far below the limit per join
+JOIN_SLACK_TOKENS = 2
+
+
+class TokenCounter:
+    """Memoizing token counter: every distinct fragment is encoded at most once."""
+
+    def __init__(self, model: str = "gpt-4"):
+        self.model = model
+        self._counts: Dict[str, int] = {}
+
+    def count(self, text: str) -> int:
+        try:
+            return self._counts[text]
+        except KeyError:
+            tokens = count_tokens(text, self.model)
+            self._counts[text] = tokens
+            return tokens
+
+
+def render_issue_pretty(issue: dict) -> str:
+    """Render an issue the way prompts embed it by default."""
+    return json.dumps(issue, indent=2)
+
+
+def _prune(value: Any) -> Any:
+    """Drop noise keys and null/empty values from nested dicts and lists."""
+    if isinstance(value, dict):
+        pruned = {}
+        for key, item in value.items():
+            if key in NOISE_KEYS:
+                continue
+            item = _prune(item)
+            if item is None or item == "" or item == [] or item == {}:
+                continue
+            pruned[key] = item
+        return pruned
+    if isinstance(value, list):
+        items = [_prune(item) for item in value]
+        return [item for item in items if item is not None and item != {}]
+    return value
+
+
+def _dedupe_raw(issue: dict) -> dict:
+    raw = issue.get("raw")
+    if not isinstance(raw, dict):
+        return issue
+    raw = {k: v for k, v in raw.items() if not (k == "key" and v == issue.get("key"))}
+    fields = raw.get("fields")
+    if isinstance(fields, dict):
+        raw["fields"] = {k: v for k, v in fields.items() if k not in LIFTED_RAW_FIELDS}
+    return {**issue, "raw": raw}
+
+
+def render_issue_compact(issue: dict) -> str:
+    """
+    Render an issue with as few tokens as possible without losing content.
+
+    Fields already lifted out of ``raw`` are not repeated, REST links, avatars
+    and null/empty values are pruned, and the JSON has no indentation.
+    """
+    return json.dumps(
+        _prune(_dedupe_raw(issue)), separators=(",", ":"), ensure_ascii=False
+    )
+
+
+# Rendering modes selectable through JIRA_JSON_MODE / --json-mode
+ISSUE_RENDERERS: Dict[str, IssueRenderer] = {
+    "pretty": render_issue_pretty,
+    "compact": render_issue_compact,
+}
+
+
+def get_issue_renderer(mode: str) -> IssueRenderer:
+    """
+    Look up the issue renderer for a JSON rendering mode.
+
+    Args:
+        mode: One of ISSUE_RENDERERS
+
+    Returns:
+        The renderer function
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    try:
+        return ISSUE_RENDERERS[mode.lower()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown Jira JSON mode {mode!r}; "
+            f"expected one of {', '.join(ISSUE_RENDERERS)}"
+        ) from None
+
+
+def report_rendering_savings(
+    issue: dict, render: IssueRenderer, counter: TokenCounter
+) -> int:
+    """
+    Log how many tokens a renderer saves over the pretty rendering.
+
+    Args:
+        issue: The Jira issue dict
+        render: The renderer used for the prompt
+        counter: Token counter shared with prompt assembly
+
+    Returns:
+        The number of tokens saved (negative if the rendering costs more)
+    """
+    pretty = counter.count(render_issue_pretty(issue))
+    rendered = counter.count(render(issue))
+    saved = pretty - rendered
+    logger.info(
+        "Jira JSON for %s: %d tokens (pretty: %d, saved %d = %.0f%%)",
+        issue.get("key"),
+        rendered,
+        pretty,
+        saved,
+        100.0 * saved / pretty if pretty else 0.0,
+    )
+    return saved
+
+
+def _drop_bulky_raw_fields(issue: dict) -> dict:
+    raw = issue.get("raw")
+    if not isinstance(raw, dict):
+        return issue
+    raw = {k: v for k, v in raw.items() if k not in ("changelog", "renderedFields")}
+    fields = raw.get("fields")
+    if isinstance(fields, dict):
+        raw["fields"] = {k: v for k, v in fields.items() if k not in BULKY_RAW_FIELDS}
+    return {**issue, "raw": raw}
+
+
+def _drop_raw(issue: dict) -> dict:
+    # summary, description, labels, ... are already lifted out of raw
+    if "raw" not in issue:
+        return issue
+    return {k: v for k, v in issue.items() if k != "raw"}
+
+
+def _drop_related_issues(issue: dict) -> dict:
+    if "related_issues" not in issue:
+        return issue
+    return {k: v for k, v in issue.items() if k != "related_issues"}
+
+
+def _drop_comments(issue: dict) -> dict:
+    if "comments" not in issue:
+        return issue
+    return {k: v for k, v in issue.items() if k != "comments"}
+
+
+# Lossy reductions applied one after another until the issue fits
+ISSUE_SHRINK_STAGES: List[Tuple[str, Callable[[dict], dict]]] = [
+    ("bulky raw fields", _drop_bulky_raw_fields),
+    ("raw payload", _drop_raw),
+    ("related issues", _drop_related_issues),
+    ("comments", _drop_comments),
+]
+
+
+def fit_issue_json(
+    issue: dict,
+    max_tokens: int,
+    model: str = "gpt-4",
+    render: IssueRenderer = render_issue_pretty,
+    counter: Optional[TokenCounter] = None,
+    rendered: Optional[str] = None,
+) -> str:
+    """
+    Render a Jira issue as JSON within a token budget.
+
+    The issue is reduced in stages (see ISSUE_SHRINK_STAGES), then its
+    description is truncated, and only as a last resort the rendered JSON
+    itself is cut.
+
+    Args:
+        issue: The Jira issue dict
+        max_tokens: Token budget for the rendered JSON
+        model: The model name to use for token counting
+        render: Function turning the issue dict into prompt text
+        counter: Token counter to share memoized counts with the caller
+        rendered: ``render(issue)`` if the caller already has it
+
+    Returns:
+        The rendered issue, at most ``max_tokens`` tokens long
+    """
+    counter = counter or TokenCounter(model)
+    text = rendered if rendered is not None else render(issue)
+    tokens = counter.count(text)
+    if tokens <= max_tokens:
+        return text
+
+    for stage_name, stage in ISSUE_SHRINK_STAGES:
+        reduced_issue = stage(issue)
+        if reduced_issue is issue:
+            continue
+        issue = reduced_issue
+        text = render(issue)
+        reduced = counter.count(text)
+        logger.info(
+            "Dropped %s from Jira JSON: %d -> %d tokens", stage_name, tokens, reduced
+        )
+        tokens = reduced
+        if tokens <= max_tokens:
+            return text
+
+    description = issue.get("description")
+    if isinstance(description, str) and description:
+        # JSON escaping makes the description cost more inside the document
+        # than on its own, so scale its budget by the measured expansion
+        overhead = counter.count(render({**issue, "description": ""}))
+        plain = max(1, counter.count(description))
+        expansion = max(1.0, (tokens - overhead) / plain)
+        budget = int((max_tokens - overhead) / expansion)
+        for _ in range(3):
+            fitted = fit_to_token_limit(description, max(0, budget), model)
+            text = render({**issue, "description": fitted})
+            tokens = counter.count(text)
+            if tokens <= max_tokens:
+                logger.info("Truncated Jira description to fit %d tokens", max_tokens)
+                return text
+            budget -= int((tokens - max_tokens) / expansion) + 1
+
+    return fit_to_token_limit(text, max_tokens, model)
+
+
+def assemble_prompt(
+    template: Union[str, PromptTemplate],
+    issue: dict,
+    sections: Dict[str, str],
+    max_tokens: int,
+    counter: TokenCounter,
+    render: IssueRenderer = render_issue_pretty,
+) -> Tuple[str, int]:
+    """
+    Fill a prompt template, shrinking placeholder values to fit a token budget.
+
+    Every part is serialized and tokenized once; the prompt's token count is
+    derived from the parts and the placeholders are filled in a single pass.
+    The template text is kept intact. If the values do not fit next to it,
+    sections are shrunk in SHRINK_ORDER: the Jira JSON first (bulky raw fields,
+    the raw payload, related issues, comments, then the description), then the
+    context instructions and finally the additional instructions.
+
+    Args:
+        template: Compiled template, or template text with {{PLACEHOLDER}}
+            markers
+        issue: The Jira issue dict rendered into {{JIRA_JSON}}
+        sections: Text for the remaining placeholders by name
+        max_tokens: Token budget for the whole prompt
+        counter: Memoizing token counter for the target model
+        render: Function turning the issue dict into prompt text
+
+    Returns:
+        The filled template and its token count (sum of the parts)
+    """
+    if isinstance(template, str):
+        template = PromptTemplate(template)
+    values = {JIRA_JSON: render(issue), **sections}
+
+    static_tokens = template.static_tokens(counter.model)
+    available = max_tokens - static_tokens
+
+    counts = {name: counter.count(text) for name, text in values.items()}
+    # A placeholder used several times costs its value's tokens each time
+    uses = {name: template.placeholders.count(name) for name in values}
+
+    def total() -> int:
+        return sum(counts[name] * uses[name] for name in values)
+
+    logger.info(
+        "Prompt tokens before budgeting: %d (template=%d, %s)",
+        static_tokens + total(),
+        static_tokens,
+        ", ".join(f"{name}={tokens}" for name, tokens in counts.items()),
+    )
+    overflow = total() - available
+    if overflow > 0:
+        logger.warning(
+            "Prompt sections exceed their budget by %d tokens, shrinking "
+            "lowest-priority sections first",
+            overflow,
+        )
+    for name in SHRINK_ORDER:
+        if overflow <= 0:
+            break
+        if not uses.get(name):
+            continue
+        # Each token cut from the value is saved at every use
+        target = max(0, counts[name] - -(-overflow // uses[name]))
+        if name == JIRA_JSON:
+            values[name] = fit_issue_json(
+                issue, target, counter.model, render, counter, values[name]
+            )
+        else:
+            values[name] = fit_to_token_limit(values[name], target, counter.model)
+        reduced = counter.count(values[name])
+        logger.info("Section %s: %d -> %d tokens", name, counts[name], reduced)
+        overflow -= (counts[name] - reduced) * uses[name]
+        counts[name] = reduced
+
+    return template.render(values), static_tokens + total()
+
+
+def build_budgeted_prompt(
+    template: Union[str, PromptTemplate],
+    issue: dict,
+    sections: Dict[str, str],
+    max_tokens: int,
+    model: str = "gpt-4",
+    render: IssueRenderer = render_issue_pretty,
+) -> str:
+    """Fill a prompt template within a token budget (see ``assemble_prompt``)."""
+    prompt, _ = assemble_prompt(
+        template, issue, sections, max_tokens, TokenCounter(model), render
+    )
+    return prompt
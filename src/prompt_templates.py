@@ -0,0 +1,130 @@
+"""Prompt templates compiled once and filled in a single pass."""
+
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Union
+
+from .mcp_output_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Built-in templates in the prompts/ directory next to src/ (not installed
+# with the package), independent of the current working directory
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+
+_PLACEHOLDER_RE = re.compile(r"\{\{([A-Z][A-Z0-9_]*)\}\}")
+
+
+class PromptTemplate:
+    """A prompt template split into literal text and {{PLACEHOLDER}} slots."""
+
+    def __init__(self, text: str, name: str = "<string>"):
+        self.name = name
+        parts = _PLACEHOLDER_RE.split(text)
+        # split() alternates literal text and captured placeholder names
+        self.literals: List[str] = parts[0::2]
+        self.placeholders: List[str] = parts[1::2]
+        self.static_text = "".join(self.literals)
+        self._static_tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def render(self, values: Mapping[str, str]) -> str:
+        """
+        Substitute all placeholders in one pass.
+
+        Values are inserted verbatim: placeholder markers inside a value are
+        not expanded again. Placeholders without a value are rendered empty.
+
+        Args:
+            values: Text for each placeholder by name
+
+        Returns:
+            The filled template
+        """
+        chunks = [self.literals[0]]
+        for name, literal in zip(self.placeholders, self.literals[1:]):
+            chunks.append(values.get(name, ""))
+            chunks.append(literal)
+        return "".join(chunks)
+
+    def static_tokens(self, model: str) -> int:
+        """Token count of the template text without placeholders, cached per model."""
+        try:
+            return self._static_tokens[model]
+        except KeyError:
+            tokens = count_tokens(self.static_text, model)
+            with self._lock:
+                self._static_tokens[model] = tokens
+            return tokens
+
+
+class _TemplateCache:
+    """Process-wide cache of compiled templates by resolved path."""
+
+    def __init__(self) -> None:
+        self.templates: Dict[Path, PromptTemplate] = {}
+        self.lock = threading.Lock()
+
+
+_cache = _TemplateCache()
+
+
+def resolve_template_path(
+    name: str, template_dir: Optional[Union[str, Path]] = None
+) -> Path:
+    """
+    Locate a prompt template file.
+
+    Args:
+        name: Template file name, e.g. ``codegen.md``
+        template_dir: Directory searched before the built-in prompts
+
+    Returns:
+        The template in ``template_dir`` if it exists there, otherwise the
+        built-in template
+    """
+    if template_dir:
+        candidate = Path(template_dir).expanduser() / name
+        if candidate.is_file():
+            return candidate.resolve()
+        logger.info(
+            "Template %s not found in %s, using the built-in one", name, template_dir
+        )
+    return PROMPTS_DIR / name
+
+
+def load_template(
+    name: str, template_dir: Optional[Union[str, Path]] = None
+) -> PromptTemplate:
+    """
+    Load and compile a prompt template; each file is read only once per process.
+
+    Args:
+        name: Template file name, e.g. ``codegen.md``
+        template_dir: Directory searched before the built-in prompts
+
+    Returns:
+        The compiled template
+    """
+    path = resolve_template_path(name, template_dir)
+    template = _cache.templates.get(path)
+    if template is None:
+        with _cache.lock:
+            template = _cache.templates.get(path)
+            if template is None:
+                template = PromptTemplate(path.read_text(encoding="utf-8"), str(path))
+                _cache.templates[path] = template
+                logger.debug(
+                    "Compiled prompt template %s (placeholders: %s)",
+                    path,
+                    ", ".join(template.placeholders),
+                )
+    return template
+
+
+def clear_template_cache() -> None:
+    """Forget all compiled templates, e.g. after editing them on disk."""
+    with _cache.lock:
+        _cache.templates.clear()
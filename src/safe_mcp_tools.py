@@ -1,18 +1,466 @@
 """Safe MCP tool execution with automatic output size handling."""
 
+import asyncio
+import hashlib
+import inspect
+import json
 import logging
-from typing import Any, Callable, Dict
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
 
-from .mcp_output_utils import log_large_content_warning, safe_mcp_output
+from .build_logs import BuildLog
+from .config import Settings
+from .mcp_output_utils import (
+    CHARS_PER_TOKEN,
+    MAX_MCP_TOTAL_LENGTH,
+    SizeReport,
+    bound_mcp_output,
+)
 
 logger = logging.getLogger(__name__)
 
+# Tools returning build logs, which are reduced to their failure regions
+BUILD_LOG_TOOLS = frozenset({"build_get_log", "build_get_log_by_id"})
+
+
+def excerpt_build_log(result: Any, max_length: int) -> Any:
+    """
+    Reduce an oversized build log to its failure regions.
+
+    Args:
+        result: A build log tool result: the log text or a list of lines
+        max_length: Size above which the log is reduced
+
+    Returns:
+        The excerpt (as a list of lines if the log was one), or the result
+        unchanged if it is small or not a log
+    """
+    if isinstance(result, str):
+        size = len(result)
+    elif isinstance(result, list) and all(isinstance(line, str) for line in result):
+        size = sum(len(line) + 1 for line in result)
+    else:
+        return result
+    if size <= max_length:
+        return result
+    with BuildLog.from_content(result) as log:
+        excerpt = log.failure_excerpt(max_length)
+    logger.info("Reduced a %d character build log to its failure regions", size)
+    return excerpt if isinstance(result, str) else excerpt.split("\n")
+
+
+# Strings up to this length are bounded inline by execute_safely_async;
+# anything larger (and every container) is handed to a worker thread
+INLINE_RESULT_LENGTH = 64 * 1024
+
+# Seconds a result of a read-only tool may be served from the cache; tools
+# that are not listed are never cached. Only lookups whose results do not
+# change during a run are listed: builds, their logs and work items change
+# while Codex works (builds run, Codex edits work items)
+DEFAULT_CACHE_TTLS: Dict[str, float] = {
+    "repo_get_repo_by_name_or_id": 3600,
+    "search_code": 600,
+}
+
+
+# Tools without side effects: identical concurrent calls may share one request
+READ_ONLY_TOOLS = frozenset(
+    {
+        "repo_get_repo_by_name_or_id",
+        "repo_list_branches_by_repo",
+        "repo_list_pull_requests_by_project",
+        "search_code",
+        "wit_get_work_item",
+        "wit_list_work_item_comments",
+        "build_get_builds",
+        "build_get_log",
+        "build_get_log_by_id",
+    }
+)
+
+
+def make_cache_key(
+    tool_name: str, args: Tuple[Any, ...], kwargs: Mapping[str, Any]
+) -> str:
+    """
+    Hash a tool call into a stable cache key.
+
+    Keyword order does not matter; values that are not JSON serializable are
+    represented by their repr.
+
+    Args:
+        tool_name: Name of the MCP tool
+        args: Positional arguments of the call
+        kwargs: Keyword arguments of the call
+
+    Returns:
+        Hex SHA-256 digest of the canonical JSON form of the call
+    """
+    canonical = json.dumps(
+        [tool_name, list(args), kwargs],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=repr,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _result_size(value: Any) -> int:
+    return len(
+        json.dumps(
+            value, separators=(",", ":"), ensure_ascii=False, default=repr
+        ).encode("utf-8")
+    )
+
+
+def _is_small(result: Any) -> bool:
+    # Results that cannot need truncation are bounded on the event loop
+    if isinstance(result, (str, bytes)):
+        return len(result) <= INLINE_RESULT_LENGTH
+    return result is None or isinstance(result, (bool, int, float))
+
+
+class MCPResultCache:
+    """
+    Thread-safe in-memory cache of MCP tool results.
+
+    Entries expire after the TTL of their tool, and the least recently used
+    entries are evicted once the results take more than ``max_bytes`` (their
+    compact JSON size). Cached results are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        ttls: Optional[Mapping[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = (
+            Settings.MCP_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        )
+        self.ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (expires at, size in bytes, result), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def is_cacheable(self, tool_name: str) -> bool:
+        """Return whether results of a tool are cached at all."""
+        return self.max_bytes > 0 and self.ttls.get(tool_name, 0) > 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a result.
+
+        Args:
+            key: The cache key of the call
+
+        Returns:
+            (True, result) on a hit, (False, None) if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def put(self, tool_name: str, key: str, result: Any) -> None:
+        """
+        Store a result with the TTL of its tool.
+
+        Results larger than the whole cache are not stored.
+
+        Args:
+            tool_name: Name of the MCP tool that produced the result
+            key: The cache key of the call
+            result: The result to store
+        """
+        if not self.is_cacheable(tool_name):
+            return
+        size = _result_size(result)
+        if size > self.max_bytes:
+            logger.debug("Not caching %d byte result of %s", size, tool_name)
+            return
+        expires = self._clock() + self.ttls[tool_name]
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, size, result)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self) -> None:
+        """Drop all entries; statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+class _Flight:
+    """One call in flight and the outcome its followers wait for."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one execution.
+
+    The first caller of a key runs the call; callers arriving while it is in
+    flight wait for it and share its result (or exception). Nothing is
+    remembered once the call completes, so later calls run again; combine
+    with MCPResultCache to reuse results over time. Thread and asyncio callers
+    are coalesced separately, and only within this process: calls from other
+    Codex sessions (each with its own MCP server) are never shared.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        # Event loop -> key -> task in flight on that loop
+        self._tasks: "weakref.WeakKeyDictionary[Any, Dict[str, asyncio.Task]]"
+        self._tasks = weakref.WeakKeyDictionary()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run ``func`` unless an identical call is in flight, then share its outcome.
+
+        Args:
+            key: Identifies identical calls
+            func: The call to run
+
+        Returns:
+            The result of the call
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await ``func()`` unless an identical call is in flight on this loop.
+
+        The call runs as a task of its own, so a cancelled caller does not
+        cancel it for the others.
+
+        Args:
+            key: Identifies identical calls
+            func: Returns the awaitable to run
+
+        Returns:
+            The result of the call
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            if task is None:
+                task = tasks[key] = loop.create_task(_await(func()))
+                task.add_done_callback(lambda _: tasks.pop(key, None))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the numbers of executed and coalesced calls."""
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced}
+
+
+async def _await(awaitable: Awaitable[Any]) -> Any:
+    return await awaitable
+
 
 class SafeMCPWrapper:
     """Wrapper for MCP tools that automatically handles large outputs."""
 
-    def __init__(self, tool_name: str):
+    def __init__(
+        self,
+        tool_name: str,
+        max_total_length: Optional[int] = None,
+        max_total_tokens: Optional[int] = None,
+        cache: Optional[MCPResultCache] = None,
+        max_concurrency: Optional[int] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ):
+        """
+        Args:
+            tool_name: Name of the wrapped MCP tool
+            max_total_length: Budget for a whole result in characters;
+                defaults to MAX_MCP_TOTAL_LENGTH
+            max_total_tokens: Budget for a whole result in tokens (estimated
+                at CHARS_PER_TOKEN characters each); the smaller budget wins
+            cache: Optional result cache; only tools with a TTL in the cache
+                are served from it
+            max_concurrency: Calls of this tool in flight at once in
+                ``execute_safely_async``; defaults to MCP_TOOL_CONCURRENCY
+            single_flight: Optional group in which identical concurrent calls
+                of read-only tools share one request
+        """
         self.tool_name = tool_name
+        self.cache = cache
+        self.single_flight = single_flight
+        budget = MAX_MCP_TOTAL_LENGTH if max_total_length is None else max_total_length
+        if max_total_tokens is not None:
+            budget = min(budget, max_total_tokens * CHARS_PER_TOKEN)
+        self.max_total_length = budget
+        self.max_concurrency = max(1, max_concurrency or Settings.MCP_TOOL_CONCURRENCY)
+        # Event loop -> semaphore limiting the calls in flight on that loop
+        self._semaphores: "weakref.WeakKeyDictionary[Any, asyncio.Semaphore]"
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._semaphores_lock = threading.Lock()
+        # Size report of the most recently completed call
+        self.last_report: Optional[SizeReport] = None
+
+    def call_key(self, args: Tuple[Any, ...], kwargs: Mapping[str, Any]) -> str:
+        """
+        Return the key identifying identical calls of this wrapper.
+
+        Args:
+            args: Positional arguments of the call
+            kwargs: Keyword arguments of the call
+
+        Returns:
+            The cache and single-flight key; it includes the size budget
+        """
+        return make_cache_key(
+            self.tool_name, args, {**kwargs, "__budget__": self.max_total_length}
+        )
+
+    def _call_key(
+        self, args: Tuple[Any, ...], kwargs: Mapping[str, Any]
+    ) -> Optional[str]:
+        """Key identifying identical calls, if they are cached or coalesced."""
+        cached = self.cache is not None and self.cache.is_cacheable(self.tool_name)
+        coalesced = self.single_flight is not None and self.tool_name in READ_ONLY_TOOLS
+        if not cached and not coalesced:
+            return None
+        return self.call_key(args, kwargs)
+
+    def _cache_lookup(self, key: Optional[str]) -> Tuple[bool, Any]:
+        """Return (hit, cached result) for a call."""
+        if key is None or self.cache is None:
+            return False, None
+        hit, cached = self.cache.get(key)
+        if hit:
+            logger.debug("MCP tool %s served from cache", self.tool_name)
+        return hit, cached
+
+    def bound_result(self, result: Any, cache_key: Optional[str] = None) -> Any:
+        """
+        Bound a raw tool result and store it in the cache.
+
+        ``execute_safely`` calls this for every result; it is public for
+        results obtained elsewhere, e.g. relayed by the MCP proxy.
+
+        Args:
+            result: The raw tool result
+            cache_key: Key to cache the bounded result under, if any
+
+        Returns:
+            The result, bounded by the wrapper's aggregate budget
+        """
+        if self.tool_name in BUILD_LOG_TOOLS:
+            result = excerpt_build_log(result, self.max_total_length)
+
+        # Make result safe for MCP transmission; sizes are accounted in the
+        # same walk
+        safe_result, report = bound_mcp_output(result, self.max_total_length)
+        self.last_report = report
+        if report.strings_truncated or report.items_elided:
+            logger.warning(
+                "Large content detected from %s: %d characters (largest string "
+                "%d at %s, deepest nesting %d at %s) - reduced to %d characters, "
+                "%d strings truncated, %d items elided",
+                self.tool_name,
+                report.chars_in,
+                report.largest_string,
+                report.largest_string_path,
+                report.max_depth,
+                report.deepest_path,
+                report.chars_out,
+                report.strings_truncated,
+                report.items_elided,
+            )
+        if cache_key is not None and self.cache is not None:
+            self.cache.put(self.tool_name, cache_key, safe_result)
+        logger.debug("MCP tool %s completed successfully", self.tool_name)
+        return safe_result
 
     def execute_safely(  # pylint: disable=line-too-long
         self, tool_func: Callable[..., Any], *args: Any, **kwargs: Any
@@ -26,32 +474,155 @@ class SafeMCPWrapper:
             **kwargs: Keyword arguments for the tool
 
         Returns:
-            The tool result with safe output sizes
+            The tool result, bounded by the wrapper's aggregate budget
         """
+        key = self._call_key(args, kwargs)
+        hit, cached = self._cache_lookup(key)
+        if hit:
+            return cached
+        if key is not None and self.single_flight is not None:
+            if self.tool_name in READ_ONLY_TOOLS:
+                return self.single_flight.do(
+                    key, lambda: self._execute(key, tool_func, args, kwargs)
+                )
+        return self._execute(key, tool_func, args, kwargs)
+
+    def _execute(
+        self,
+        key: Optional[str],
+        tool_func: Callable[..., Any],
+        args: Tuple[Any, ...],
+        kwargs: Mapping[str, Any],
+    ) -> Any:
         try:
             logger.debug("Executing MCP tool: %s", self.tool_name)
             result = tool_func(*args, **kwargs)
+            return self.bound_result(result, key)
 
-            # Check if result contains large strings and log warning
-            if isinstance(result, str):
-                log_large_content_warning(result, self.tool_name)
-            elif isinstance(result, dict):
-                for key, value in result.items():
-                    if isinstance(value, str):
-                        log_large_content_warning(value, f"{self.tool_name}.{key}")
+        except Exception as e:
+            logger.error("Error executing MCP tool %s: %s", self.tool_name, e)
+            raise
 
-            # Make result safe for MCP transmission
-            safe_result = safe_mcp_output(result)
-            logger.debug("MCP tool %s completed successfully", self.tool_name)
-            return safe_result
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to the loop they are used on, so one is created
+        # lazily per running loop
+        loop = asyncio.get_running_loop()
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    async def execute_safely_async(
+        self, tool_func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        Execute an MCP tool without blocking the event loop.
+
+        Coroutine functions are awaited; plain functions run in a worker
+        thread. At most ``max_concurrency`` calls of this wrapper run at once,
+        and results that may need truncation are bounded in a worker thread.
+
+        Args:
+            tool_func: The MCP tool function (sync or async) to execute
+            *args: Positional arguments for the tool
+            **kwargs: Keyword arguments for the tool
+
+        Returns:
+            The tool result, bounded by the wrapper's aggregate budget
+        """
+        key = self._call_key(args, kwargs)
+        hit, cached = self._cache_lookup(key)
+        if hit:
+            return cached
+        if key is not None and self.single_flight is not None:
+            if self.tool_name in READ_ONLY_TOOLS:
+                return await self.single_flight.do_async(
+                    key, lambda: self._execute_async(key, tool_func, args, kwargs)
+                )
+        return await self._execute_async(key, tool_func, args, kwargs)
+
+    async def _execute_async(
+        self,
+        key: Optional[str],
+        tool_func: Callable[..., Any],
+        args: Tuple[Any, ...],
+        kwargs: Mapping[str, Any],
+    ) -> Any:
+        try:
+            logger.debug("Executing MCP tool: %s", self.tool_name)
+            async with self._semaphore():
+                if inspect.iscoroutinefunction(tool_func):
+                    result = await tool_func(*args, **kwargs)
+                else:
+                    result = await asyncio.to_thread(tool_func, *args, **kwargs)
+                    if inspect.isawaitable(result):
+                        result = await result
+            if _is_small(result):
+                return self.bound_result(result, key)
+            return await asyncio.to_thread(self.bound_result, result, key)
 
         except Exception as e:
             logger.error("Error executing MCP tool %s: %s", self.tool_name, e)
             raise
 
 
-def create_safe_mcp_tools() -> Dict[str, SafeMCPWrapper]:
-    """Create safe wrappers for commonly used MCP tools."""
+# A call for the batch APIs: (wrapper, tool function, keyword arguments)
+MCPCall = Tuple[SafeMCPWrapper, Callable[..., Any], Mapping[str, Any]]
+
+
+async def gather_safely(
+    calls: Iterable[MCPCall], return_exceptions: bool = False
+) -> List[Any]:
+    """
+    Run several MCP tool calls concurrently.
+
+    Each call is subject to the concurrency limit of its wrapper, so a batch
+    takes roughly as long as its slowest call when the limits allow.
+
+    Args:
+        calls: (wrapper, tool function, keyword arguments) triples
+        return_exceptions: Return exceptions in place of results instead of
+            raising the first one
+
+    Returns:
+        The bounded results in the order of the calls
+    """
+    return await asyncio.gather(
+        *(
+            wrapper.execute_safely_async(func, **kwargs)
+            for wrapper, func, kwargs in calls
+        ),
+        return_exceptions=return_exceptions,
+    )
+
+
+def execute_batch(
+    calls: Iterable[MCPCall], return_exceptions: bool = False
+) -> List[Any]:
+    """
+    Run several MCP tool calls concurrently from synchronous code.
+
+    Args:
+        calls: (wrapper, tool function, keyword arguments) triples
+        return_exceptions: Return exceptions in place of results
+
+    Returns:
+        The bounded results in the order of the calls
+    """
+    return asyncio.run(gather_safely(calls, return_exceptions))
+
+
+def create_safe_mcp_tools(
+    cache: Optional[MCPResultCache] = None,
+    single_flight: Optional[SingleFlight] = None,
+) -> Dict[str, SafeMCPWrapper]:
+    """
+    Create safe wrappers for commonly used MCP tools.
+
+    The wrappers share the given result cache and single-flight group.
+    """
     tools = [
         "repo_get_repo_by_name_or_id",
         "repo_list_branches_by_repo",
@@ -64,7 +635,10 @@ def create_safe_mcp_tools() -> Dict[str, SafeMCPWrapper]:
         "build_get_log_by_id",
     ]
 
-    return {tool: SafeMCPWrapper(tool) for tool in tools}
+    return {
+        tool: SafeMCPWrapper(tool, cache=cache, single_flight=single_flight)
+        for tool in tools
+    }
 
 
 # Example usage patterns that can be documented
@@ -82,21 +656,46 @@ result = wrapper.execute_safely(mcp_ado_search_code,
         "tips": [
             "Be specific with search terms to reduce result size",
             "Consider multiple smaller searches instead of one large search",
+            "Share an MCPResultCache (create_safe_mcp_tools(cache=MCPResultCache()))"
+            " to serve repeated identical searches locally; see cache.stats()",
         ],
     },
     "build_logs": {
-        "description": "Get build logs with automatic truncation",
+        "description": "Get build logs reduced to their failure regions",
         "example": """
 # Safe build log retrieval
 wrapper = safe_tools["build_get_log"]
 result = wrapper.execute_safely(mcp_ado_build_get_log,
                                project="your-project",
                                buildId=12345)
+
+# Direct access to a large log
+with BuildLog.from_content(log_text) as log:
+    excerpt = log.failure_excerpt(max_length=50_000)
+    matches = log.grep(r"FAILED|AssertionError", max_matches=20)
+    section = log.get_lines(1200, 1260)
 """,
         "tips": [
-            "Large build logs will be automatically truncated",
+            "Large build logs are reduced to the lines around ##[error] markers "
+            "(or error/failure lines) instead of being cut after N characters",
+            "Use BuildLog.grep and get_lines to inspect other parts of a log",
             "Use build_get_log_by_id with line ranges for specific log sections",
             "Check logs for multiple builds separately rather than in batch",
         ],
     },
+    "fan_out": {
+        "description": "Run the same query against several repositories at once",
+        "example": """
+# Concurrent searches, bounded per tool by MCP_TOOL_CONCURRENCY
+wrapper = safe_tools["search_code"]
+results = execute_batch(
+    [(wrapper, mcp_ado_search_code, {"searchText": "login", "repository": [repo]})
+     for repo in ["web", "api", "auth"]]
+)
+""",
+        "tips": [
+            "Use gather_safely inside a running event loop, execute_batch outside",
+            "Pass return_exceptions=True to keep the results of successful calls",
+        ],
+    },
 }
@@ -5,6 +5,16 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from src.jira_fetch import reset_jira_client
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_jira_client():
+    """Make sure no test reuses a Jira client created by another test."""
+    reset_jira_client()
+    yield
+    reset_jira_client()
+
 
 @pytest.fixture
 def mock_env_vars():
@@ -55,3 +65,17 @@ def mock_jira_client():
 
     mock_client.issue.return_value = mock_issue
     return mock_client
+
+
+@pytest.fixture
+def byte_encoding():
+    """A download-free tiktoken encoding with one token per byte."""
+    tiktoken = pytest.importorskip("tiktoken")
+    encoding = tiktoken.Encoding(
+        name="test-bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+    with patch("src.mcp_output_utils.get_encoding", return_value=encoding):
+        yield encoding
@@ -10,11 +10,13 @@ import pytest
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from src.main import main
+from src.prompt_templates import PromptTemplate
 
 
 class TestAdditionalInstructions:
     """Test cases specifically for the additional instructions feature."""
 
+    @patch("src.main.load_template")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
     @patch("src.main.fetch_issue")
@@ -32,7 +34,12 @@ class TestAdditionalInstructions:
         ],
     )
     def test_empty_additional_instructions(
-        self, mock_path, mock_fetch_issue, mock_build_context, mock_run_codex
+        self,
+        mock_path,
+        mock_fetch_issue,
+        mock_build_context,
+        mock_run_codex,
+        mock_load_template,
     ):
         """Test main function with empty additional instructions."""
         # Setup mocks
@@ -40,15 +47,13 @@ class TestAdditionalInstructions:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -66,6 +71,7 @@ class TestAdditionalInstructions:
         # Verify exit code
         assert exc_info.value.code == 0
 
+    @patch("src.main.load_template")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
     @patch("src.main.fetch_issue")
@@ -83,7 +89,12 @@ class TestAdditionalInstructions:
         ],
     )
     def test_long_additional_instructions(
-        self, mock_path, mock_fetch_issue, mock_build_context, mock_run_codex
+        self,
+        mock_path,
+        mock_fetch_issue,
+        mock_build_context,
+        mock_run_codex,
+        mock_load_template,
     ):
         """Test main function with very long additional instructions to test token estimation."""
         # Setup mocks
@@ -91,15 +102,13 @@ class TestAdditionalInstructions:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -120,6 +129,7 @@ class TestAdditionalInstructions:
         # Verify exit code
         assert exc_info.value.code == 0
 
+    @patch("src.main.load_template")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
     @patch("src.main.fetch_issue")
@@ -137,7 +147,12 @@ class TestAdditionalInstructions:
         ],
     )
     def test_multiline_additional_instructions(
-        self, mock_path, mock_fetch_issue, mock_build_context, mock_run_codex
+        self,
+        mock_path,
+        mock_fetch_issue,
+        mock_build_context,
+        mock_run_codex,
+        mock_load_template,
     ):
         """Test main function with multiline additional instructions containing special characters."""
         # Setup mocks
@@ -145,15 +160,13 @@ class TestAdditionalInstructions:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -0,0 +1,157 @@
+"""Unit tests for memory-mapped build log access."""
+
+import mmap
+from unittest.mock import patch
+
+import pytest
+
+from src.build_logs import BuildLog
+from src.safe_mcp_tools import SafeMCPWrapper, excerpt_build_log
+
+
+def _lines(count=5000, errors=()):
+    lines = [
+        f"2024-05-01T12:00:00Z compiling unit {i} {'.' * (i % 90)}"
+        for i in range(count)
+    ]
+    for index in errors:
+        lines[index] = f"##[error]unit {index} failed to compile"
+    return lines
+
+
+@pytest.fixture
+def small_blocks():
+    """Use tiny index blocks so that small logs span many of them."""
+    with patch("src.build_logs.INDEX_BLOCK_SIZE", 256):
+        yield
+
+
+class TestBuildLog:
+    """Test line ranges, grep and error windows."""
+
+    @pytest.mark.parametrize("trailing_newline", [True, False])
+    def test_get_lines_matches_the_source(self, small_blocks, trailing_newline):
+        """Test that every line is located through the sparse index."""
+        lines = _lines(2000)
+        text = "\n".join(lines) + ("\n" if trailing_newline else "")
+
+        with BuildLog.from_content(text) as log:
+            assert log.line_count == 2000
+            for number in (1, 2, 255, 256, 1000, 1999, 2000):
+                assert log.get_lines(number, number) == lines[number - 1]
+            assert log.get_lines(1998, 5000) == "\n".join(lines[1997:])
+            assert log.get_lines(10, 9) == ""
+
+    def test_line_number_of_offsets(self, small_blocks):
+        """Test mapping byte offsets back to line numbers."""
+        text = "\n".join(_lines(500)) + "\n"
+
+        with BuildLog.from_content(text) as log:
+            for offset in (0, 1, 255, 256, 9999, len(text) - 1):
+                assert log.line_number(offset) == text[:offset].count("\n") + 1
+
+    def test_large_logs_are_spooled_and_memory_mapped(self):
+        """Test that logs above the threshold are backed by a mapped file."""
+        lines = _lines(3000, errors=[2500])
+
+        with patch("src.build_logs.SPOOL_THRESHOLD", 10_000):
+            log = BuildLog.from_content(lines)
+        with log:
+            assert isinstance(log._data, mmap.mmap)
+            assert log.line_count == 3000
+            assert log.get_lines(2501, 2501) == lines[2500]
+        assert log.size == 0
+
+    def test_from_file(self, tmp_path):
+        """Test memory-mapping an existing log file, including empty ones."""
+        path = tmp_path / "build.log"
+        path.write_text("first\nsecond\n", encoding="utf-8")
+        (tmp_path / "empty.log").write_bytes(b"")
+
+        with BuildLog.from_file(path) as log:
+            assert log.get_lines(2, 2) == "second"
+        with BuildLog.from_file(tmp_path / "empty.log") as log:
+            assert log.line_count == 0
+            assert log.grep("x") == []
+
+    def test_grep_returns_one_hit_per_line(self):
+        """Test matching, line numbers, limits and case folding."""
+        text = "ok\nTest FAILED: a failed\nok\ntest failed: b\n"
+
+        with BuildLog.from_content(text) as log:
+            assert log.grep("failed") == [
+                (2, "Test FAILED: a failed"),
+                (4, "test failed: b"),
+            ]
+            assert log.grep("FAILED") == [(2, "Test FAILED: a failed")]
+            assert log.grep("^test", ignore_case=True, max_matches=1) == [
+                (2, "Test FAILED: a failed")
+            ]
+
+    def test_error_windows_prefer_pipeline_markers(self):
+        """Test that ##[error] lines win over generic error words."""
+        lines = _lines(1000, errors=[500, 505, 900])
+        lines[100] = "warning: 3 errors were ignored, build failed earlier"
+
+        with BuildLog.from_content(lines) as log:
+            windows = log.error_windows(context_lines=10)
+
+        # Hits on lines 501 and 506 overlap and are merged
+        assert windows == [(491, 516), (891, 911)]
+
+    def test_error_windows_fall_back_to_error_words(self):
+        """Test logs without pipeline markers."""
+        lines = _lines(100)
+        lines[49] = "Traceback (most recent call last):"
+
+        with BuildLog.from_content(lines) as log:
+            assert log.error_windows(context_lines=2) == [(48, 52)]
+            assert log.error_windows(context_lines=2, max_windows=0) == []
+
+    def test_failure_excerpt_fits_and_shows_failures(self):
+        """Test that the excerpt contains the failure region within budget."""
+        lines = _lines(20_000, errors=[12_345])
+
+        with BuildLog.from_content(lines) as log:
+            excerpt = log.failure_excerpt(max_length=5000, context_lines=5)
+
+        assert len(excerpt) <= 5000
+        assert excerpt.startswith("[BUILD LOG EXCERPT: 20000 lines,")
+        assert "--- lines 12341-12351 ---" in excerpt
+        assert "##[error]unit 12345 failed to compile" in excerpt
+
+    def test_failure_excerpt_without_errors_summarizes(self):
+        """Test that logs without errors fall back to head and tail."""
+        with BuildLog.from_content(_lines(20_000)) as log:
+            excerpt = log.failure_excerpt(max_length=5000)
+
+        assert len(excerpt) <= 5000
+        assert "[CONTENT SUMMARIZED: 20001 total lines" in excerpt
+
+
+class TestBuildLogTools:
+    """Test the SafeMCPWrapper integration."""
+
+    def test_small_logs_are_unchanged(self):
+        """Test that logs within the budget pass through."""
+        lines = _lines(10)
+        assert excerpt_build_log(lines, 10_000) is lines
+        assert excerpt_build_log({"value": 1}, 1) == {"value": 1}
+
+    def test_wrapper_returns_failure_region(self):
+        """Test that build log tools hand back the failure region."""
+        lines = _lines(20_000, errors=[19_000])
+        wrapper = SafeMCPWrapper("build_get_log_by_id", max_total_length=8000)
+
+        result = wrapper.execute_safely(lambda: lines)
+
+        assert isinstance(result, list)
+        assert "##[error]unit 19000 failed to compile" in result
+        assert sum(len(line) + 1 for line in result) <= 8000 + 1
+
+    def test_other_tools_are_not_excerpted(self):
+        """Test that only build log tools are reduced to failure regions."""
+        text = "\n".join(_lines(20_000, errors=[19_000]))
+        wrapper = SafeMCPWrapper("search_code", max_total_length=8000)
+
+        assert "##[error]" not in wrapper.execute_safely(lambda: text)
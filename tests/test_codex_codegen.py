@@ -0,0 +1,301 @@
+"""Unit tests for the Codex CLI integration."""
+
+import gzip
+import logging
+import os
+import signal
+import stat
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.codex_codegen import (
+    CODEX_CANCELLED_EXIT_CODE,
+    CODEX_TIMEOUT_EXIT_CODE,
+    PROMPT_TRANSPORTS,
+    build_codex_command,
+    cancel_codex_runs,
+    run_codex,
+)
+from src.config import Settings
+
+STUB_CODEX = """#!{python}
+import sys
+import time
+prompt = sys.argv[-1]
+if prompt == "-":
+    prompt = sys.stdin.read()
+with open({out!r}, "w", encoding="utf-8") as f:
+    f.write(prompt)
+for i in range(5):
+    print("working on step", i, flush=True)
+print("warning: almost done", file=sys.stderr, flush=True)
+time.sleep({sleep})
+sys.exit(3)
+"""
+
+
+@pytest.fixture
+def stub_codex(tmp_path, request):
+    """Install a fake `codex` executable that records the prompt it receives."""
+    out = tmp_path / "received.txt"
+    script = tmp_path / "codex"
+    sleep = getattr(request, "param", 0)
+    script.write_text(
+        STUB_CODEX.format(python=sys.executable, out=str(out), sleep=sleep),
+        encoding="utf-8",
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    with patch.object(Settings, "CODEX_BIN", str(script)):
+        yield out
+
+
+class TestRunCodex:
+    """Test launching Codex with the different prompt transports."""
+
+    def test_build_codex_command(self):
+        """Test the Codex command line."""
+        with patch.object(Settings, "CODEX_BIN", "codex"):
+            cmd = build_codex_command("-")
+
+        assert cmd == [
+            "codex",
+            "exec",
+            "--full-auto",
+            "--sandbox",
+            "danger-full-access",
+            "-",
+        ]
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX stub executable")
+    @pytest.mark.parametrize("transport", PROMPT_TRANSPORTS)
+    def test_prompt_reaches_codex(self, transport, stub_codex, tmp_path):
+        """Test that every transport delivers the prompt unchanged."""
+        prompt = "Implement EP-1234\n" + "é" * 1000
+
+        rc = run_codex(prompt, tmp_path, transport=transport)
+
+        assert rc == 3
+        assert stub_codex.read_text(encoding="utf-8") == prompt
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX stub executable")
+    @pytest.mark.parametrize("transport", ["stdin", "file"])
+    def test_large_prompt_is_not_passed_on_command_line(
+        self, transport, stub_codex, tmp_path
+    ):
+        """Test that prompts far beyond the argv size limit launch reliably."""
+        prompt = "x" * (4 * 1024 * 1024)
+
+        rc = run_codex(prompt, tmp_path, transport=transport)
+
+        assert rc == 3
+        assert stub_codex.read_text(encoding="utf-8") == prompt
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="POSIX stub executable")
+    def test_default_transport_from_settings(self, stub_codex, tmp_path):
+        """Test that the configured transport is used by default."""
+        with patch.object(Settings, "CODEX_PROMPT_TRANSPORT", "stdin"), patch(
+            "src.codex_codegen.subprocess.Popen", wraps=subprocess.Popen
+        ) as mock_popen:
+            assert run_codex("prompt", tmp_path) == 3
+
+        cmd = mock_popen.call_args.args[0]
+        assert cmd[-1] == "-"
+        assert mock_popen.call_args.kwargs["stdin"] == subprocess.PIPE
+        assert stub_codex.read_text(encoding="utf-8") == "prompt"
+
+    def test_unknown_transport(self, tmp_path):
+        """Test that an unknown transport is rejected."""
+        with pytest.raises(ValueError):
+            run_codex("prompt", tmp_path, transport="carrier-pigeon")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX stub executable")
+class TestStreamingOutput:
+    """Test the streaming output capture mode."""
+
+    def test_output_is_logged_and_tail_kept(self, stub_codex, tmp_path, caplog):
+        """Test that output lines are logged and the tail reported on failure."""
+        with caplog.at_level(logging.INFO), patch.object(
+            Settings, "CODEX_TAIL_LINES", 2
+        ):
+            rc = run_codex("prompt", tmp_path, stream_output=True, transcript_dir="")
+
+        assert rc == 3
+        output = [r.getMessage() for r in caplog.records if r.name.endswith(".output")]
+        assert "[stdout] working on step 0" in output
+        assert "[stderr] warning: almost done" in output
+        tail_report = [
+            r.getMessage() for r in caplog.records if "Last 2" in r.getMessage()
+        ]
+        assert tail_report and "working on step 0" not in tail_report[0]
+
+    def test_transcript_is_compressed(self, stub_codex, tmp_path):
+        """Test that a gzip transcript of the whole output is written."""
+        transcripts = tmp_path / "transcripts"
+
+        run_codex(
+            "prompt", tmp_path, stream_output=True, transcript_dir=str(transcripts)
+        )
+
+        (path,) = transcripts.glob("codex-*.log.gz")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 6
+        assert "[stdout] working on step 4" in lines
+
+    @pytest.mark.parametrize("stub_codex", [0.5], indirect=True)
+    def test_heartbeat_is_logged(self, stub_codex, tmp_path, caplog):
+        """Test that progress heartbeats are emitted while Codex runs."""
+        with caplog.at_level(logging.INFO), patch.object(
+            Settings, "CODEX_HEARTBEAT_SECONDS", 0.1
+        ):
+            run_codex("prompt", tmp_path, stream_output=True, transcript_dir="")
+
+        heartbeats = [
+            r.getMessage()
+            for r in caplog.records
+            if r.getMessage().startswith("Codex still running")
+        ]
+        assert heartbeats
+        assert "lines=" in heartbeats[-1]
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    stat_file = f"/proc/{pid}/stat"
+    if os.path.exists(stat_file):
+        # A killed but not yet reaped process is a zombie
+        with open(stat_file, encoding="utf-8") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    return True
+
+
+def _install_script(tmp_path, body):
+    script = tmp_path / "codex"
+    script.write_text(f"#!{sys.executable}\n{body}", encoding="utf-8")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX process groups")
+class TestTimeoutsAndLimits:
+    """Test timeouts, cancellation and resource limits."""
+
+    def test_wall_clock_timeout_kills_process_group(self, tmp_path):
+        """Test that the whole process group is stopped after the timeout."""
+        pid_file = tmp_path / "grandchild.pid"
+        body = (
+            "import subprocess, sys, time\n"
+            "sys.stdin.read()\n"
+            "child = subprocess.Popen(['sleep', '60'])\n"
+            f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+            "time.sleep(60)\n"
+        )
+        with patch.object(
+            Settings, "CODEX_BIN", _install_script(tmp_path, body)
+        ), patch.object(Settings, "CODEX_TIMEOUT_SECONDS", 1):
+            started = time.monotonic()
+            rc = run_codex("prompt", tmp_path, stream_output=False)
+
+        assert rc == CODEX_TIMEOUT_EXIT_CODE
+        assert time.monotonic() - started < 30
+        grandchild = int(pid_file.read_text())
+        time.sleep(0.2)
+        assert not _is_running(grandchild)
+
+    def test_idle_timeout(self, tmp_path, caplog):
+        """Test that a run producing no output is stopped."""
+        body = (
+            "import sys, time\n"
+            "sys.stdin.read()\n"
+            "print('hi', flush=True)\n"
+            "time.sleep(60)\n"
+        )
+        with patch.object(
+            Settings, "CODEX_BIN", _install_script(tmp_path, body)
+        ), patch.object(Settings, "CODEX_IDLE_TIMEOUT_SECONDS", 1), caplog.at_level(
+            logging.WARNING
+        ):
+            rc = run_codex("prompt", tmp_path, stream_output=True, transcript_dir="")
+
+        assert rc == CODEX_TIMEOUT_EXIT_CODE
+        assert any("idle timeout" in r.getMessage() for r in caplog.records)
+
+    def test_sigterm_escalates_to_sigkill(self, tmp_path):
+        """Test that a child ignoring SIGTERM is killed after the grace period."""
+        body = (
+            "import signal, sys, time\n"
+            "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n"
+            "sys.stdin.read()\n"
+            "time.sleep(60)\n"
+        )
+        with patch.object(
+            Settings, "CODEX_BIN", _install_script(tmp_path, body)
+        ), patch.object(Settings, "CODEX_TIMEOUT_SECONDS", 0.5), patch.object(
+            Settings, "CODEX_KILL_GRACE_SECONDS", 0.5
+        ):
+            started = time.monotonic()
+            rc = run_codex("prompt", tmp_path, stream_output=False)
+
+        assert rc == CODEX_TIMEOUT_EXIT_CODE
+        assert time.monotonic() - started < 30
+
+    def test_cancellation(self, tmp_path):
+        """Test that cancel_codex_runs stops a running Codex."""
+        body = "import sys, time\nsys.stdin.read()\ntime.sleep(60)\n"
+        with patch.object(Settings, "CODEX_BIN", _install_script(tmp_path, body)):
+            threading.Timer(0.5, cancel_codex_runs).start()
+            rc = run_codex("prompt", tmp_path, stream_output=False)
+
+        assert rc == CODEX_CANCELLED_EXIT_CODE
+
+    def test_cancellation_does_not_stop_later_runs(self, tmp_path):
+        """Test that runs started after cancel_codex_runs are not stopped."""
+        # Outlives the first poll, where a lingering cancellation would stop it
+        body = "import sys, time\nsys.stdin.read()\ntime.sleep(1)\n"
+        with patch.object(Settings, "CODEX_BIN", _install_script(tmp_path, body)):
+            cancel_codex_runs()
+            rc = run_codex("prompt", tmp_path, stream_output=False)
+
+        assert rc == 0
+
+    def test_keyboard_interrupt_stops_codex(self, tmp_path):
+        """Test that Codex, in its own session, is stopped on Ctrl+C."""
+        body = "import sys, time\nsys.stdin.read()\ntime.sleep(60)\n"
+        procs = []
+        popen = subprocess.Popen
+
+        def spawn(*args, **kwargs):
+            procs.append(popen(*args, **kwargs))
+            return procs[-1]
+
+        with patch.object(
+            Settings, "CODEX_BIN", _install_script(tmp_path, body)
+        ), patch("src.codex_codegen.subprocess.Popen", side_effect=spawn), patch(
+            "src.codex_codegen._supervise", side_effect=KeyboardInterrupt
+        ):
+            with pytest.raises(KeyboardInterrupt):
+                run_codex("prompt", tmp_path, stream_output=False)
+
+        assert procs[0].poll() is not None
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="RLIMIT_CPU semantics")
+    def test_cpu_limit(self, tmp_path):
+        """Test that the CPU rlimit stops a runaway child."""
+        body = "import sys\nsys.stdin.read()\nwhile True:\n    pass\n"
+        with patch.object(
+            Settings, "CODEX_BIN", _install_script(tmp_path, body)
+        ), patch.object(Settings, "CODEX_CPU_LIMIT_SECONDS", 1), patch.object(
+            Settings, "CODEX_TIMEOUT_SECONDS", 30
+        ):
+            rc = run_codex("prompt", tmp_path, stream_output=False)
+
+        assert rc == -signal.SIGXCPU
@@ -1,6 +1,9 @@
 """Tests for context window management functionality."""
 
-from unittest.mock import patch
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -8,9 +11,13 @@ from src.config import Settings
 from src.main import _manage_prompt_size
 from src.mcp_output_utils import (
     CONTEXT_WINDOW_LIMITS,
+    RESPONSE_TOKEN_RESERVE,
+    _encoding_cache,
     count_tokens,
     estimate_prompt_tokens,
+    fit_to_token_limit,
     get_context_window_limit,
+    get_encoding,
 )
 
 
@@ -43,6 +50,43 @@ class TestTokenCounting:
         tokens = count_tokens("")
         assert tokens == 0
 
+    def test_encoding_is_loaded_once_per_model(self):
+        """Test that the tiktoken encoding is cached per model."""
+        fake_encoding = MagicMock()
+        fake_encoding.encode_ordinary.return_value = [1, 2, 3]
+
+        with patch.dict(_encoding_cache.encodings, clear=True), patch(
+            "src.mcp_output_utils._load_encoding", return_value=fake_encoding
+        ) as mock_load, patch("src.mcp_output_utils.TIKTOKEN_AVAILABLE", True):
+            counts = [count_tokens("some text", "gpt-4") for _ in range(5)]
+            count_tokens("some text", "gpt-4o")
+
+        assert counts == [3] * 5
+        assert [c.args[0] for c in mock_load.call_args_list] == ["gpt-4", "gpt-4o"]
+
+    def test_encoding_failure_is_cached(self):
+        """Test that a failing encoding load is not retried on every call."""
+        with patch.dict(_encoding_cache.encodings, clear=True), patch(
+            "src.mcp_output_utils._load_encoding", side_effect=OSError("offline")
+        ) as mock_load, patch("src.mcp_output_utils.TIKTOKEN_AVAILABLE", True):
+            assert count_tokens("x" * 40) == 10
+            assert count_tokens("x" * 80) == 20
+            assert get_encoding("gpt-4") is None
+
+        mock_load.assert_called_once()
+
+    def test_tiktoken_is_imported_lazily(self):
+        """Test that importing the CLI does not import tiktoken."""
+        code = (
+            "import sys, src.main; " "sys.exit(1 if 'tiktoken' in sys.modules else 0)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=Path(__file__).resolve().parent.parent,
+            check=False,
+        )
+        assert result.returncode == 0
+
     def test_get_context_window_limit(self):
         """Test getting context window limits for different models."""
         assert get_context_window_limit("gpt-4") == 8192
@@ -105,6 +149,75 @@ class TestPromptSizeManagement:
         assert len(result) > 0
 
 
+class TestFitToTokenLimit:
+    """Test token-exact prompt fitting."""
+
+    def test_small_text_is_unchanged(self, byte_encoding):
+        """Test that fitting text is returned as-is."""
+        assert fit_to_token_limit("short text", 100) == "short text"
+
+    @pytest.mark.parametrize("limit", [500, 1000, 5000])
+    def test_result_fits_and_uses_budget(self, byte_encoding, limit):
+        """Test that the result fits the limit without wasting the budget."""
+        text = "".join(f"Line {i}: some content here\n" for i in range(2000))
+
+        result = fit_to_token_limit(text, limit)
+
+        tokens = len(byte_encoding.encode_ordinary(result))
+        assert tokens <= limit
+        assert tokens >= limit * 0.8
+        assert "CONTENT TRUNCATED" in result
+        assert result.startswith("Line 0:")
+        assert result.endswith("Line 1999: some content here\n")
+
+    def test_cuts_on_line_boundaries(self, byte_encoding):
+        """Test that head and tail consist of whole lines."""
+        text = "".join(f"Line {i}: some content here\n" for i in range(2000))
+
+        result = fit_to_token_limit(text, 1000)
+
+        head, _, tail = result.partition("\n\n[CONTENT TRUNCATED")
+        tail = tail.split("]\n\n", 1)[1]
+        assert all(line.startswith("Line ") for line in head.splitlines())
+        assert all(line.startswith("Line ") for line in tail.splitlines())
+
+    def test_multibyte_text_fits(self, byte_encoding):
+        """Test that cuts inside multi-byte characters still fit the limit."""
+        text = "é" * 10000
+
+        result = fit_to_token_limit(text, 301)
+
+        assert len(byte_encoding.encode_ordinary(result)) <= 301
+
+    def test_tiny_limit(self, byte_encoding):
+        """Test limits too small for the truncation marker."""
+        result = fit_to_token_limit("x" * 1000, 10)
+
+        assert result == "x" * 10
+
+    def test_fallback_without_tiktoken(self):
+        """Test fitting with the character based token estimate."""
+        text = "word " * 10000
+        with patch("src.mcp_output_utils.get_encoding", return_value=None):
+            result = fit_to_token_limit(text, 500)
+            assert count_tokens(result) <= 500
+
+        assert count_tokens(result) >= 450
+
+    def test_manage_prompt_size_guarantees_fit(self, byte_encoding):
+        """Test that managed prompts always fit the usable context."""
+        prompt = "".join(f"Requirement {i}\n" for i in range(5000))
+
+        with patch.object(Settings, "MAX_CONTEXT_TOKENS", 8192), patch.object(
+            Settings, "CONTEXT_SAFETY_MARGIN", 0.8
+        ):
+            result = _manage_prompt_size(prompt, "gpt-4")
+
+        max_prompt_tokens = int(8192 * 0.8) - RESPONSE_TOKEN_RESERVE
+        tokens = len(byte_encoding.encode_ordinary(result))
+        assert max_prompt_tokens * 0.95 <= tokens <= max_prompt_tokens
+
+
 class TestContextWindowLimits:
     """Test context window limit constants and configurations."""
 
@@ -0,0 +1,254 @@
+"""Unit tests for the async Jira fetcher, run against a local stub server."""
+
+import asyncio
+import email.utils
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src.jira_async import (  # noqa: E402
+    AsyncJiraFetcher,
+    _retry_after_seconds,
+    fetch_issues_async,
+)
+
+
+def _raw_issue(key, comments=(), total=None):
+    return {
+        "id": "10001",
+        "key": key,
+        "fields": {
+            "summary": f"Summary of {key}",
+            "description": "Fix the login page",
+            "labels": ["bug"],
+            "issuetype": {"name": "Bug"},
+            "project": {"key": key.split("-")[0]},
+            "issuelinks": [
+                {"type": {"name": "Blocks"}, "outwardIssue": {"key": "X-9"}}
+            ],
+            "attachment": [{"filename": "trace.log", "size": 1024}],
+            "comment": {
+                "comments": list(comments),
+                "startAt": 0,
+                "maxResults": len(comments),
+                "total": len(comments) if total is None else total,
+            },
+        },
+    }
+
+
+class StubJira:
+    """Scriptable Jira REST stub: per-path queues of (status, headers, body)."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.delay = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def add(self, path, body, status=200, headers=None):
+        self.routes.setdefault(path, []).append((status, headers or {}, body))
+
+    def handle(self, handler):
+        url = urlparse(handler.path)
+        with self.lock:
+            self.requests.append((url.path, parse_qs(url.query)))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            queue = self.routes.get(url.path)
+            if not queue:
+                status, headers, body = 404, {}, {"errorMessages": ["not found"]}
+            elif len(queue) > 1:
+                status, headers, body = queue.pop(0)
+            else:
+                status, headers, body = queue[0]
+            payload = json.dumps(body).encode("utf-8")
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                handler.send_header(name, value)
+            handler.end_headers()
+            handler.wfile.write(payload)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def stub():
+    """Run a stub Jira server on an ephemeral local port."""
+    jira = StubJira()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # noqa: N802
+            jira.handle(self)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    jira.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield jira
+    server.shutdown()
+    server.server_close()
+
+
+def _fetcher(stub, **kwargs):
+    options = {"user": "user", "api_token": "token", "backoff_seconds": 0.01}
+    options.update(kwargs)
+    return AsyncJiraFetcher(server=stub.url, **options)
+
+
+def _fetch_one(stub, key, **kwargs):
+    async def run():
+        async with _fetcher(stub, **kwargs) as fetcher:
+            return await fetcher.fetch_issue(key)
+
+    return asyncio.run(run())
+
+
+class TestAsyncFetchIssue:
+    """Test fetching single issues."""
+
+    def test_issue_has_fetch_issue_shape(self, stub):
+        """Test that the lifted fields and raw payload match fetch_issue."""
+        stub.add("/rest/api/2/issue/TEST-1", _raw_issue("TEST-1"))
+
+        issue = _fetch_one(stub, "TEST-1")
+
+        assert issue["key"] == "TEST-1"
+        assert issue["summary"] == "Summary of TEST-1"
+        assert issue["description"] == "Fix the login page"
+        assert issue["labels"] == ["bug"]
+        assert issue["issuetype"] == "Bug"
+        assert issue["project"] == "TEST"
+        fields = issue["raw"]["fields"]
+        assert fields["issuelinks"][0]["outwardIssue"]["key"] == "X-9"
+        assert fields["attachment"][0]["filename"] == "trace.log"
+
+    def test_remaining_comments_are_paged_in(self, stub):
+        """Test that comments beyond the issue response are fetched."""
+        comments = [{"id": str(i), "body": f"comment {i}"} for i in range(5)]
+        stub.add("/rest/api/2/issue/TEST-1", _raw_issue("TEST-1", comments[:2], 5))
+        stub.add(
+            "/rest/api/2/issue/TEST-1/comment",
+            {"startAt": 2, "maxResults": 3, "total": 5, "comments": comments[2:]},
+        )
+
+        issue = _fetch_one(stub, "TEST-1")
+
+        assert issue["raw"]["fields"]["comment"]["comments"] == comments
+        assert stub.requests[1] == (
+            "/rest/api/2/issue/TEST-1/comment",
+            {"startAt": ["2"], "maxResults": ["100"]},
+        )
+
+    def test_rate_limit_honors_retry_after(self, stub):
+        """Test that a 429 is retried after the advertised delay."""
+        stub.add("/rest/api/2/issue/TEST-1", {}, 429, {"Retry-After": "0.2"})
+        stub.add("/rest/api/2/issue/TEST-1", _raw_issue("TEST-1"))
+
+        started = time.monotonic()
+        issue = _fetch_one(stub, "TEST-1")
+
+        assert issue["key"] == "TEST-1"
+        assert len(stub.requests) == 2
+        assert time.monotonic() - started >= 0.2
+
+    def test_server_errors_are_retried_with_backoff(self, stub):
+        """Test that transient 5xx responses are retried."""
+        stub.add("/rest/api/2/issue/TEST-1", {}, 503)
+        stub.add("/rest/api/2/issue/TEST-1", {}, 502)
+        stub.add("/rest/api/2/issue/TEST-1", _raw_issue("TEST-1"))
+
+        assert _fetch_one(stub, "TEST-1")["key"] == "TEST-1"
+        assert len(stub.requests) == 3
+
+    def test_retries_are_limited(self, stub):
+        """Test that the last error is raised once the retries are used up."""
+        stub.add("/rest/api/2/issue/TEST-1", {}, 500)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            _fetch_one(stub, "TEST-1", max_retries=2)
+
+        assert len(stub.requests) == 3
+
+    def test_client_errors_are_not_retried(self, stub):
+        """Test that a 404 fails immediately."""
+        with pytest.raises(httpx.HTTPStatusError):
+            _fetch_one(stub, "MISSING-1")
+
+        assert len(stub.requests) == 1
+
+    def test_configuration_is_required(self):
+        """Test that a missing server is reported."""
+        with patch("src.jira_async.Settings.JIRA_SERVER", None):
+            with pytest.raises(ValueError, match="JIRA_SERVER"):
+                AsyncJiraFetcher(user="u", api_token="t")
+
+
+class TestAsyncFetchIssues:
+    """Test fetching many issues concurrently."""
+
+    def test_issues_keep_key_order_and_skip_failures(self, stub):
+        """Test ordering, deduplication and skipping of missing issues."""
+        for key in ("TEST-1", "TEST-2", "TEST-3"):
+            stub.add(f"/rest/api/2/issue/{key}", _raw_issue(key))
+
+        issues = fetch_issues_async(
+            ["TEST-3", "TEST-1", "MISSING-1", "TEST-2", "TEST-1"],
+            server=stub.url,
+            user="user",
+            api_token="token",
+        )
+
+        assert [issue["key"] for issue in issues] == ["TEST-3", "TEST-1", "TEST-2"]
+        assert len(stub.requests) == 4
+
+    def test_requests_in_flight_are_limited(self, stub):
+        """Test that no more than `concurrency` requests run at once."""
+        keys = [f"TEST-{i}" for i in range(12)]
+        for key in keys:
+            stub.add(f"/rest/api/2/issue/{key}", _raw_issue(key))
+        stub.delay = 0.05
+
+        issues = fetch_issues_async(
+            keys, server=stub.url, user="user", api_token="token", concurrency=3
+        )
+
+        assert len(issues) == 12
+        assert 1 < stub.max_in_flight <= 3
+
+
+class TestRetryAfter:
+    """Test parsing of the Retry-After header."""
+
+    def test_seconds(self):
+        """Test the delta-seconds form."""
+        assert _retry_after_seconds("7") == 7.0
+
+    def test_http_date(self):
+        """Test the HTTP-date form."""
+        when = email.utils.formatdate(time.time() + 30, usegmt=True)
+        assert 25 <= _retry_after_seconds(when) <= 30
+
+    def test_invalid_values(self):
+        """Test that missing or malformed values are ignored."""
+        assert _retry_after_seconds(None) is None
+        assert _retry_after_seconds("soon") is None
@@ -0,0 +1,68 @@
+"""Unit tests for the on-disk Jira issue cache."""
+
+import os
+import time
+
+from src.jira_cache import IssueCache, issue_updated
+
+
+def _issue(key, updated="2024-01-01T00:00:00.000+0000"):
+    return {"key": key, "summary": "s", "raw": {"fields": {"updated": updated}}}
+
+
+class TestIssueCache:
+    """Test the IssueCache class."""
+
+    def test_put_and_get_roundtrip(self, tmp_path):
+        """Test that stored issues are read back unchanged."""
+        cache = IssueCache(tmp_path)
+        cache.put("TEST-1", _issue("TEST-1"))
+
+        assert cache.get("TEST-1") == _issue("TEST-1")
+        assert cache.get("TEST-2") is None
+
+    def test_expired_entries_are_dropped(self, tmp_path):
+        """Test that entries older than the TTL are treated as missing."""
+        cache = IssueCache(tmp_path, ttl_seconds=60)
+        cache.put("TEST-1", _issue("TEST-1"))
+        path = tmp_path / "TEST-1.json"
+        old = time.time() - 120
+        os.utime(path, (old, old))
+
+        assert cache.get("TEST-1") is None
+        assert not path.exists()
+
+    def test_least_recently_used_entries_are_evicted(self, tmp_path):
+        """Test size-based eviction keeps the most recently used entries."""
+        cache = IssueCache(tmp_path, max_entries=2)
+        for i, key in enumerate(["TEST-1", "TEST-2"]):
+            cache.put(key, _issue(key))
+            stamp = time.time() - 100 + i
+            os.utime(tmp_path / f"{key}.json", (stamp, stamp))
+        cache.touch("TEST-1")
+
+        cache.put("TEST-3", _issue("TEST-3"))
+
+        assert cache.get("TEST-1") is not None
+        assert cache.get("TEST-2") is None
+        assert cache.get("TEST-3") is not None
+
+    def test_unreadable_entries_are_ignored(self, tmp_path):
+        """Test that corrupt cache files do not break fetching."""
+        cache = IssueCache(tmp_path)
+        (tmp_path / "TEST-1.json").write_text("{not json", encoding="utf-8")
+
+        assert cache.get("TEST-1") is None
+
+    def test_keys_are_sanitized(self, tmp_path):
+        """Test that keys cannot escape the cache directory."""
+        cache = IssueCache(tmp_path / "cache")
+        cache.put("../TEST-1", _issue("TEST-1"))
+
+        assert list((tmp_path / "cache").iterdir())
+        assert not (tmp_path / "TEST-1.json").exists()
+
+    def test_issue_updated(self):
+        """Test extracting the updated timestamp."""
+        assert issue_updated(_issue("TEST-1", "2024")) == "2024"
+        assert issue_updated({"key": "TEST-1", "raw": {}}) is None
@@ -1,10 +1,20 @@
 """Unit tests for Jira fetch module."""
 
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from src.jira_fetch import fetch_issue, get_jira_client
+from src.jira_cache import IssueCache
+from src.jira_fetch import (
+    PROMPT_FIELDS,
+    attach_comments,
+    fetch_comments,
+    fetch_issue,
+    fetch_issues,
+    get_jira_client,
+    reset_jira_client,
+)
 
 
 class TestJiraFetch:
@@ -17,6 +27,7 @@ class TestJiraFetch:
         mock_settings.JIRA_SERVER = "https://test.atlassian.net"
         mock_settings.JIRA_USER = "test@example.com"
         mock_settings.JIRA_API_TOKEN = "test-token"
+        mock_settings.JIRA_POOL_SIZE = 10
 
         mock_jira_instance = MagicMock()
         mock_jira_class.return_value = mock_jira_instance
@@ -29,6 +40,31 @@ class TestJiraFetch:
         )
         assert client == mock_jira_instance
 
+    @patch("src.jira_fetch.JIRA")
+    @patch("src.jira_fetch.Settings")
+    def test_get_jira_client_is_shared(self, mock_settings, mock_jira_class):
+        """Test that the Jira client is created once and shared across threads."""
+        mock_settings.JIRA_SERVER = "https://test.atlassian.net"
+        mock_settings.JIRA_USER = "test@example.com"
+        mock_settings.JIRA_API_TOKEN = "test-token"
+        mock_settings.JIRA_POOL_SIZE = 4
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            clients = list(pool.map(lambda _: get_jira_client(), range(32)))
+
+        mock_jira_class.assert_called_once()
+        assert all(client is clients[0] for client in clients)
+
+        # The session gets a keep-alive pool sized from the settings
+        session = mock_jira_class.return_value._session
+        adapter = session.mount.call_args.args[1]
+        assert adapter._pool_maxsize == 4
+
+        reset_jira_client()
+        mock_jira_class.return_value.close.assert_called_once()
+        get_jira_client()
+        assert mock_jira_class.call_count == 2
+
     @patch("src.jira_fetch.get_jira_client")
     def test_fetch_issue(self, mock_get_client, mock_jira_client, mock_jira_issue):
         """Test fetching a Jira issue."""
@@ -80,3 +116,267 @@ class TestJiraFetch:
         }
 
         assert result == expected
+
+    @patch("src.jira_fetch.get_issue_cache")
+    @patch("src.jira_fetch.get_jira_client")
+    def test_fetch_issue_uses_cache_when_not_updated(
+        self, mock_get_client, mock_get_cache, tmp_path
+    ):
+        """Test that a cached issue is reused while its updated field matches."""
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        cache = IssueCache(tmp_path)
+        mock_get_cache.return_value = cache
+
+        full_issue = _issues("TEST-1")[0]
+        full_issue.raw = {"fields": {"updated": "2024-01-01"}}
+        probe = MagicMock()
+        probe.raw = {"fields": {"updated": "2024-01-01"}}
+        mock_client.issue.side_effect = [full_issue, probe]
+
+        first = fetch_issue("TEST-1", use_cache=True)
+        second = fetch_issue("TEST-1", use_cache=True)
+
+        assert second == first
+        # The second call only asked for the updated timestamp
+        assert mock_client.issue.call_args_list[1].kwargs == {"fields": "updated"}
+
+    @patch("src.jira_fetch.get_issue_cache")
+    @patch("src.jira_fetch.get_jira_client")
+    def test_fetch_issue_refetches_stale_cache(
+        self, mock_get_client, mock_get_cache, tmp_path
+    ):
+        """Test that a changed updated timestamp triggers a full download."""
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        cache = IssueCache(tmp_path)
+        mock_get_cache.return_value = cache
+        cache.put(
+            "TEST-1",
+            {"key": "TEST-1", "summary": "old", "raw": {"fields": {"updated": "1"}}},
+        )
+
+        probe = MagicMock()
+        probe.raw = {"fields": {"updated": "2"}}
+        fresh = _issues("TEST-1")[0]
+        fresh.fields.summary = "new"
+        fresh.raw = {"fields": {"updated": "2"}}
+        mock_client.issue.side_effect = [probe, fresh]
+
+        result = fetch_issue("TEST-1", use_cache=True)
+
+        assert result["summary"] == "new"
+        assert cache.get("TEST-1")["summary"] == "new"
+
+    @patch("src.jira_fetch.get_issue_cache")
+    @patch("src.jira_fetch.get_jira_client")
+    def test_fetch_issue_without_cache(
+        self, mock_get_client, mock_get_cache, mock_jira_client
+    ):
+        """Test that the cache is bypassed by default."""
+        mock_get_client.return_value = mock_jira_client
+
+        fetch_issue("TEST-123")
+
+        mock_get_cache.assert_not_called()
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_fetch_issues_by_jql_pages_lazily(self, mock_get_client):
+        """Test that JQL results are paged and yielded as they arrive."""
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.search_issues.side_effect = [
+            _issues("TEST-1", "TEST-2"),
+            _issues("TEST-3"),
+        ]
+
+        results = fetch_issues(jql="project = TEST", fields=["summary"], page_size=2)
+
+        first = next(results)
+        assert first["key"] == "TEST-1"
+        assert mock_client.search_issues.call_count == 1
+        assert [issue["key"] for issue in results] == ["TEST-2", "TEST-3"]
+        mock_client.search_issues.assert_called_with(
+            "project = TEST",
+            startAt=2,
+            maxResults=2,
+            fields="summary",
+            validate_query=True,
+        )
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_fetch_issues_by_keys_uses_chunks(self, mock_get_client):
+        """Test that key lists are de-duplicated and searched in chunks."""
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.search_issues.side_effect = [
+            _issues("TEST-1", "TEST-2"),
+            _issues("TEST-3"),
+        ]
+
+        missing = []
+        results = list(
+            fetch_issues(
+                keys=["TEST-1", "test-2", "TEST-1", "TEST-3", "TEST-4"],
+                page_size=2,
+                missing=missing,
+            )
+        )
+
+        assert [issue["key"] for issue in results] == ["TEST-1", "TEST-2", "TEST-3"]
+        # Unknown keys are reported; keys match regardless of case
+        assert missing == ["TEST-4"]
+        first_call, second_call = mock_client.search_issues.call_args_list
+        assert first_call.args[0] == 'key in ("TEST-1", "test-2")'
+        assert second_call.args[0] == 'key in ("TEST-3", "TEST-4")'
+        # Only the fields the prompt templates consume are requested
+        assert first_call.kwargs["fields"] == ",".join(PROMPT_FIELDS)
+        assert first_call.kwargs["validate_query"] is False
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_fetch_issues_skips_malformed_keys(self, mock_get_client):
+        """Test that malformed keys are reported and never reach the JQL."""
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.search_issues.return_value = _issues("TEST-1")
+
+        missing = []
+        results = list(
+            fetch_issues(
+                keys=["TEST-1", "TEST-2)", 'x") OR project = "SECRET', "TEST"],
+                missing=missing,
+            )
+        )
+
+        assert [issue["key"] for issue in results] == ["TEST-1"]
+        assert missing == ["TEST-2)", 'x") OR project = "SECRET', "TEST"]
+        mock_client.search_issues.assert_called_once()
+        assert mock_client.search_issues.call_args.args[0] == 'key in ("TEST-1")'
+
+    def test_fetch_issues_requires_one_source(self):
+        """Test that exactly one of keys and jql must be given."""
+        with pytest.raises(ValueError):
+            next(fetch_issues())
+        with pytest.raises(ValueError):
+            next(fetch_issues(keys=["TEST-1"], jql="project = TEST"))
+
+
+def _issues(*keys):
+    issues = []
+    for key in keys:
+        issue = MagicMock()
+        issue.key = key
+        issue.fields.summary = "summary"
+        issue.fields.description = None
+        issue.fields.labels = []
+        issue.fields.issuetype = None
+        issue.fields.project = None
+        issue.raw = {"key": key}
+        issues.append(issue)
+    return issues
+
+
+def _comment_server(count, cap=None):
+    """Build a Jira client whose comment endpoint serves `count` comments."""
+    comments = [
+        {
+            "author": {"displayName": f"User {i}"},
+            "created": f"2024-01-{i + 1:02d}",
+            "body": f"Comment {i} " + "x" * 40,
+        }
+        for i in range(count)
+    ]
+    requests = []
+
+    def get_json(path, params):
+        requests.append((path, params["startAt"], params["maxResults"]))
+        start, size = params["startAt"], params["maxResults"]
+        if cap is not None:
+            size = min(size, cap)
+        return {"total": count, "comments": comments[start : start + size]}
+
+    jira = MagicMock()
+    jira._get_json.side_effect = get_json
+    return jira, requests
+
+
+class TestFetchComments:
+    """Test newest-first comment paging within a token budget."""
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_pages_backwards_until_budget(self, mock_get_client, byte_encoding):
+        """Test that only the pages needed for the budget are requested."""
+        jira, requests = _comment_server(200)
+        mock_get_client.return_value = jira
+
+        comments = fetch_comments("TEST-1", 1500, page_size=10)
+
+        assert comments[0]["body"].startswith("Comment 199 ")
+        assert comments[0]["author"] == "User 199"
+        assert [c["body"].split()[1] for c in comments[:3]] == ["199", "198", "197"]
+        assert 10 < len(comments) < 20
+        # A total probe, then pages from the end
+        assert requests[:3] == [
+            ("issue/TEST-1/comment", 0, 0),
+            ("issue/TEST-1/comment", 190, 10),
+            ("issue/TEST-1/comment", 180, 10),
+        ]
+        assert len(requests) <= 3
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_all_comments_within_budget(self, mock_get_client, byte_encoding):
+        """Test that short histories are returned completely."""
+        jira, _ = _comment_server(25)
+        mock_get_client.return_value = jira
+
+        comments = fetch_comments("TEST-1", 100_000, page_size=10)
+
+        assert len(comments) == 25
+        assert comments[-1]["body"].startswith("Comment 0 ")
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_server_page_cap(self, mock_get_client, byte_encoding):
+        """Test that a server-side maxResults cap does not skip comments."""
+        jira, _ = _comment_server(30, cap=4)
+        mock_get_client.return_value = jira
+
+        comments = fetch_comments("TEST-1", 100_000, page_size=10)
+
+        assert [c["created"] for c in comments] == [
+            f"2024-01-{i + 1:02d}" for i in reversed(range(30))
+        ]
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_oversized_newest_comment_is_truncated(
+        self, mock_get_client, byte_encoding
+    ):
+        """Test that the newest comment is kept even if it exceeds the budget."""
+        jira = MagicMock()
+        jira._get_json.side_effect = [
+            {"total": 1, "comments": []},
+            {"total": 1, "comments": [{"body": "line\n" * 2000}]},
+        ]
+        mock_get_client.return_value = jira
+
+        comments = fetch_comments("TEST-1", 300)
+
+        assert len(comments) == 1
+        assert "CONTENT TRUNCATED" in comments[0]["body"]
+
+    @patch("src.jira_fetch.get_jira_client")
+    def test_attach_comments_replaces_raw_comments(
+        self, mock_get_client, byte_encoding
+    ):
+        """Test that raw comments are replaced by the budgeted list."""
+        jira, _ = _comment_server(3)
+        mock_get_client.return_value = jira
+        issue = {
+            "key": "TEST-1",
+            "raw": {"fields": {"comment": {"comments": []}, "labels": ["a"]}},
+        }
+
+        result = attach_comments(issue, 10_000)
+
+        assert len(result["comments"]) == 3
+        assert result["raw"]["fields"] == {"labels": ["a"]}
+        assert "comment" in issue["raw"]["fields"]
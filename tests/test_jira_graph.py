@@ -0,0 +1,211 @@
+"""Unit tests for the related issue graph walk."""
+
+import json
+import threading
+from unittest.mock import patch
+
+from src.jira_graph import (
+    GRAPH_CHUNK_SIZE,
+    RELATED_FIELDS,
+    attach_related_issues,
+    fetch_related_issues,
+    link_fields,
+    linked_issue_keys,
+    summarize_related_issue,
+)
+
+
+def _node(key, links=(), subtasks=(), parent=None, description="details"):
+    fields = {
+        "status": {"name": "Open"},
+        "issuelinks": [
+            {
+                "type": {"name": "Blocks", "outward": "blocks"},
+                "outwardIssue": {"key": target},
+            }
+            for target in links
+        ],
+        "subtasks": [{"key": key} for key in subtasks],
+    }
+    if parent:
+        fields["parent"] = {
+            "key": parent,
+            "fields": {"issuetype": {"name": "Epic"}},
+        }
+    return {
+        "key": key,
+        "summary": f"Summary of {key}",
+        "description": description,
+        "issuetype": "Story",
+        "raw": {"key": key, "fields": fields},
+    }
+
+
+class FakeJira:
+    """Serve issues from a dict and record every bulk fetch."""
+
+    def __init__(self, *nodes):
+        self.nodes = {node["key"]: node for node in nodes}
+        self.calls = []
+        self.lock = threading.Lock()
+        self.extra_fields = ()
+
+    def fetch_issues(self, keys, fields):
+        with self.lock:
+            self.calls.append(list(keys))
+        assert fields == RELATED_FIELDS + self.extra_fields
+        return iter([self.nodes[key] for key in keys if key in self.nodes])
+
+    def fetched(self):
+        return sorted(key for call in self.calls for key in call)
+
+
+class TestLinkedIssueKeys:
+    """Test extracting neighbors from raw issue fields."""
+
+    def test_links_subtasks_and_epic(self):
+        """Test every supported kind of relation."""
+        issue = _node("A-1", links=["B-1"], subtasks=["A-2"], parent="E-1")
+        issue["raw"]["fields"]["issuelinks"].append(
+            {
+                "type": {"name": "Blocks", "inward": "is blocked by"},
+                "inwardIssue": {"key": "C-1"},
+            }
+        )
+
+        assert linked_issue_keys(issue) == [
+            ("B-1", "blocks"),
+            ("C-1", "is blocked by"),
+            ("A-2", "subtask"),
+            ("E-1", "epic"),
+        ]
+
+    def test_epic_link_field(self):
+        """Test the classic Epic Link custom field."""
+        issue = _node("A-1")
+        issue["raw"]["fields"]["customfield_10014"] = "E-7"
+
+        with patch("src.jira_graph.Settings.JIRA_EPIC_LINK_FIELD", "customfield_10014"):
+            assert linked_issue_keys(issue) == [("E-7", "epic")]
+
+    def test_issue_without_raw_fields(self):
+        """Test that issues without raw data have no neighbors."""
+        assert linked_issue_keys({"key": "A-1"}) == []
+
+
+class TestFetchRelatedIssues:
+    """Test the depth-limited graph walk."""
+
+    def test_depth_limits_the_walk(self, byte_encoding):
+        """Test that only issues within the given number of hops are fetched."""
+        jira = FakeJira(_node("B-1", links=["C-1"]), _node("C-1", links=["D-1"]))
+        root = _node("A-1", links=["B-1"])
+
+        with patch("src.jira_graph.fetch_issues", jira.fetch_issues):
+            one_hop = fetch_related_issues(root, 1, 500)
+            two_hops = fetch_related_issues(root, 2, 500)
+
+        assert [r["key"] for r in one_hop] == ["B-1"]
+        assert [r["key"] for r in two_hops] == ["B-1", "C-1"]
+        assert "via" not in two_hops[0]
+        assert two_hops[1]["via"] == "B-1"
+        assert two_hops[1]["relation"] == "blocks"
+
+    def test_epic_link_field_is_followed_beyond_the_first_hop(self, byte_encoding):
+        """Test that neighbors are fetched with the epic link field."""
+        neighbor = _node("B-1")
+        neighbor["raw"]["fields"]["customfield_10014"] = "E-1"
+        jira = FakeJira(neighbor, _node("E-1"))
+        jira.extra_fields = ("customfield_10014",)
+        root = _node("A-1", links=["B-1"])
+
+        with patch("src.jira_graph.fetch_issues", jira.fetch_issues), patch(
+            "src.jira_graph.Settings.JIRA_EPIC_LINK_FIELD", "customfield_10014"
+        ):
+            related = fetch_related_issues(root, 2, 500)
+            fields = link_fields()
+
+        assert [(r["key"], r["relation"]) for r in related] == [
+            ("B-1", "blocks"),
+            ("E-1", "epic"),
+        ]
+        assert fields == ("issuelinks", "subtasks", "parent", "customfield_10014")
+
+    def test_issues_are_fetched_once(self, byte_encoding):
+        """Test de-duplication across cycles and diamonds."""
+        jira = FakeJira(
+            _node("B-1", links=["A-1", "D-1"]),
+            _node("C-1", links=["D-1", "B-1"]),
+            _node("D-1", links=["A-1"]),
+        )
+        root = _node("A-1", links=["B-1", "C-1", "B-1"])
+
+        with patch("src.jira_graph.fetch_issues", jira.fetch_issues):
+            related = fetch_related_issues(root, 5, 500)
+
+        assert [r["key"] for r in related] == ["B-1", "C-1", "D-1"]
+        assert jira.fetched() == ["B-1", "C-1", "D-1"]
+        # One search per level; the walk stops once nothing new is found
+        assert jira.calls == [["B-1", "C-1"], ["D-1"]]
+
+    def test_wide_levels_are_fetched_in_concurrent_chunks(self, byte_encoding):
+        """Test that a level is split into several bulk searches."""
+        keys = [f"B-{i}" for i in range(GRAPH_CHUNK_SIZE * 2 + 1)]
+        jira = FakeJira(*[_node(key) for key in keys])
+
+        with patch("src.jira_graph.fetch_issues", jira.fetch_issues):
+            related = fetch_related_issues(_node("A-1", links=keys), 1, 500, 100)
+
+        assert [r["key"] for r in related] == keys
+        assert len(jira.calls) == 3
+
+    def test_missing_issues_and_issue_cap(self, byte_encoding):
+        """Test that unknown keys are skipped and the number of issues is capped."""
+        jira = FakeJira(_node("B-1"), _node("B-3"), _node("B-4"))
+        root = _node("A-1", links=["B-1", "B-2", "B-3", "B-4"])
+
+        with patch("src.jira_graph.fetch_issues", jira.fetch_issues):
+            related = fetch_related_issues(root, 1, 500, max_issues=3)
+
+        assert [r["key"] for r in related] == ["B-1", "B-3"]
+        assert jira.calls == [["B-1", "B-2", "B-3"]]
+
+    def test_attach_without_neighbors(self):
+        """Test that an isolated issue is returned unchanged."""
+        root = _node("A-1")
+        with patch("src.jira_graph.fetch_issues") as mock_fetch:
+            assert attach_related_issues(root, 2) is root
+        mock_fetch.assert_not_called()
+
+    def test_attach_adds_related_issues(self, byte_encoding):
+        """Test that neighbors are attached under related_issues."""
+        jira = FakeJira(_node("B-1"))
+        root = _node("A-1", links=["B-1"])
+
+        with patch("src.jira_graph.fetch_issues", jira.fetch_issues):
+            result = attach_related_issues(root, 1, 500)
+
+        assert result["related_issues"][0]["key"] == "B-1"
+        assert "related_issues" not in root
+
+
+class TestSummarizeRelatedIssue:
+    """Test the per-neighbor token budget."""
+
+    def test_summary_fits_budget(self, byte_encoding):
+        """Test that long descriptions are cut to the budget."""
+        issue = _node("B-1", description="Acceptance criteria line\n" * 500)
+
+        summary = summarize_related_issue(issue, "blocks", 1, "A-1", 300)
+
+        assert summary["key"] == "B-1"
+        assert summary["status"] == "Open"
+        assert len(json.dumps(summary)) <= 300 + 50
+        assert "CONTENT TRUNCATED" in summary["description"]
+
+    def test_description_dropped_when_budget_is_tiny(self, byte_encoding):
+        """Test that the description is left out if nothing else fits."""
+        summary = summarize_related_issue(_node("B-1"), "blocks", 1, "A-1", 10)
+
+        assert "description" not in summary
+        assert summary["summary"] == "Summary of B-1"
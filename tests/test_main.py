@@ -2,13 +2,17 @@
 
 import argparse
 import json
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
 
-from src.main import _parse_repos, main
+from src.jira_fetch import PROMPT_FIELDS
+from src.main import _parse_issue_keys, _parse_repos, main
+from src.prompt_templates import PromptTemplate
 
 
 class TestParseRepos:
@@ -45,16 +49,35 @@ class TestParseRepos:
         assert result == ["repo1"]
 
 
+class TestParseIssueKeys:
+    """Test the _parse_issue_keys function."""
+
+    def test_parse_issue_keys_lines_and_comments(self):
+        """Test parsing a key file with comments, separators and duplicates."""
+        text = "# nightly sweep\nEP-1\nEP-2, EP-3  # trailing comment\n\nEP-1\n"
+        assert _parse_issue_keys(text) == ["EP-1", "EP-2", "EP-3"]
+
+    def test_parse_issue_keys_empty(self):
+        """Test parsing a file without keys."""
+        assert _parse_issue_keys("# nothing here\n\n") == []
+
+
 class TestMain:
     """Test the main function."""
 
+    @patch("src.main.load_template")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
     @patch("src.main.fetch_issue")
     @patch("src.main.Path")
     @patch("sys.argv", ["main.py", "--jira", "TEST-123", "--ado-repo", "test-repo"])
     def test_main_without_generate_tests(
-        self, mock_path, mock_fetch_issue, mock_build_context, mock_run_codex
+        self,
+        mock_path,
+        mock_fetch_issue,
+        mock_build_context,
+        mock_run_codex,
+        mock_load_template,
     ):
         """Test main function without generate-tests flag."""
         # Setup mocks
@@ -62,15 +85,13 @@ class TestMain:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -78,8 +99,8 @@ class TestMain:
         with pytest.raises(SystemExit) as exc_info:
             main()
 
-        # Verify the correct prompt file was used
-        mock_path.assert_any_call("prompts/codegen.md")
+        # Verify the correct prompt template was used
+        mock_load_template.assert_called_once_with("codegen.md", None)
 
         # Verify the prompt was processed correctly (empty additional instructions)
         expected_prompt = json.dumps(mock_issue, indent=2) + " context instructions "
@@ -88,6 +109,7 @@ class TestMain:
         # Verify exit code
         assert exc_info.value.code == 0
 
+    @patch("src.main.load_template")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
     @patch("src.main.fetch_issue")
@@ -104,7 +126,12 @@ class TestMain:
         ],
     )
     def test_main_with_generate_tests(
-        self, mock_path, mock_fetch_issue, mock_build_context, mock_run_codex
+        self,
+        mock_path,
+        mock_fetch_issue,
+        mock_build_context,
+        mock_run_codex,
+        mock_load_template,
     ):
         """Test main function with generate-tests flag."""
         # Setup mocks
@@ -112,15 +139,13 @@ class TestMain:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -128,8 +153,8 @@ class TestMain:
         with pytest.raises(SystemExit) as exc_info:
             main()
 
-        # Verify the correct prompt file was used
-        mock_path.assert_any_call("prompts/codegen_with_tests.md")
+        # Verify the correct prompt template was used
+        mock_load_template.assert_called_once_with("codegen_with_tests.md", None)
 
         # Verify the prompt was processed correctly (empty additional instructions)
         expected_prompt = json.dumps(mock_issue, indent=2) + " context instructions "
@@ -149,6 +174,7 @@ class TestMain:
 
         assert "Provide at least one repo" in str(exc_info.value)
 
+    @patch("src.main.load_template")
     @patch("src.main.Settings")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
@@ -162,26 +188,28 @@ class TestMain:
         mock_build_context,
         mock_run_codex,
         mock_settings,
+        mock_load_template,
     ):
         """Test main function uses ADO_REPO from settings when not provided as argument."""
         # Setup mocks
         mock_settings.ADO_REPO = "settings-repo"
         mock_settings.ADO_ORG = "test-org"
         mock_settings.ADO_PROJECT = "test-project"
+        mock_settings.JIRA_JSON_MODE = "pretty"
+        mock_settings.JIRA_RELATED_DEPTH = 0
+        mock_settings.JIRA_COMMENT_TOKENS = 0
 
         mock_issue = {"key": "TEST-123", "summary": "Test issue"}
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -197,6 +225,7 @@ class TestMain:
         # Verify exit code
         assert exc_info.value.code == 0
 
+    @patch("src.main.load_template")
     @patch("src.main.os.getcwd")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
@@ -210,6 +239,7 @@ class TestMain:
         mock_build_context,
         mock_run_codex,
         mock_getcwd,
+        mock_load_template,
     ):
         """Test main function uses current directory as default workspace."""
         # Setup mocks
@@ -219,8 +249,7 @@ class TestMain:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}}"
         )
 
@@ -228,7 +257,7 @@ class TestMain:
         mock_workspace_path.expanduser.return_value.resolve.return_value = (
             "/current/dir"
         )
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -242,6 +271,7 @@ class TestMain:
         # Verify exit code
         assert exc_info.value.code == 0
 
+    @patch("src.main.load_template")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
     @patch("src.main.fetch_issue")
@@ -259,7 +289,12 @@ class TestMain:
         ],
     )
     def test_main_with_additional_instructions(
-        self, mock_path, mock_fetch_issue, mock_build_context, mock_run_codex
+        self,
+        mock_path,
+        mock_fetch_issue,
+        mock_build_context,
+        mock_run_codex,
+        mock_load_template,
     ):
         """Test main function with additional instructions parameter."""
         # Setup mocks
@@ -267,15 +302,13 @@ class TestMain:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -293,6 +326,7 @@ class TestMain:
         # Verify exit code
         assert exc_info.value.code == 0
 
+    @patch("src.main.load_template")
     @patch("src.main.run_codex")
     @patch("src.main.build_context_instructions")
     @patch("src.main.fetch_issue")
@@ -311,7 +345,12 @@ class TestMain:
         ],
     )
     def test_main_with_generate_tests_and_additional_instructions(
-        self, mock_path, mock_fetch_issue, mock_build_context, mock_run_codex
+        self,
+        mock_path,
+        mock_fetch_issue,
+        mock_build_context,
+        mock_run_codex,
+        mock_load_template,
     ):
         """Test main function with both generate-tests and additional instructions."""
         # Setup mocks
@@ -319,15 +358,13 @@ class TestMain:
         mock_fetch_issue.return_value = mock_issue
         mock_build_context.return_value = "context instructions"
 
-        mock_prompt_path = MagicMock()
-        mock_prompt_path.read_text.return_value = (
+        mock_load_template.return_value = PromptTemplate(
             "{{JIRA_JSON}} {{CONTEXT_INSTRUCTIONS}} {{ADDITIONAL_INSTRUCTIONS}}"
         )
-        mock_path.return_value = mock_prompt_path
 
         mock_workspace_path = MagicMock()
         mock_workspace_path.expanduser.return_value.resolve.return_value = "/workspace"
-        mock_path.side_effect = [mock_prompt_path, mock_workspace_path]
+        mock_path.return_value = mock_workspace_path
 
         mock_run_codex.return_value = 0
 
@@ -335,8 +372,8 @@ class TestMain:
         with pytest.raises(SystemExit) as exc_info:
             main()
 
-        # Verify the correct prompt file was used (with tests)
-        mock_path.assert_any_call("prompts/codegen_with_tests.md")
+        # Verify the correct prompt template was used (with tests)
+        mock_load_template.assert_called_once_with("codegen_with_tests.md", None)
 
         # Verify the prompt was processed correctly with additional instructions
         expected_prompt = (
@@ -347,3 +384,334 @@ class TestMain:
 
         # Verify exit code
         assert exc_info.value.code == 0
+
+
+class TestBatchMode:
+    """Test the batch processing mode of main."""
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    def test_main_with_jira_file(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex, tmp_path
+    ):
+        """Test that every issue of a key file is processed and summarized."""
+        key_file = tmp_path / "keys.txt"
+        key_file.write_text("TEST-1\nTEST-2\nTEST-3\n", encoding="utf-8")
+        for key in ("TEST-1", "TEST-2", "TEST-3"):
+            (tmp_path / key).mkdir()
+        mock_fetch_issues.side_effect = lambda keys, fields, missing: (
+            {"key": key, "summary": "s"} for key in keys
+        )
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.side_effect = lambda prompt, ws: 1 if "TEST-2" in prompt else 0
+
+        argv = [
+            "main.py",
+            "--jira-file",
+            str(key_file),
+            "--ado-repo",
+            "test-repo",
+            "--workspace",
+            str(tmp_path / "{issue}"),
+            "--concurrency",
+            "1",
+        ]
+        with patch("sys.argv", argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        # Context instructions are shared by all issues of the batch
+        mock_build_context.assert_called_once()
+        mock_fetch_issues.assert_called_once()
+        assert mock_fetch_issues.call_args.kwargs["keys"] == [
+            "TEST-1",
+            "TEST-2",
+            "TEST-3",
+        ]
+        workspaces = sorted(str(c.args[1]) for c in mock_run_codex.call_args_list)
+        assert workspaces == [
+            str((tmp_path / key).resolve()) for key in ("TEST-1", "TEST-2", "TEST-3")
+        ]
+        # One failing issue makes the whole batch fail
+        assert exc_info.value.code == 1
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    @patch(
+        "sys.argv",
+        ["main.py", "--jql", "project = TEST", "--ado-repo", "test-repo"],
+    )
+    def test_main_with_jql(self, mock_fetch_issues, mock_build_context, mock_run_codex):
+        """Test that every issue matched by a JQL query is processed."""
+        mock_fetch_issues.return_value = iter(
+            [{"key": f"TEST-{i}", "summary": "s"} for i in range(20)]
+        )
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.return_value = 0
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        mock_fetch_issues.assert_called_once_with(
+            jql="project = TEST", fields=PROMPT_FIELDS
+        )
+        assert mock_run_codex.call_count == 20
+        assert exc_info.value.code == 0
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    @patch(
+        "sys.argv",
+        ["main.py", "--jql", "project = TEST", "--ado-repo", "test-repo"],
+    )
+    def test_main_batch_reports_exceptions(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex
+    ):
+        """Test that an exception in one issue is reported as a failure."""
+        mock_fetch_issues.return_value = iter([{"key": "TEST-1", "summary": "s"}])
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.side_effect = RuntimeError("codex not installed")
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        assert exc_info.value.code == 1
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    def test_main_batch_fails_on_unknown_keys(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex, tmp_path, caplog
+    ):
+        """Test that keys missing from Jira are failed entries of the summary."""
+        key_file = tmp_path / "keys.txt"
+        key_file.write_text("TEST-1\nTSET-2\nTEST-3)\n", encoding="utf-8")
+
+        def fetch(keys, fields, missing):
+            yield {"key": "TEST-1", "summary": "s"}
+            missing.extend(["TEST-3)", "TSET-2"])
+
+        mock_fetch_issues.side_effect = fetch
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.return_value = 0
+
+        argv = ["main.py", "--jira-file", str(key_file), "--ado-repo", "test-repo"]
+        with patch("sys.argv", argv), caplog.at_level(logging.INFO):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        mock_run_codex.assert_called_once()
+        assert "TSET-2: not found in Jira" in caplog.text
+        assert "TEST-3): invalid issue key" in caplog.text
+        assert "3 issues, 1 succeeded, 2 failed" in caplog.text
+        assert exc_info.value.code == 1
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    def test_main_batch_reports_missing_workspaces(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex, tmp_path, caplog
+    ):
+        """Test that issues without a workspace directory fail without Codex."""
+        (tmp_path / "TEST-1").mkdir()
+        mock_fetch_issues.return_value = iter(
+            [{"key": "TEST-1", "summary": "s"}, {"key": "TEST-2", "summary": "s"}]
+        )
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.return_value = 0
+
+        argv = ["main.py", "--jql", "project = TEST", "--ado-repo", "test-repo"]
+        argv += ["--workspace", str(tmp_path / "{issue}")]
+        with patch("sys.argv", argv):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        mock_run_codex.assert_called_once()
+        assert f"Workspace {(tmp_path / 'TEST-2').resolve()}" in caplog.text
+        assert "does not exist" in caplog.text
+        assert exc_info.value.code == 1
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    def test_main_batch_shared_workspace_runs_sequentially(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex, tmp_path, caplog
+    ):
+        """Test that parallel runs are refused when issues share a checkout."""
+        mock_fetch_issues.return_value = iter(
+            [{"key": f"TEST-{i}", "summary": "s"} for i in range(3)]
+        )
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.return_value = 0
+
+        argv = ["main.py", "--jql", "project = TEST", "--ado-repo", "test-repo"]
+        argv += ["--workspace", str(tmp_path), "--concurrency", "4"]
+        with patch("sys.argv", argv), patch(
+            "src.main.ThreadPoolExecutor", wraps=ThreadPoolExecutor
+        ) as mock_pool:
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        assert "no '{issue}' placeholder" in caplog.text
+        assert mock_pool.call_args.kwargs["max_workers"] == 1
+        assert mock_run_codex.call_count == 3
+        assert exc_info.value.code == 0
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    @patch(
+        "sys.argv",
+        ["main.py", "--jql", "project = TEST", "--ado-repo", "test-repo"],
+    )
+    def test_main_batch_summarizes_after_fetch_errors(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex, caplog
+    ):
+        """Test that a failing search page still yields a summary and exit 1."""
+
+        def fetch(jql, fields):
+            yield {"key": "TEST-1", "summary": "s"}
+            raise RuntimeError("page 2 failed")
+
+        mock_fetch_issues.side_effect = fetch
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.return_value = 0
+
+        with caplog.at_level(logging.INFO):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        mock_run_codex.assert_called_once()
+        assert "Fetching Jira issues failed after 1 issues" in caplog.text
+        assert "TEST-1: exit=0" in caplog.text
+        assert "Batch finished: 1 issues, 1 succeeded" in caplog.text
+        assert exc_info.value.code == 1
+
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    @patch(
+        "sys.argv",
+        ["main.py", "--jql", "project = EMPTY", "--ado-repo", "test-repo"],
+    )
+    def test_main_batch_without_issues(self, mock_fetch_issues, mock_build_context):
+        """Test that an empty selection aborts the run."""
+        mock_fetch_issues.return_value = iter([])
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        assert "No Jira issues selected" in str(exc_info.value)
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    @patch(
+        "sys.argv",
+        [
+            "main.py",
+            "--jql",
+            "project = TEST",
+            "--ado-repo",
+            "test-repo",
+            "--json-mode",
+            "compact",
+        ],
+    )
+    def test_main_with_compact_json(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex
+    ):
+        """Test that --json-mode compact renders the issue without indentation."""
+        mock_fetch_issues.return_value = iter(
+            [{"key": "TEST-1", "summary": "s", "raw": {"fields": {"summary": "s"}}}]
+        )
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.return_value = 0
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        prompt = mock_run_codex.call_args.args[0]
+        assert '{"key":"TEST-1","summary":"s"}' in prompt
+        assert exc_info.value.code == 0
+
+    @patch("src.main.attach_related_issues")
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.main.fetch_issues")
+    @patch(
+        "sys.argv",
+        [
+            "main.py",
+            "--jql",
+            "project = TEST",
+            "--ado-repo",
+            "test-repo",
+            "--related-depth",
+            "2",
+            "--related-tokens",
+            "150",
+        ],
+    )
+    def test_main_with_related_issues(
+        self, mock_fetch_issues, mock_build_context, mock_run_codex, mock_attach
+    ):
+        """Test that related issues are attached to every issue of the batch."""
+        issue = {"key": "TEST-1", "summary": "s"}
+        mock_fetch_issues.return_value = iter([issue])
+        mock_build_context.return_value = "context instructions"
+        mock_attach.return_value = {
+            **issue,
+            "related_issues": [{"key": "TEST-9", "relation": "blocks"}],
+        }
+        mock_run_codex.return_value = 0
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        mock_attach.assert_called_once_with(issue, 2, 150)
+        assert '"relation": "blocks"' in mock_run_codex.call_args.args[0]
+        assert exc_info.value.code == 0
+
+    @patch("src.main.run_codex")
+    @patch("src.main.build_context_instructions")
+    @patch("src.jira_graph.fetch_issues")
+    @patch("src.main.fetch_issues")
+    def test_batch_requests_link_fields_for_related_issues(
+        self,
+        mock_fetch_issues,
+        mock_graph_fetch,
+        mock_build_context,
+        mock_run_codex,
+        byte_encoding,
+    ):
+        """Test that batch issues carry the links the graph walk starts from."""
+        link = {"type": {"outward": "blocks"}, "outwardIssue": {"key": "TEST-9"}}
+
+        def fetch(jql, fields):
+            # Jira only returns the requested fields
+            raw = {"issuelinks": [link], "customfield_10014": "TEST-5"}
+            raw = {name: value for name, value in raw.items() if name in fields}
+            yield {"key": "TEST-1", "summary": "s", "raw": {"fields": raw}}
+
+        mock_fetch_issues.side_effect = fetch
+        mock_graph_fetch.side_effect = lambda keys, fields: iter(
+            [{"key": key, "summary": f"about {key}"} for key in keys]
+        )
+        mock_build_context.return_value = "context instructions"
+        mock_run_codex.return_value = 0
+
+        argv = ["main.py", "--jql", "project = TEST", "--ado-repo", "test-repo"]
+        argv += ["--related-depth", "1"]
+        with patch("sys.argv", argv), patch(
+            "src.jira_graph.Settings.JIRA_EPIC_LINK_FIELD", "customfield_10014"
+        ):
+            with pytest.raises(SystemExit) as exc_info:
+                main()
+
+        prompt = mock_run_codex.call_args.args[0]
+        assert '"about TEST-9"' in prompt
+        assert '"about TEST-5"' in prompt
+        assert exc_info.value.code == 0
@@ -1,14 +1,25 @@
 """Tests for MCP output utilities that handle large strings."""
 
+import io
+import json
+import mmap
+
 import pytest
 
 from src.mcp_output_utils import (
+    CIRCULAR_REFERENCE_MARKER,
+    ELIDED_KEY,
     MAX_MCP_STRING_LENGTH,
+    bound_mcp_output,
+    budget_mcp_output,
     get_content_size_info,
     safe_mcp_output,
+    summarize_file,
     summarize_large_content,
+    summarize_stream,
     truncate_large_strings,
 )
+from src.safe_mcp_tools import SafeMCPWrapper
 
 
 class TestMCPOutputUtils:
@@ -138,3 +149,324 @@ class TestMCPOutputUtils:
         assert result["results"][1]["id"] == 2
         assert len(result["results"][0]["content"]) < len(large_string)
         assert "[TRUNCATED:" in result["results"][0]["content"]
+
+
+class TestTruncateLargeStringsStructure:
+    """Test structural sharing, deep nesting and cycles in truncation."""
+
+    def test_unchanged_data_is_not_copied(self):
+        """Test that data without oversized strings is returned as is."""
+        data = {"results": [{"content": "small", "tags": ("a", "b")}], "n": 1}
+        assert truncate_large_strings(data, max_length=1000) is data
+
+    def test_only_paths_to_truncated_strings_are_copied(self):
+        """Test that untouched siblings are shared with the input."""
+        untouched = {"content": "small", "nested": [1, 2, 3]}
+        data = {"results": [untouched, {"content": "x" * 2000}], "meta": {"n": 2}}
+
+        result = truncate_large_strings(data, max_length=1000)
+
+        assert result is not data
+        assert result["results"] is not data["results"]
+        assert result["results"][0] is untouched
+        assert result["meta"] is data["meta"]
+        assert "[TRUNCATED:" in result["results"][1]["content"]
+        # The input is left untouched
+        assert len(data["results"][1]["content"]) == 2000
+
+    def test_tuples_are_rebuilt_as_tuples(self):
+        """Test that modified tuples stay tuples."""
+        result = truncate_large_strings(("small", "x" * 2000), max_length=1000)
+
+        assert isinstance(result, tuple)
+        assert result[0] == "small"
+        assert "[TRUNCATED:" in result[1]
+
+    def test_deep_nesting(self):
+        """Test that nesting far beyond the recursion limit is handled."""
+        data = "x" * 2000
+        for _ in range(100_000):
+            data = [data]
+
+        result = truncate_large_strings(data, max_length=1000)
+
+        for _ in range(100_000):
+            result = result[0]
+        assert "[TRUNCATED:" in result
+
+    def test_cycles_are_broken(self):
+        """Test that references back to an enclosing container are replaced."""
+        data = {"content": "x" * 2000, "children": []}
+        data["children"].append(data)
+
+        result = truncate_large_strings(data, max_length=1000)
+
+        assert "[TRUNCATED:" in result["content"]
+        assert result["children"] == [CIRCULAR_REFERENCE_MARKER]
+
+    def test_cycles_without_oversized_strings(self):
+        """Test that cycles are broken even if nothing is truncated."""
+        data = ["small"]
+        data.append(data)
+
+        result = truncate_large_strings(data, max_length=1000)
+
+        assert result[0] == "small"
+        assert result[1] == CIRCULAR_REFERENCE_MARKER
+
+    def test_shared_objects_are_processed_once(self):
+        """Test that repeated references map to one truncated result."""
+        shared = {"content": "x" * 2000}
+        large = "y" * 2000
+        data = {"a": shared, "b": shared, "c": [large, large]}
+
+        result = truncate_large_strings(data, max_length=1000)
+
+        assert result["a"] is result["b"]
+        assert result["c"][0] is result["c"][1]
+        assert "[TRUNCATED:" in result["a"]["content"]
+
+
+def _total_length(data):
+    if isinstance(data, str):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(len(key) + _total_length(value) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return sum(_total_length(item) for item in data)
+    return 8
+
+
+class TestBudgetMCPOutput:
+    """Test the aggregate size budget across a whole output."""
+
+    def test_output_within_budget_is_not_copied(self):
+        """Test that small outputs pass through unchanged."""
+        data = {"results": [{"content": "small", "id": 1}]}
+        assert budget_mcp_output(data, max_total_length=1000) is data
+
+    def test_many_large_strings_stay_bounded(self):
+        """Test that thousands of large strings cannot exceed the budget."""
+        large = "x" * 2_000_000
+        data = {"results": [{"content": large, "id": i} for i in range(10_000)]}
+
+        result = budget_mcp_output(data, max_total_length=100_000)
+
+        assert _total_length(result) < 110_000
+        assert len(json.dumps(result)) <= 100_000
+        kept = result["results"][:-1]
+        assert kept and all("[TRUNCATED:" in item["content"] for item in kept)
+        elided = 10_000 - len(kept)
+        assert result["results"][-1] == f"[{elided} more items elided]"
+        # The input is left untouched
+        assert len(data["results"][-1]["content"]) == 2_000_000
+
+    def test_fair_share_keeps_short_strings_whole(self):
+        """Test that short strings are kept and long ones share the rest."""
+        data = ["a" * 1000, "b" * 5000, "c" * 20_000, "d" * 40_000]
+
+        result = budget_mcp_output(data, max_total_length=21_000)
+
+        assert result[0] == data[0]
+        assert result[1] == data[1]
+        # The remaining 15,000 characters are split evenly
+        assert result[2].startswith("c" * 7000) and "[TRUNCATED:" in result[2]
+        assert result[3].startswith("d" * 7000) and "[TRUNCATED:" in result[3]
+        assert len(result[2]) <= 7500 and len(result[3]) <= 7500
+
+    def test_many_short_strings_are_elided_not_truncated(self):
+        """Test that outputs of short strings only are cut by elision."""
+        branches = [f"refs/heads/feature-{i:06d}".ljust(32, "x") for i in range(30_000)]
+
+        result, report = bound_mcp_output({"branches": branches}, 100_000)
+
+        kept = result["branches"][:-1]
+        assert kept == branches[: len(kept)]
+        # Each branch costs 36 characters with its quotes and separator
+        assert len(kept) > (100_000 - 200) // 36
+        assert result["branches"][-1] == f"[{30_000 - len(kept)} more items elided]"
+        assert report.strings_truncated == 0
+        assert len(json.dumps(result)) <= report.chars_out <= 100_000
+
+    def test_dict_keys_are_charged(self):
+        """Test that large dict keys count against the budget."""
+        data = {f"{i:05d}" * 500: i for i in range(2000)}
+
+        result, report = bound_mcp_output(data, max_total_length=10_000)
+
+        assert len(json.dumps(result)) <= report.chars_out <= 10_000
+        assert result[ELIDED_KEY] == f"[{2001 - len(result)} more keys elided]"
+        assert report.chars_in > len(json.dumps(data))
+
+    def test_containers_are_charged(self):
+        """Test that empty containers count against the budget."""
+        data = [[]] * 1_000_000
+
+        result, report = bound_mcp_output(data, max_total_length=1000)
+
+        assert len(json.dumps(result)) <= report.chars_out <= 1000
+        assert result[-1] == f"[{1_000_001 - len(result)} more items elided]"
+        assert report.items_elided > 999_000
+
+    def test_small_caps_do_not_grow_strings(self):
+        """Test that limits below the message size cut strings plainly."""
+        assert truncate_large_strings("z" * 500, max_length=40) == "z" * 40
+        assert truncate_large_strings(["z" * 500], max_length=0) == [""]
+
+    def test_dict_tails_are_elided_with_counts(self):
+        """Test that the remaining keys of a dict are replaced by a count."""
+        data = {f"file_{i}": "y" * 1000 for i in range(100)}
+
+        result = budget_mcp_output(data, max_total_length=2000)
+
+        assert result[ELIDED_KEY] == f"[{101 - len(result)} more keys elided]"
+        assert list(result)[:-1] == list(data)[: len(result) - 1]
+
+    def test_nested_tails_and_tuples(self):
+        """Test that every open container past the budget is cut."""
+        data = {"hits": [("z" * 300,) * 3] * 10, "total": 30}
+
+        result = budget_mcp_output(data, max_total_length=1000)
+
+        assert isinstance(result["hits"][0], tuple)
+        assert result["hits"][-1].endswith("more items elided]")
+        assert result[ELIDED_KEY] == "[1 more keys elided]"
+
+    def test_per_string_limit_still_applies(self):
+        """Test that a single string is capped even under a large budget."""
+        result = budget_mcp_output(["x" * 5000], 100_000, max_string_length=1000)
+        assert len(result[0]) <= 1000
+
+    def test_cycles_are_broken(self):
+        """Test that cyclic outputs are budgeted without looping."""
+        data = ["x" * 5000]
+        data.append(data)
+
+        result = budget_mcp_output(data, max_total_length=1000)
+
+        assert result[1] == CIRCULAR_REFERENCE_MARKER
+        assert len(result[0]) < 1000
+
+    def test_wrapper_token_budget(self):
+        """Test that SafeMCPWrapper applies the smaller of both budgets."""
+        wrapper = SafeMCPWrapper("search_code", max_total_tokens=500)
+        assert wrapper.max_total_length == 2000
+
+        result = wrapper.execute_safely(lambda: ["x" * 10_000 for _ in range(50)])
+
+        assert _total_length(result) < 2500
+        assert result[-1].endswith("more items elided]")
+
+
+def _log(lines=20_000):
+    return "".join(f"step {i}: {'ok ' * (i % 20)}\n" for i in range(lines))
+
+
+class TestSummarizeStream:
+    """Test head/tail summaries of streamed content."""
+
+    def test_all_sources_give_the_same_summary(self, tmp_path):
+        """Test strings, bytes, file objects, mmaps and line iterators."""
+        content = _log()
+        path = tmp_path / "build.log"
+        path.write_text(content, encoding="utf-8")
+
+        expected = summarize_stream(content, 5000)
+        with open(path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            assert summarize_stream(mm, 5000) == expected
+        with open(path, encoding="utf-8") as f:
+            assert summarize_stream(f, 5000) == expected
+        with open(path, encoding="utf-8") as f:
+            assert summarize_stream(iter(f), 5000) == expected
+        assert summarize_stream(io.BytesIO(content.encode()), 5000) == expected
+        assert summarize_file(path, 5000) == expected
+
+    def test_summary_keeps_whole_lines_at_both_ends(self):
+        """Test the layout and counts of a summary."""
+        content = _log()
+
+        summary = summarize_stream(content, 5000)
+
+        assert len(summary) <= 5000
+        assert summary.startswith("step 0: \nstep 1: ok \n")
+        assert summary.endswith("step 19999: " + "ok " * 19 + "\n")
+        head, note, tail = summary.split("\n\n", 2)
+        assert content.startswith(head + "\n")
+        assert content.endswith(tail)
+        assert note == (
+            f"[CONTENT SUMMARIZED: 20001 total lines, {len(content)} characters]\n"
+            f"[Showing first {len(head)} and last {len(tail)} characters]"
+        )
+
+    def test_small_content_is_returned_whole(self):
+        """Test that content within the limit passes through."""
+        assert summarize_stream(iter(["a\n", "b"])) == "a\nb"
+        assert summarize_stream(b"") == ""
+
+    def test_multibyte_characters_split_across_chunks(self):
+        """Test that UTF-8 sequences split between chunks are decoded."""
+        data = "ünïcödé\n".encode("utf-8") * 3
+        chunks = [data[i : i + 1] for i in range(len(data))]
+
+        assert summarize_stream(iter(chunks)) == "ünïcödé\n" * 3
+
+
+class TestBoundMCPOutput:
+    """Test the size report gathered while bounding an output."""
+
+    def test_report_of_output_within_budget(self):
+        """Test sizes, counts and paths when only single strings are cut."""
+        data = {
+            "count": 2,
+            "results": [
+                {"path": "/a.py", "content": "x" * 3000},
+                {"path": "/b.py", "meta": {"lines": [1, 2]}},
+            ],
+        }
+
+        result, report = bound_mcp_output(data, 100_000, max_string_length=1000)
+
+        assert "[TRUNCATED:" in result["results"][0]["content"]
+        assert result["results"][1] is data["results"][1]
+        # Brackets, keys, quotes and one separator per item, 8 per number
+        syntax = 2 + (2 + 9 + 8) + (2 + 11 + 2) + 2 * (2 + 2) + 2 * (2 + 8 + 7)
+        syntax += (2 + 11 + 2) + (2 + 8 + 2) + (2 + 9 + 2) + 2 * (2 + 8)
+        assert report.as_dict() == {
+            "chars_in": syntax + 3000,
+            "chars_out": syntax + len(result["results"][0]["content"]),
+            "strings": 3,
+            "strings_truncated": 1,
+            "items_elided": 0,
+            "max_depth": 5,
+            "deepest_path": "$.results[1].meta.lines",
+            "largest_string": 3000,
+            "largest_string_path": "$.results[0].content",
+        }
+
+    def test_report_of_output_over_budget(self):
+        """Test that the fair-share pass updates the report."""
+        data = [{"text": "x" * 5000} for _ in range(100)]
+
+        result, report = bound_mcp_output(data, max_total_length=2000)
+
+        # Each item: a separator, brackets, the key and the quoted string
+        assert report.chars_in == 2 + 100 * (2 + 2 + (2 + 8) + 5000 + 2)
+        assert len(json.dumps(result)) <= report.chars_out <= 2000
+        assert report.items_elided > 0
+        assert report.strings_truncated == 100 - report.items_elided
+        assert result[-1] == f"[{report.items_elided} more items elided]"
+
+    def test_scalars_and_cycles(self):
+        """Test reports of non-container outputs and cyclic structures."""
+        result, report = bound_mcp_output("x" * 50, 1000)
+        assert result == "x" * 50
+        assert report.chars_in == report.chars_out == 52
+        assert report.max_depth == 0
+
+        data = ["small"]
+        data.append(data)
+        result, report = bound_mcp_output(data, 1000)
+        assert result[1] == CIRCULAR_REFERENCE_MARKER
+        assert report.strings == 1
@@ -0,0 +1,263 @@
+"""Tests for the stdio MCP proxy, run against a local fake MCP server."""
+
+import json
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+FAKE_SERVER = textwrap.dedent(
+    '''
+    """Minimal MCP server speaking newline-delimited JSON-RPC on stdio."""
+    import json
+    import sys
+    import threading
+    import time
+
+    calls = {}
+    lock = threading.Lock()
+
+
+    def send(message):
+        with lock:
+            sys.stdout.write(json.dumps(message) + "\\n")
+            sys.stdout.flush()
+
+
+    def call_tool(request):
+        name = request["params"]["name"]
+        arguments = request["params"].get("arguments") or {}
+        calls[name] = calls.get(name, 0) + 1
+        if name == "search_code":
+            time.sleep(arguments.get("delay", 0))
+            text = "x" * arguments.get("size", 10)
+        elif name == "call_count":
+            text = json.dumps(calls)
+        elif name == "list_branches":
+            branches = [f"branch-{i}".ljust(32, "x") for i in range(1000)]
+            send(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request["id"],
+                    "result": {
+                        "content": [{"type": "text", "text": b} for b in branches],
+                        "structuredContent": {"branches": branches},
+                    },
+                }
+            )
+            return
+        else:
+            send(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request["id"],
+                    "result": {
+                        "content": [{"type": "text", "text": "unknown tool"}],
+                        "isError": True,
+                    },
+                }
+            )
+            return
+        send(
+            {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "result": {"content": [{"type": "text", "text": text}]},
+            }
+        )
+
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        method = request.get("method")
+        if method == "initialize":
+            send(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request["id"],
+                    "result": {"serverInfo": {"name": "fake", "version": "1"}},
+                }
+            )
+        elif method == "tools/list":
+            send(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request["id"],
+                    "result": {"tools": [{"name": "search_code"}]},
+                }
+            )
+        elif method == "tools/call":
+            threading.Thread(target=call_tool, args=(request,)).start()
+    '''
+)
+
+
+class ProxySession:
+    """A proxy process in front of the fake server."""
+
+    def __init__(self, tmp_path, *options):
+        server = tmp_path / "fake_server.py"
+        server.write_text(FAKE_SERVER, encoding="utf-8")
+        self.metrics_file = tmp_path / "metrics.json"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "src.mcp_proxy", *options]
+            + ["--metrics-file", str(self.metrics_file)]
+            + ["--", sys.executable, str(server)],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._next_id = 0
+
+    def send(self, method, params=None, request_id=None):
+        if request_id is None:
+            self._next_id += 1
+            request_id = self._next_id
+        message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        self.process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.process.stdin.flush()
+        return request_id
+
+    def notify(self, method, params):
+        message = {"jsonrpc": "2.0", "method": method, "params": params}
+        self.process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.process.stdin.flush()
+
+    def receive(self):
+        line = self.process.stdout.readline()
+        assert line, "proxy closed its output"
+        return json.loads(line)
+
+    def call(self, method, params=None):
+        request_id = self.send(method, params)
+        response = self.receive()
+        assert response["id"] == request_id
+        return response
+
+    def call_tool(self, name, **arguments):
+        params = {"name": name, "arguments": arguments}
+        return self.call("tools/call", params)["result"]
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+        return json.loads(self.metrics_file.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def session(tmp_path):
+    proxy = ProxySession(tmp_path, "--max-total-length", "5000")
+    timer = threading.Timer(30, proxy.process.kill)
+    timer.start()
+    yield proxy
+    timer.cancel()
+    if proxy.process.poll() is None:
+        proxy.process.kill()
+
+
+def _text(result):
+    return result["content"][0]["text"]
+
+
+class TestMCPProxy:
+    """Test relaying, bounding, caching and coalescing of tool calls."""
+
+    def test_passes_other_messages_through(self, session):
+        """Test that requests other than tools/call reach the server unchanged."""
+        assert session.call("initialize", {})["result"]["serverInfo"]["name"] == "fake"
+        assert session.call("tools/list")["result"]["tools"] == [
+            {"name": "search_code"}
+        ]
+
+    def test_large_results_are_bounded(self, session):
+        """Test that tool results are reduced to the output budget."""
+        result = session.call_tool("search_code", size=50_000)
+
+        assert len(_text(result)) < 5000
+        assert "TRUNCATED" in _text(result)
+        assert session.call_tool("search_code", size=100) == {
+            "content": [{"type": "text", "text": "x" * 100}]
+        }
+
+    def test_elided_results_keep_the_mcp_shape(self, session):
+        """Test that elision markers are text content items."""
+        result = session.call_tool("list_branches")
+
+        assert set(result) == {"content"}
+        assert all(set(item) == {"type", "text"} for item in result["content"])
+        assert all(item["type"] == "text" for item in result["content"])
+        assert result["content"][0]["text"].startswith("branch-0")
+        assert result["content"][-1]["text"].endswith("more items elided]")
+        assert sum(len(item["text"]) for item in result["content"]) < 5100
+
+    def test_repeated_calls_are_served_from_cache(self, session):
+        """Test that cached results do not reach the server again."""
+        first = session.call_tool("search_code", size=100)
+        second = session.call_tool("search_code", size=100)
+
+        assert first == second
+        counts = json.loads(_text(session.call_tool("call_count")))
+        assert counts["search_code"] == 1
+
+        metrics = session.close()
+        assert metrics["tools"]["search_code"]["calls"] == 2
+        assert metrics["tools"]["search_code"]["cache_hits"] == 1
+        assert metrics["cache"]["hits"] == 1
+
+    def test_errors_are_relayed_and_counted(self, session):
+        """Test that error results are passed on and not cached."""
+        assert session.call_tool("missing")["isError"] is True
+        assert session.call_tool("missing")["isError"] is True
+
+        assert session.close()["tools"]["missing"]["errors"] == 2
+
+    def test_malformed_calls_get_an_error(self, session):
+        """Test that calls with invalid params are answered, not relayed."""
+        for params in (
+            {"name": "search_code", "arguments": [1, 2]},
+            {"name": ["search_code"]},
+            ["search_code"],
+        ):
+            response = session.call("tools/call", params)
+            assert response["error"]["code"] == -32602
+
+        assert _text(session.call_tool("search_code", size=3)) == "xxx"
+
+    def test_late_responses_to_cancelled_calls_are_dropped(self, session):
+        """Test that a cancelled call's response does not reach the client."""
+        params = {"name": "search_code", "arguments": {"delay": 0.3, "size": 50_000}}
+        request_id = session.send("tools/call", params)
+        session.notify("notifications/cancelled", {"requestId": request_id})
+        time.sleep(1)
+
+        # The next message the client sees answers its next request
+        assert _text(session.call_tool("search_code", size=3)) == "xxx"
+
+    def test_identical_concurrent_calls_are_coalesced(self, tmp_path):
+        """Test that identical calls in flight share one upstream request."""
+        proxy = ProxySession(tmp_path, "--cache-bytes", "0")
+        try:
+            params = {"name": "search_code", "arguments": {"delay": 0.5, "size": 3}}
+            ids = {proxy.send("tools/call", params) for _ in range(3)}
+            responses = [proxy.receive() for _ in range(3)]
+
+            assert {response["id"] for response in responses} == ids
+            assert all(_text(r["result"]) == "xxx" for r in responses)
+            counts = json.loads(_text(proxy.call_tool("call_count")))
+            assert counts["search_code"] == 1
+
+            metrics = proxy.close()
+            assert metrics["tools"]["search_code"]["coalesced"] == 2
+            assert metrics["cache"] is None
+        finally:
+            if proxy.process.poll() is None:
+                proxy.process.kill()
@@ -0,0 +1,335 @@
+"""Unit tests for section-aware prompt budgeting."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.prompt_budget import (
+    ADDITIONAL_INSTRUCTIONS,
+    CONTEXT_INSTRUCTIONS,
+    TokenCounter,
+    assemble_prompt,
+    build_budgeted_prompt,
+    fit_issue_json,
+    get_issue_renderer,
+    render_issue_compact,
+    render_issue_pretty,
+    report_rendering_savings,
+)
+
+TEMPLATE = (
+    "You are an engineering agent. Implement the ticket.\n"
+    "<JIRA>\n{{JIRA_JSON}}\n</JIRA>\n"
+    "<CONTEXT>\n{{CONTEXT_INSTRUCTIONS}}\n</CONTEXT>\n"
+    "{{ADDITIONAL_INSTRUCTIONS}}\n"
+    "Requirements:\n- Follow repo conventions and tests.\n"
+)
+
+
+def _issue(description="Fix the login page", comments=0):
+    return {
+        "key": "TEST-1",
+        "summary": "Login fails",
+        "description": description,
+        "labels": ["bug"],
+        "issuetype": "Bug",
+        "project": "TEST",
+        "raw": {
+            "fields": {
+                "summary": "Login fails",
+                "comment": {
+                    "comments": [
+                        {"body": f"Comment {i} " + "blah " * 50}
+                        for i in range(comments)
+                    ]
+                },
+                "components": [{"name": "auth"}],
+            },
+            "changelog": {"histories": []},
+        },
+    }
+
+
+def _tokens(encoding, text):
+    return len(encoding.encode_ordinary(text))
+
+
+class TestFitIssueJson:
+    """Test staged reduction of the Jira JSON."""
+
+    def test_small_issue_is_unchanged(self, byte_encoding):
+        """Test that an issue within budget is rendered in full."""
+        issue = _issue()
+        assert fit_issue_json(issue, 10_000) == json.dumps(issue, indent=2)
+
+    def test_bulky_raw_fields_are_dropped_first(self, byte_encoding):
+        """Test that comments go before anything else."""
+        issue = _issue(comments=50)
+        without_comments = json.dumps(issue, indent=2).count("\n")
+
+        result = fit_issue_json(issue, 2000)
+
+        assert _tokens(byte_encoding, result) <= 2000
+        parsed = json.loads(result)
+        assert "comment" not in parsed["raw"]["fields"]
+        assert parsed["raw"]["fields"]["components"] == [{"name": "auth"}]
+        assert parsed["description"] == "Fix the login page"
+        assert without_comments > result.count("\n")
+
+    def test_related_issues_go_before_the_description(self, byte_encoding):
+        """Test that related issue summaries are dropped after the raw payload."""
+        issue = {
+            **_issue(),
+            "related_issues": [
+                {"key": f"TEST-{i}", "summary": "Neighbor " * 20} for i in range(20)
+            ],
+        }
+        without_raw = json.dumps(
+            {k: v for k, v in issue.items() if k != "raw"}, indent=2
+        )
+
+        result = fit_issue_json(issue, len(without_raw))
+        parsed = json.loads(result)
+        assert "raw" not in parsed
+        assert len(parsed["related_issues"]) == 20
+
+        result = fit_issue_json(issue, 500)
+        parsed = json.loads(result)
+        assert "related_issues" not in parsed
+        assert parsed["description"] == "Fix the login page"
+
+    def test_description_is_truncated_last(self, byte_encoding):
+        """Test that a huge description is cut while the JSON stays valid."""
+        issue = _issue(description="Step to reproduce\n" * 5000)
+
+        result = fit_issue_json(issue, 3000)
+
+        assert _tokens(byte_encoding, result) <= 3000
+        parsed = json.loads(result)
+        assert "raw" not in parsed
+        assert parsed["summary"] == "Login fails"
+        assert "CONTENT TRUNCATED" in parsed["description"]
+
+
+class TestBuildBudgetedPrompt:
+    """Test filling templates within a token budget."""
+
+    def test_prompt_within_budget_is_unchanged(self, byte_encoding):
+        """Test that nothing is shrunk when everything fits."""
+        issue = _issue()
+        sections = {CONTEXT_INSTRUCTIONS: "ctx", ADDITIONAL_INSTRUCTIONS: "extra"}
+
+        result = build_budgeted_prompt(TEMPLATE, issue, sections, 100_000)
+
+        expected = (
+            TEMPLATE.replace("{{JIRA_JSON}}", json.dumps(issue, indent=2))
+            .replace("{{CONTEXT_INSTRUCTIONS}}", "ctx")
+            .replace("{{ADDITIONAL_INSTRUCTIONS}}", "extra")
+        )
+        assert result == expected
+
+    def test_template_and_instructions_survive(self, byte_encoding):
+        """Test that the Jira JSON is shrunk before any instructions."""
+        issue = _issue(description="Very long description line\n" * 2000)
+        sections = {
+            CONTEXT_INSTRUCTIONS: "Use mcp_ado_search_code selectively.",
+            ADDITIONAL_INSTRUCTIONS: "Use TypeScript strict mode.",
+        }
+
+        result = build_budgeted_prompt(TEMPLATE, issue, sections, 2000)
+
+        assert _tokens(byte_encoding, result) <= 2000
+        assert result.startswith("You are an engineering agent.")
+        assert result.endswith("- Follow repo conventions and tests.\n")
+        assert "Use mcp_ado_search_code selectively." in result
+        assert "Use TypeScript strict mode." in result
+        assert '"summary": "Login fails"' in result
+
+    def test_instructions_shrink_after_jira(self, byte_encoding):
+        """Test that huge context instructions are cut once Jira is minimal."""
+        sections = {
+            CONTEXT_INSTRUCTIONS: "context line\n" * 5000,
+            ADDITIONAL_INSTRUCTIONS: "Keep me.",
+        }
+
+        result = build_budgeted_prompt(TEMPLATE, _issue(), sections, 1500)
+
+        assert _tokens(byte_encoding, result) <= 1500
+        assert "Keep me." in result
+        assert "CONTENT TRUNCATED" in result
+
+
+class TestAssemblePrompt:
+    """Test the single-pass prompt assembly pipeline."""
+
+    def test_token_counter_memoizes(self, byte_encoding):
+        """Test that each fragment is encoded only once."""
+        counter = TokenCounter("gpt-4")
+        with patch(
+            "src.prompt_budget.count_tokens", side_effect=lambda t, m: len(t)
+        ) as mock_count:
+            assert counter.count("abc") == 3
+            assert counter.count("abc") == 3
+            assert counter.count("abcd") == 4
+
+        assert mock_count.call_count == 2
+
+    def test_parts_are_serialized_and_counted_once(self, byte_encoding):
+        """Test that fitting prompts are assembled without re-tokenizing."""
+        issue = _issue()
+        sections = {CONTEXT_INSTRUCTIONS: "ctx", ADDITIONAL_INSTRUCTIONS: "extra"}
+
+        mock_count = MagicMock(side_effect=lambda t, m: len(t))
+        with patch("src.prompt_budget.count_tokens", mock_count), patch(
+            "src.prompt_templates.count_tokens", mock_count
+        ):
+            prompt, tokens = assemble_prompt(
+                TEMPLATE, issue, sections, 100_000, TokenCounter("gpt-4")
+            )
+
+        # template text, Jira JSON, context and additional instructions
+        assert mock_count.call_count == 4
+        assert prompt not in [c.args[0] for c in mock_count.call_args_list]
+        assert tokens == len(prompt)
+
+    def test_derived_total_matches_full_count(self, byte_encoding):
+        """Test that the total derived from the parts equals a full count."""
+        issue = _issue(description="Very long description line\n" * 2000)
+        sections = {CONTEXT_INSTRUCTIONS: "ctx", ADDITIONAL_INSTRUCTIONS: "extra"}
+
+        prompt, tokens = assemble_prompt(
+            TEMPLATE, issue, sections, 3000, TokenCounter("gpt-4")
+        )
+
+        assert tokens == _tokens(byte_encoding, prompt)
+        assert tokens <= 3000
+
+    def test_repeated_placeholder_is_counted_per_use(self, byte_encoding):
+        """Test that a placeholder used twice is budgeted for both uses."""
+        issue = _issue(description="Very long description line\n" * 200)
+        template = "Issue:\n{{JIRA_JSON}}\nAgain:\n{{JIRA_JSON}}\n"
+
+        full, full_tokens = assemble_prompt(
+            template, issue, {}, 100_000, TokenCounter("gpt-4")
+        )
+        assert full_tokens == _tokens(byte_encoding, full)
+
+        budget = full_tokens * 3 // 4
+        prompt, tokens = assemble_prompt(
+            template, issue, {}, budget, TokenCounter("gpt-4")
+        )
+
+        assert tokens == _tokens(byte_encoding, prompt)
+        assert tokens <= budget
+        assert "CONTENT TRUNCATED" in prompt
+
+
+def _jira_issue():
+    """Build an issue shaped like jira_fetch output with a realistic raw payload."""
+    user = {
+        "self": "https://jira.example.com/rest/api/2/user?accountId=1",
+        "accountId": "1",
+        "displayName": "Jane Doe",
+        "avatarUrls": {size: f"https://avatars/{size}" for size in ("16x16", "48x48")},
+        "active": True,
+    }
+    return {
+        "key": "TEST-1",
+        "summary": "Login fails",
+        "description": "Fix the login page",
+        "labels": ["bug"],
+        "issuetype": "Bug",
+        "project": "TEST",
+        "raw": {
+            "expand": "renderedFields,names,schema",
+            "id": "10001",
+            "self": "https://jira.example.com/rest/api/2/issue/10001",
+            "key": "TEST-1",
+            "fields": {
+                "summary": "Login fails",
+                "description": "Fix the login page",
+                "labels": ["bug"],
+                "issuetype": {"self": "https://x", "name": "Bug", "iconUrl": "x"},
+                "project": {"self": "https://x", "key": "TEST", "avatarUrls": {}},
+                "assignee": user,
+                "reporter": user,
+                "customfield_10001": None,
+                "customfield_10002": [],
+                "environment": "",
+                "components": [{"self": "https://x", "name": "auth"}],
+            },
+        },
+    }
+
+
+class TestCompactRendering:
+    """Test the compact Jira JSON rendering mode."""
+
+    def test_lifted_fields_are_not_repeated(self):
+        """Test that fields lifted out of raw appear only once."""
+        result = json.loads(render_issue_compact(_jira_issue()))
+
+        assert result["summary"] == "Login fails"
+        assert "key" not in result["raw"]
+        for field in ("summary", "description", "labels", "issuetype", "project"):
+            assert field not in result["raw"]["fields"]
+
+    def test_noise_and_empty_values_are_pruned(self):
+        """Test that links, avatars and null/empty values are removed."""
+        result = render_issue_compact(_jira_issue())
+        fields = json.loads(result)["raw"]["fields"]
+
+        assert "self" not in result
+        assert "avatarUrls" not in result
+        assert "expand" not in result
+        assert "customfield_10001" not in fields
+        assert "customfield_10002" not in fields
+        assert "environment" not in fields
+        assert fields["assignee"] == {
+            "accountId": "1",
+            "displayName": "Jane Doe",
+            "active": True,
+        }
+        assert fields["components"] == [{"name": "auth"}]
+
+    def test_compact_output_has_no_indentation(self):
+        """Test that the compact rendering has no whitespace between tokens."""
+        result = render_issue_compact({"key": "TEST-1", "labels": ["a", "b"]})
+        assert result == '{"key":"TEST-1","labels":["a","b"]}'
+
+    def test_non_ascii_text_is_not_escaped(self):
+        """Test that non-ASCII text is kept as is instead of \\u escapes."""
+        result = render_issue_compact({"key": "TEST-1", "summary": "Größe ändern"})
+        assert "Größe ändern" in result
+
+    def test_compact_saves_tokens(self, byte_encoding):
+        """Test that the compact rendering is materially cheaper."""
+        issue = _jira_issue()
+        counter = TokenCounter("gpt-4")
+
+        saved = report_rendering_savings(issue, render_issue_compact, counter)
+
+        pretty = _tokens(byte_encoding, render_issue_pretty(issue))
+        compact = _tokens(byte_encoding, render_issue_compact(issue))
+        assert saved == pretty - compact
+        assert compact < pretty / 2
+
+    def test_get_issue_renderer(self):
+        """Test renderer lookup by mode name."""
+        assert get_issue_renderer("pretty") is render_issue_pretty
+        assert get_issue_renderer("COMPACT") is render_issue_compact
+        with pytest.raises(ValueError, match="Unknown Jira JSON mode"):
+            get_issue_renderer("yaml")
+
+    def test_budgeted_prompt_uses_renderer(self, byte_encoding):
+        """Test that shrink stages render through the selected renderer."""
+        issue = _issue(description="Very long description line\n" * 2000)
+        sections = {CONTEXT_INSTRUCTIONS: "ctx", ADDITIONAL_INSTRUCTIONS: "extra"}
+
+        result = build_budgeted_prompt(
+            TEMPLATE, issue, sections, 2000, render=render_issue_compact
+        )
+
+        assert _tokens(byte_encoding, result) <= 2000
+        assert '"summary":"Login fails"' in result
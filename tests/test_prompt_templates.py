@@ -0,0 +1,101 @@
+"""Unit tests for compiled prompt templates."""
+
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.prompt_templates import (
+    PROMPTS_DIR,
+    PromptTemplate,
+    clear_template_cache,
+    load_template,
+    resolve_template_path,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_template_cache():
+    """Start every test with an empty template cache."""
+    clear_template_cache()
+    yield
+    clear_template_cache()
+
+
+class TestPromptTemplate:
+    """Test compiling and rendering templates."""
+
+    def test_template_is_split_into_literals_and_placeholders(self):
+        """Test that placeholders are found once at compile time."""
+        template = PromptTemplate("A {{JIRA_JSON}} B {{CONTEXT_INSTRUCTIONS}} C")
+
+        assert template.literals == ["A ", " B ", " C"]
+        assert template.placeholders == ["JIRA_JSON", "CONTEXT_INSTRUCTIONS"]
+        assert template.static_text == "A  B  C"
+
+    def test_render_substitutes_all_placeholders(self):
+        """Test that every placeholder is filled, including repeated ones."""
+        template = PromptTemplate("{{X}}-{{Y}}-{{X}}")
+        assert template.render({"X": "1", "Y": "2"}) == "1-2-1"
+
+    def test_values_are_not_expanded_again(self):
+        """Test that placeholder markers inside values are kept verbatim."""
+        template = PromptTemplate("{{JIRA_JSON}}|{{CONTEXT_INSTRUCTIONS}}")
+
+        result = template.render(
+            {"JIRA_JSON": "see {{CONTEXT_INSTRUCTIONS}}", "CONTEXT_INSTRUCTIONS": "ctx"}
+        )
+
+        assert result == "see {{CONTEXT_INSTRUCTIONS}}|ctx"
+
+    def test_missing_values_render_empty(self):
+        """Test that placeholders without a value are removed."""
+        assert PromptTemplate("a{{X}}b").render({}) == "ab"
+
+    def test_static_tokens_are_cached_per_model(self):
+        """Test that the template text is tokenized once per model."""
+        template = PromptTemplate("static {{X}} text")
+
+        with patch(
+            "src.prompt_templates.count_tokens", side_effect=lambda t, m: len(t)
+        ) as mock_count:
+            assert template.static_tokens("gpt-4") == len("static  text")
+            assert template.static_tokens("gpt-4") == len("static  text")
+            template.static_tokens("gpt-4o")
+
+        assert mock_count.call_count == 2
+
+
+class TestLoadTemplate:
+    """Test locating and caching template files."""
+
+    def test_packaged_templates_do_not_depend_on_cwd(self, tmp_path, monkeypatch):
+        """Test that templates are found relative to the package."""
+        monkeypatch.chdir(tmp_path)
+
+        template = load_template("codegen.md")
+
+        assert template.name == str(PROMPTS_DIR / "codegen.md")
+        assert "JIRA_JSON" in template.placeholders
+
+    def test_templates_are_read_once(self):
+        """Test that a template file is compiled only once per process."""
+        with patch.object(
+            Path, "read_text", autospec=True, return_value="{{X}}"
+        ) as mock_read:
+            first = load_template("codegen.md")
+            second = load_template("codegen.md")
+
+        assert first is second
+        assert mock_read.call_count == 1
+
+    def test_custom_template_dir(self, tmp_path):
+        """Test that a custom directory overrides the packaged templates."""
+        (tmp_path / "codegen.md").write_text("custom {{JIRA_JSON}}", encoding="utf-8")
+
+        assert load_template("codegen.md", tmp_path).literals == ["custom ", ""]
+        # Templates missing from the custom directory fall back to prompts/
+        assert (
+            resolve_template_path("codegen_with_tests.md", tmp_path)
+            == PROMPTS_DIR / "codegen_with_tests.md"
+        )
@@ -0,0 +1,467 @@
+"""Unit tests for the MCP tool wrappers and their result cache."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.safe_mcp_tools import (
+    READ_ONLY_TOOLS,
+    MCPResultCache,
+    SafeMCPWrapper,
+    SingleFlight,
+    create_safe_mcp_tools,
+    execute_batch,
+    gather_safely,
+    make_cache_key,
+)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Provide a fake clock for TTL tests."""
+    return FakeClock()
+
+
+class TestMakeCacheKey:
+    """Test hashing of tool calls."""
+
+    def test_keyword_order_does_not_matter(self):
+        """Test that equal calls hash equally."""
+        first = make_cache_key("search_code", (), {"searchText": "x", "top": 5})
+        second = make_cache_key("search_code", (), {"top": 5, "searchText": "x"})
+        assert first == second
+        assert len(first) == 64
+
+    def test_tool_and_arguments_are_distinguished(self):
+        """Test that different calls hash differently."""
+        keys = {
+            make_cache_key("search_code", (), {"searchText": "x"}),
+            make_cache_key("search_code", (), {"searchText": "y"}),
+            make_cache_key("wit_get_work_item", (), {"searchText": "x"}),
+            make_cache_key("search_code", ("x",), {}),
+        }
+        assert len(keys) == 4
+
+    def test_unserializable_arguments(self):
+        """Test that arbitrary objects fall back to their repr."""
+        key = make_cache_key("search_code", ({1, 2},), {})
+        assert key == make_cache_key("search_code", ({1, 2},), {})
+
+
+class TestMCPResultCache:
+    """Test TTLs, LRU eviction and statistics."""
+
+    def test_hits_and_misses(self, clock):
+        """Test lookups before and after storing a result."""
+        cache = MCPResultCache(max_bytes=1000, clock=clock)
+
+        assert cache.get("k") == (False, None)
+        cache.put("search_code", "k", {"count": 1})
+        assert cache.get("k") == (True, {"count": 1})
+        assert cache.stats() == {
+            "hits": 1,
+            "misses": 1,
+            "hit_rate": 0.5,
+            "evictions": 0,
+            "expirations": 0,
+            "entries": 1,
+            "bytes": len('{"count":1}'),
+        }
+
+    def test_entries_expire_per_tool(self, clock):
+        """Test that every tool has its own TTL."""
+        cache = MCPResultCache(
+            max_bytes=1000, ttls={"fast": 10, "slow": 100}, clock=clock
+        )
+        cache.put("fast", "a", "result")
+        cache.put("slow", "b", "result")
+
+        clock.now += 50
+
+        assert cache.get("a") == (False, None)
+        assert cache.get("b") == (True, "result")
+        assert cache.stats()["expirations"] == 1
+
+    def test_tools_without_ttl_are_not_cached(self, clock):
+        """Test that unlisted (e.g. mutating) tools are never stored."""
+        cache = MCPResultCache(max_bytes=1000, ttls={"search_code": 60}, clock=clock)
+        cache.put("wit_update_work_item", "k", "result")
+
+        assert not cache.is_cacheable("wit_update_work_item")
+        assert cache.get("k") == (False, None)
+
+    def test_changing_lookups_are_not_cached_by_default(self):
+        """Test that builds, logs and work items are only coalesced."""
+        cache = MCPResultCache(max_bytes=1000)
+
+        for tool in ("build_get_builds", "build_get_log_by_id", "wit_get_work_item"):
+            assert not cache.is_cacheable(tool)
+            assert tool in READ_ONLY_TOOLS
+        assert cache.is_cacheable("repo_get_repo_by_name_or_id")
+
+    def test_least_recently_used_is_evicted_by_bytes(self, clock):
+        """Test eviction once the cache exceeds its byte budget."""
+        cache = MCPResultCache(max_bytes=30, clock=clock)
+        for key in ("a", "b", "c"):
+            cache.put("search_code", key, "x" * 8)  # 10 bytes as JSON
+        cache.get("a")
+
+        cache.put("search_code", "d", "x" * 8)
+
+        assert cache.get("b") == (False, None)
+        assert cache.get("a")[0] and cache.get("c")[0] and cache.get("d")[0]
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] == 30
+
+    def test_oversized_results_are_not_stored(self, clock):
+        """Test that a result larger than the cache is skipped."""
+        cache = MCPResultCache(max_bytes=10, clock=clock)
+        cache.put("search_code", "k", "x" * 100)
+
+        assert cache.stats()["entries"] == 0
+
+    def test_disabled_cache(self, clock):
+        """Test that a zero byte budget disables caching."""
+        cache = MCPResultCache(max_bytes=0, clock=clock)
+        assert not cache.is_cacheable("search_code")
+
+
+class TestSafeMCPWrapperCache:
+    """Test the cache integration of SafeMCPWrapper."""
+
+    def test_repeated_calls_are_served_from_cache(self):
+        """Test that identical calls reach the tool once."""
+        cache = MCPResultCache(max_bytes=10_000)
+        tools = create_safe_mcp_tools(cache)
+        search = MagicMock(return_value={"results": ["a.py"]})
+
+        first = tools["search_code"].execute_safely(search, searchText="login")
+        second = tools["search_code"].execute_safely(search, searchText="login")
+        tools["search_code"].execute_safely(search, searchText="logout")
+
+        assert first == second == {"results": ["a.py"]}
+        assert search.call_count == 2
+        assert cache.stats()["hits"] == 1
+
+    def test_cache_is_optional(self):
+        """Test that wrappers without a cache always call the tool."""
+        tool = MagicMock(return_value="ok")
+        wrapper = SafeMCPWrapper("search_code")
+
+        wrapper.execute_safely(tool)
+        wrapper.execute_safely(tool)
+
+        assert tool.call_count == 2
+
+    def test_errors_are_not_cached(self):
+        """Test that failing calls are retried on the next request."""
+        cache = MCPResultCache(max_bytes=10_000)
+        wrapper = SafeMCPWrapper("search_code", cache=cache)
+        tool = MagicMock(side_effect=[RuntimeError("boom"), "ok"])
+
+        with pytest.raises(RuntimeError):
+            wrapper.execute_safely(tool, searchText="x")
+
+        assert wrapper.execute_safely(tool, searchText="x") == "ok"
+
+    def test_budgets_do_not_share_entries(self):
+        """Test that wrappers with different budgets cache separately."""
+        cache = MCPResultCache(max_bytes=100_000)
+        tool = MagicMock(return_value="y" * 5000)
+
+        small = SafeMCPWrapper("search_code", max_total_length=1000, cache=cache)
+        large = SafeMCPWrapper("search_code", cache=cache)
+
+        assert len(small.execute_safely(tool)) <= 1000
+        assert large.execute_safely(tool) == "y" * 5000
+
+
+class InFlight:
+    """Count concurrent calls of fake tools."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.current -= 1
+
+
+class TestAsyncExecution:
+    """Test execute_safely_async and the batch APIs."""
+
+    def test_async_tools_are_awaited_and_bounded(self):
+        """Test that coroutine tools are awaited and their results bounded."""
+
+        async def search(searchText):
+            return {"text": searchText * 5000}
+
+        wrapper = SafeMCPWrapper("search_code", max_total_length=1000)
+
+        result = asyncio.run(wrapper.execute_safely_async(search, searchText="ab"))
+
+        assert "[TRUNCATED:" in result["text"]
+        assert len(result["text"]) <= 1000
+
+    def test_sync_tools_do_not_block_the_loop(self):
+        """Test that blocking tools run in worker threads."""
+
+        def slow_tool():
+            time.sleep(0.2)
+            return "done"
+
+        wrappers = [SafeMCPWrapper(f"tool_{i}") for i in range(4)]
+        started = time.monotonic()
+
+        results = execute_batch([(w, slow_tool, {}) for w in wrappers])
+
+        assert results == ["done"] * 4
+        assert time.monotonic() - started < 0.6
+
+    def test_per_tool_concurrency_limit(self):
+        """Test that a wrapper runs at most max_concurrency calls at once."""
+        in_flight = InFlight()
+
+        async def tool(i):
+            with in_flight:
+                await asyncio.sleep(0.02)
+            return i
+
+        wrapper = SafeMCPWrapper("search_code", max_concurrency=2)
+
+        results = execute_batch([(wrapper, tool, {"i": i}) for i in range(8)])
+
+        assert results == list(range(8))
+        assert in_flight.peak == 2
+
+    def test_large_results_are_bounded_off_the_loop(self):
+        """Test that truncation of containers runs in a worker thread."""
+        wrapper = SafeMCPWrapper("search_code", max_total_length=1000)
+        threads = []
+        finish = wrapper.bound_result
+
+        def recording_finish(result, cache_key):
+            threads.append(threading.current_thread())
+            return finish(result, cache_key)
+
+        wrapper.bound_result = recording_finish
+
+        async def tool(size):
+            return ["x" * size]
+
+        async def run():
+            await wrapper.execute_safely_async(tool, size=5000)
+            return threading.current_thread()
+
+        loop_thread = asyncio.run(run())
+
+        assert threads and threads[0] is not loop_thread
+
+    def test_errors_and_return_exceptions(self):
+        """Test that failures can be collected alongside results."""
+
+        async def fails():
+            raise RuntimeError("boom")
+
+        async def works():
+            return "ok"
+
+        wrapper = SafeMCPWrapper("search_code")
+        calls = [(wrapper, works, {}), (wrapper, fails, {})]
+
+        results = execute_batch(calls, return_exceptions=True)
+
+        assert results[0] == "ok"
+        assert isinstance(results[1], RuntimeError)
+        with pytest.raises(RuntimeError):
+            execute_batch(calls)
+
+    def test_wrapper_is_reusable_across_event_loops(self):
+        """Test that semaphores are created per loop."""
+        wrapper = SafeMCPWrapper("search_code", max_concurrency=1)
+
+        async def tool():
+            return "ok"
+
+        for _ in range(2):
+            assert asyncio.run(gather_safely([(wrapper, tool, {})] * 3)) == ["ok"] * 3
+
+    def test_async_calls_use_the_cache(self):
+        """Test that async calls share the result cache."""
+        cache = MCPResultCache(max_bytes=10_000)
+        wrapper = SafeMCPWrapper("search_code", cache=cache)
+        tool = MagicMock(return_value={"results": []})
+
+        async def run():
+            first = await wrapper.execute_safely_async(tool, searchText="x")
+            second = await wrapper.execute_safely_async(tool, searchText="x")
+            return first, second
+
+        assert asyncio.run(run()) == ({"results": []}, {"results": []})
+        assert tool.call_count == 1
+
+
+class TestSizeReports:
+    """Test the size report kept by SafeMCPWrapper."""
+
+    def test_last_report(self, caplog):
+        """Test that a call records its sizes and warns about truncation."""
+        wrapper = SafeMCPWrapper("search_code", max_total_length=1000)
+
+        wrapper.execute_safely(lambda: {"results": [{"content": "x" * 5000}]})
+
+        report = wrapper.last_report
+        # The string plus the JSON syntax around it
+        assert report.chars_in == 5000 + 36
+        assert report.chars_out <= 1000
+        assert report.largest_string_path == "$.results[0].content"
+        assert "Large content detected from search_code" in caplog.text
+
+
+class SlowTool:
+    """A tool that blocks until released and counts its calls."""
+
+    def __init__(self, result="ok", error=None):
+        self.calls = 0
+        self.release = threading.Event()
+        self.result = result
+        self.error = error
+        self.lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        with self.lock:
+            self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return {"result": self.result, **kwargs}
+
+
+def _run_concurrently(func, count, tool, flights):
+    """Call func from several threads and release the tool once all wait."""
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        futures = [pool.submit(func) for _ in range(count)]
+        deadline = time.monotonic() + 5
+        while flights.stats()["coalesced"] < count - 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        tool.release.set()
+    return futures
+
+
+class TestSingleFlight:
+    """Test coalescing of identical concurrent calls."""
+
+    def test_concurrent_identical_calls_share_one_request(self):
+        """Test that followers receive the leader's result."""
+        flights = SingleFlight()
+        tool = SlowTool()
+        wrapper = SafeMCPWrapper("search_code", single_flight=flights)
+
+        futures = _run_concurrently(
+            lambda: wrapper.execute_safely(tool, searchText="login"), 5, tool, flights
+        )
+
+        results = [future.result() for future in futures]
+        assert tool.calls == 1
+        assert results == [{"result": "ok", "searchText": "login"}] * 5
+        assert flights.stats() == {"executed": 1, "coalesced": 4}
+
+    def test_different_arguments_are_not_coalesced(self):
+        """Test that only identical calls share a request."""
+        flights = SingleFlight()
+        tool = SlowTool()
+        tool.release.set()
+        tools = create_safe_mcp_tools(single_flight=flights)
+
+        tools["search_code"].execute_safely(tool, searchText="a")
+        tools["search_code"].execute_safely(tool, searchText="b")
+
+        assert tool.calls == 2
+        assert flights.stats()["coalesced"] == 0
+
+    def test_errors_are_shared_and_not_remembered(self):
+        """Test that followers see the leader's error and later calls retry."""
+        flights = SingleFlight()
+        tool = SlowTool(error=RuntimeError("rate limited"))
+        wrapper = SafeMCPWrapper("search_code", single_flight=flights)
+
+        futures = _run_concurrently(
+            lambda: wrapper.execute_safely(tool), 3, tool, flights
+        )
+
+        for future in futures:
+            with pytest.raises(RuntimeError, match="rate limited"):
+                future.result()
+        assert tool.calls == 1
+
+        tool.error = None
+        assert wrapper.execute_safely(tool) == {"result": "ok"}
+        assert tool.calls == 2
+
+    def test_tools_with_side_effects_are_not_coalesced(self):
+        """Test that unknown (possibly mutating) tools always run."""
+        flights = SingleFlight()
+        tool = SlowTool()
+        tool.release.set()
+        wrapper = SafeMCPWrapper("wit_update_work_item", single_flight=flights)
+
+        wrapper.execute_safely(tool, id=1)
+        wrapper.execute_safely(tool, id=1)
+
+        assert flights.stats() == {"executed": 0, "coalesced": 0}
+
+    def test_async_calls_are_coalesced(self):
+        """Test single-flight for execute_safely_async."""
+        flights = SingleFlight()
+        wrapper = SafeMCPWrapper("repo_get_repo_by_name_or_id", single_flight=flights)
+        calls = []
+
+        async def get_repo(name):
+            calls.append(name)
+            await asyncio.sleep(0.05)
+            return {"name": name}
+
+        results = execute_batch([(wrapper, get_repo, {"name": "web"})] * 4)
+
+        assert calls == ["web"]
+        assert results == [{"name": "web"}] * 4
+
+    def test_cancelled_caller_does_not_cancel_the_call(self):
+        """Test that the shared request survives a cancelled waiter."""
+        flights = SingleFlight()
+        wrapper = SafeMCPWrapper("search_code", single_flight=flights)
+
+        async def search():
+            await asyncio.sleep(0.05)
+            return "hits"
+
+        async def run():
+            first = asyncio.ensure_future(wrapper.execute_safely_async(search))
+            second = asyncio.ensure_future(wrapper.execute_safely_async(search))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "hits"